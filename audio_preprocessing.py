@@ -0,0 +1,371 @@
+"""
+Optional audio preprocessing before upload.
+
+Most of the samples in test_audio are stereo, high-bitrate files, and upload
+time is a large share of the per-file latency. With `--preprocess-audio`
+every local file is prepared before the TranscriptionClient sends it:
+
+- transcoded with ffmpeg to a compact mono speech format (Opus in Ogg by
+  default, 16 kHz, `--audio-bitrate`). The result is cached by source hash
+  and settings, and the original is kept if it is already smaller.
+- fingerprinted (Haitsma-Kalker style sub-band energy bits). A file with the
+  same content as an earlier one, or with nearly the same audio, is mapped to
+  that file's prepared audio. Its upload and transcription then come from the
+  upload and transcript caches.
+
+The run report shows the bytes and the estimated upload time saved.
+
+    python audio_preprocessing.py        # transcript equivalence on test_audio (live API)
+"""
+import os
+import shutil
+import hashlib
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# numpy is imported where it is used, so the scripts that offer
+# --preprocess-audio still load (and --help works) without it
+if TYPE_CHECKING:
+    import numpy as np
+
+from audio_upload import file_sha256, is_remote_url
+
+PREPARED_DIR = Path(".cache/prepared_audio")
+FINGERPRINT_DIR = Path(".cache/fingerprints")
+
+# Codec -> (file suffix, ffmpeg encoder options)
+CODECS = {
+    "opus": (".ogg", ["-c:a", "libopus", "-application", "voip"]),
+    "mp3": (".mp3", ["-c:a", "libmp3lame"])
+}
+DEFAULT_BITRATE = "24k"
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+# Fingerprint layout: 8 kHz audio, 256 ms frames every 32 ms, 33 log-spaced
+# bands between 300 and 2000 Hz giving 32 bits per frame
+FINGERPRINT_RATE = 8000
+FRAME_SIZE = 2048
+HOP_SIZE = 256
+BANDS = 33
+LOWEST_FREQUENCY = 300
+HIGHEST_FREQUENCY = 2000
+# Offsets (in frames, about 2 seconds) tried when aligning two fingerprints
+MAX_OFFSET = 64
+
+def _require_ffmpeg():
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("Audio preprocessing needs ffmpeg on the PATH")
+
+def transcode(file_path: str, output_file: Path, codec: str = "opus", bitrate: str = DEFAULT_BITRATE,
+              sample_rate: int = DEFAULT_SAMPLE_RATE) -> Path:
+    """
+    Transcode to mono `codec` at `bitrate` and `sample_rate`
+    """
+    suffix, encoder = CODECS[codec]
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_name(f"{output_file.stem}.tmp{suffix}")
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", file_path, "-vn", "-ac", "1",
+                    "-ar", str(sample_rate)] + encoder + ["-b:a", bitrate, str(tmp_file)], check=True)
+    tmp_file.replace(output_file)
+    return output_file
+
+def fingerprint(file_path: str) -> "np.ndarray":
+    """
+    Fingerprint an audio file (decoded to 8 kHz mono with ffmpeg)
+    """
+    import numpy as np
+
+    pcm = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", file_path, "-vn", "-ac", "1",
+                          "-ar", str(FINGERPRINT_RATE), "-f", "s16le", "-"], capture_output=True, check=True).stdout
+    return fingerprint_samples(np.frombuffer(pcm, dtype=np.int16).astype(np.float32))
+
+def fingerprint_samples(samples: "np.ndarray") -> "np.ndarray":
+    """
+    One 32-bit word per frame of 8 kHz samples: the sign of the energy
+    difference between neighbouring bands, compared with the previous frame.
+    Robust to re-encoding, resampling and volume changes.
+    """
+    import numpy as np
+
+    if len(samples) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    bins = np.searchsorted(np.fft.rfftfreq(FRAME_SIZE, 1 / FINGERPRINT_RATE),
+                           np.geomspace(LOWEST_FREQUENCY, HIGHEST_FREQUENCY, BANDS + 1))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    energies = []
+    # A block of frames at a time, so long recordings are not windowed all at once
+    for start in range(0, len(frames), 4096):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + 4096] * window, axis=1)) ** 2
+        # reduceat sums from each edge to the next; the slice drops the sum above the top edge
+        energies.append(np.add.reduceat(spectrum, bins, axis=1)[:, :-1])
+    energy = np.concatenate(energies)
+
+    band_differences = energy[:, :-1] - energy[:, 1:]
+    bits = (band_differences[1:] - band_differences[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel()
+
+def fingerprint_similarity(a: "np.ndarray", b: "np.ndarray", max_offset: int = MAX_OFFSET) -> float:
+    """
+    1 - bit error rate at the best alignment within `max_offset` frames.
+    Unrelated audio scores about 0.5, the same recording re-encoded above 0.9.
+    """
+    import numpy as np
+
+    if not len(a) or not len(b):
+        return 0.0
+    best = 0.0
+    for offset in range(-max_offset, max_offset + 1):
+        first, second = (a[offset:], b) if offset >= 0 else (a, b[-offset:])
+        overlap = min(len(first), len(second))
+        # Require most of the shorter recording to line up
+        if overlap < 0.8 * min(len(a), len(b)):
+            continue
+        differing = np.unpackbits(np.bitwise_xor(first[:overlap], second[:overlap]).view(np.uint8)).sum()
+        best = max(best, 1.0 - differing / (overlap * 32))
+    return float(best)
+
+class AudioPreprocessor:
+    """
+    Prepares local audio for upload: transcodes it (cached by source hash
+    and settings) and maps duplicates to the audio of the first file seen
+    """
+    def __init__(self, codec: str = "opus", bitrate: str = DEFAULT_BITRATE, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 deduplicate: bool = True, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                 cache_dir: Path = PREPARED_DIR):
+        _require_ffmpeg()
+        self.codec = codec
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.deduplicate = deduplicate
+        self.duplicate_threshold = duplicate_threshold
+        self.cache_dir = Path(cache_dir)
+        # Source path -> what was done with it, for the report
+        self.files: Dict[str, Dict] = {}
+        self.stats = {"transcoded": 0, "reused": 0, "kept_original": 0, "exact_duplicates": 0, "near_duplicates": 0}
+        self._lock = threading.Lock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+        # Files that were not duplicates: (source path, source hash, fingerprint, prepared path)
+        self._originals: List[Tuple[str, str, "np.ndarray", str]] = []
+
+    @property
+    def manifest_config(self) -> Dict:
+        """
+        The settings that change what is uploaded, for run manifest keys
+        """
+        return {"codec": self.codec, "bitrate": self.bitrate, "sample_rate": self.sample_rate,
+                "deduplicate": self.deduplicate, "duplicate_threshold": self.duplicate_threshold}
+
+    def _settings_key(self, source_hash: str) -> str:
+        return hashlib.sha256(f"{source_hash}:{self.codec}:{self.bitrate}:{self.sample_rate}".encode()).hexdigest()[:16]
+
+    def _transcode(self, file_path: str, source_hash: str) -> str:
+        """
+        Return the cached transcode of a file, creating it if needed. The
+        original is used if the transcode would not be smaller.
+        """
+        suffix = CODECS[self.codec][0]
+        # Keep the source stem so stem-based lookups (replay backend) still match
+        output_file = self.cache_dir / self._settings_key(source_hash) / f"{Path(file_path).stem}{suffix}"
+        if output_file.exists():
+            self._count("reused")
+        else:
+            transcode(file_path, output_file, self.codec, self.bitrate, self.sample_rate)
+            self._count("transcoded")
+        if output_file.stat().st_size >= os.path.getsize(file_path):
+            self._count("kept_original")
+            return file_path
+        return str(output_file)
+
+    def _fingerprint(self, file_path: str, source_hash: str) -> "np.ndarray":
+        import numpy as np
+
+        fingerprint_file = FINGERPRINT_DIR / f"{source_hash[:32]}.npy"
+        if fingerprint_file.exists():
+            return np.load(fingerprint_file)
+        audio_fingerprint = fingerprint(file_path)
+        fingerprint_file.parent.mkdir(parents=True, exist_ok=True)
+        np.save(fingerprint_file, audio_fingerprint)
+        return audio_fingerprint
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def prepare(self, file_path: str) -> str:
+        """
+        Return the path to upload for a local audio file. URLs are passed through unchanged.
+        """
+        if is_remote_url(file_path):
+            return file_path
+
+        source_hash = file_sha256(file_path)
+        with self._lock:
+            if file_path in self.files:
+                return self.files[file_path]["prepared_path"]
+            file_lock = self._file_locks.setdefault(source_hash, threading.Lock())
+
+        # The passes over one file (punctuated and not) wait here for a single transcode
+        with file_lock:
+            with self._lock:
+                if file_path in self.files:
+                    return self.files[file_path]["prepared_path"]
+
+            entry = {"source_bytes": os.path.getsize(file_path), "duplicate_of": None, "similarity": None}
+            audio_fingerprint = self._fingerprint(file_path, source_hash) if self.deduplicate else None
+
+            with self._lock:
+                # Compare and register in one step so two near-duplicates
+                # prepared at the same time cannot both count as originals
+                match = None
+                if self.deduplicate:
+                    for original_source, original_hash, original_fingerprint, original_path in self._originals:
+                        if original_hash == source_hash:
+                            match = (original_source, original_path, 1.0)
+                            self.stats["exact_duplicates"] += 1
+                            break
+                        # Skip the alignment when the lengths differ by more than 5%
+                        if abs(len(original_fingerprint) - len(audio_fingerprint)) > 0.05 * max(len(original_fingerprint), 1):
+                            continue
+                        similarity = fingerprint_similarity(original_fingerprint, audio_fingerprint)
+                        if similarity >= self.duplicate_threshold:
+                            match = (original_source, original_path, similarity)
+                            self.stats["near_duplicates"] += 1
+                            break
+                if match is not None:
+                    original_source, original_path, similarity = match
+                    entry.update(duplicate_of=original_source, similarity=similarity, prepared_path=original_path,
+                                 prepared_bytes=0)
+                    self.files[file_path] = entry
+                    print(f"{file_path} has the same audio as {original_source} "
+                          f"(similarity {similarity:.2f}); reusing its upload")
+                    return original_path
+
+            prepared_path = self._transcode(file_path, source_hash)
+            entry.update(prepared_path=prepared_path, prepared_bytes=os.path.getsize(prepared_path))
+            with self._lock:
+                self.files[file_path] = entry
+                if self.deduplicate:
+                    self._originals.append((file_path, source_hash, audio_fingerprint, prepared_path))
+            return prepared_path
+
+    def report(self, upload_stats: Optional[Dict] = None) -> Dict:
+        """
+        Bytes that no longer need uploading, and the upload time that saves at
+        the uplink rate measured by `upload_stats` (an UploadCache's stats)
+        """
+        with self._lock:
+            files = dict(self.files)
+        source_bytes = sum(entry["source_bytes"] for entry in files.values())
+        prepared_bytes = sum(entry["prepared_bytes"] for entry in files.values())
+        report = dict(self.stats,
+                      files=len(files),
+                      format=f"{self.codec} {self.bitrate} mono {self.sample_rate} Hz",
+                      source_bytes=source_bytes,
+                      prepared_bytes=prepared_bytes,
+                      bytes_saved=source_bytes - prepared_bytes,
+                      upload_time_saved=None,
+                      duplicates={source: {"duplicate_of": entry["duplicate_of"], "similarity": entry["similarity"]}
+                                  for source, entry in files.items() if entry["duplicate_of"]})
+        if upload_stats and upload_stats.get("bytes_uploaded") and upload_stats.get("upload_time"):
+            seconds_per_byte = upload_stats["upload_time"] / upload_stats["bytes_uploaded"]
+            report["upload_time_saved"] = report["bytes_saved"] * seconds_per_byte
+        return report
+
+def print_preprocessing_report(preprocessor: Optional[AudioPreprocessor], backend=None):
+    """
+    Print what audio preprocessing saved, if it was used. The upload rate is
+    taken from the backend's upload cache.
+    """
+    if preprocessor is None:
+        return
+    upload_cache = getattr(backend, 'upload_cache', None)
+    report = preprocessor.report(upload_cache.stats if upload_cache else None)
+    print(f"\nAudio Preprocessing: {report['files']} files, {report['transcoded']} transcoded to {report['format']} "
+          f"({report['reused']} from the cache, {report['kept_original']} kept as the original was smaller), "
+          f"{report['exact_duplicates']} exact and {report['near_duplicates']} near duplicates")
+    ratio = report["prepared_bytes"] / report["source_bytes"] if report["source_bytes"] else 0
+    print(f"Upload Bytes: {report['source_bytes']} -> {report['prepared_bytes']} ({ratio:.1%}), "
+          f"{report['bytes_saved']} saved")
+    if report["upload_time_saved"] is not None:
+        print(f"Upload Time Saved: about {report['upload_time_saved']:.2f} seconds at this run's measured upload rate")
+    else:
+        print("Upload Time Saved: not estimated (no uploads were timed in this run)")
+    for source, duplicate in report["duplicates"].items():
+        print(f"  {source} -> {duplicate['duplicate_of']} (similarity {duplicate['similarity']:.2f})")
+
+def add_preprocessing_arguments(parser):
+    """
+    Add the audio preprocessing options to a script's argument parser
+    """
+    parser.add_argument("--preprocess-audio", action="store_true",
+                        help="Transcode local audio to compact mono speech and skip duplicate recordings "
+                             "before uploading (requires ffmpeg)")
+    parser.add_argument("--audio-codec", choices=list(CODECS), default="opus",
+                        help="Codec for --preprocess-audio (default: opus)")
+    parser.add_argument("--audio-bitrate", default=DEFAULT_BITRATE,
+                        help=f"Bitrate for --preprocess-audio (default: {DEFAULT_BITRATE})")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="With --preprocess-audio, upload duplicate recordings anyway")
+    parser.add_argument("--duplicate-threshold", type=float, default=DEFAULT_DUPLICATE_THRESHOLD,
+                        help=f"Fingerprint similarity above which two recordings are the same "
+                             f"(default: {DEFAULT_DUPLICATE_THRESHOLD})")
+
+def preprocessor_from_args(args) -> Optional[AudioPreprocessor]:
+    if not args.preprocess_audio:
+        return None
+    return AudioPreprocessor(codec=args.audio_codec, bitrate=args.audio_bitrate, deduplicate=not args.no_dedupe,
+                             duplicate_threshold=args.duplicate_threshold)
+
+def main():
+    import assemblyai as aai
+    from dotenv import load_dotenv
+    from transcription_client import TranscriptionClient, add_cache_arguments
+    from transcription_backends import create_backend_from_args, add_backend_arguments
+    from single_pass import token_differences
+
+    parser = argparse.ArgumentParser(description="Check that preprocessed audio transcribes like the original test_audio files")
+    parser.add_argument("--audio-codec", choices=list(CODECS), default="opus")
+    parser.add_argument("--audio-bitrate", default=DEFAULT_BITRATE)
+    parser.add_argument("--duplicate-threshold", type=float, default=DEFAULT_DUPLICATE_THRESHOLD)
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = TranscriptionClient(create_backend_from_args(args), use_cache=not args.no_cache, refresh=args.refresh)
+    preprocessor = AudioPreprocessor(codec=args.audio_codec, bitrate=args.audio_bitrate,
+                                     duplicate_threshold=args.duplicate_threshold)
+    config = aai.TranscriptionConfig(language_detection=True, punctuate=True, format_text=True)
+
+    for audio_file in sorted(Path("test_audio").glob("*")):
+        if audio_file.suffix.lower() not in ['.mp3', '.wav', '.m4a', '.ogg']:
+            continue
+        print(f"\n{audio_file.name}")
+        prepared_path = preprocessor.prepare(str(audio_file))
+        entry = preprocessor.files[str(audio_file)]
+        if entry["duplicate_of"]:
+            continue
+        print(f"Size: {entry['source_bytes']} -> {entry['prepared_bytes']} bytes "
+              f"({entry['prepared_bytes'] / entry['source_bytes']:.1%})")
+
+        original = client.transcribe(str(audio_file), config)
+        prepared = client.transcribe(prepared_path, config)
+        if any(str(getattr(t.status, 'value', t.status)) == "error" for t in (original, prepared)):
+            print(f"Error: {original.error or prepared.error}")
+            continue
+        report = token_differences(original.text, prepared.text)
+        print(f"Words (original/prepared): {report['reference_tokens']}/{report['derived_tokens']}")
+        print(f"Word agreement: {report['token_agreement']:.2%}{' (identical)' if report['exact_match'] else ''}")
+        for example in report["examples"][:5]:
+            print(f"  {example['type']}: '{example['reference']}' -> '{example['derived']}'")
+
+    print_preprocessing_report(preprocessor, client.backend)
+
+if __name__ == "__main__":
+    main()
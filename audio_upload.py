@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# AssemblyAI deletes uploaded audio after a while, so an upload URL is only
+# reused for a bounded time. Stay well inside the service's retention window.
+DEFAULT_UPLOAD_TTL = 20 * 60 * 60
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file's content.
+    Digests are memoized per (path, mtime, size) so repeated lookups are free.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    with _hash_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+def is_remote_url(file_path: str) -> bool:
+    """
+    Check whether the given audio source is already a URL rather than a local path
+    """
+    return urlparse(file_path).scheme in ("http", "https")
+
+class UploadCache:
+    """
+    Uploads each local audio file once and reuses the resulting upload URL.
+    URLs are keyed by the file's content hash and kept in an on-disk map so
+    that later runs (and every config pass in the same run) skip the upload.
+    """
+    def __init__(self, transcriber, cache_file: Optional[Path] = Path(".cache/uploads.json"), max_age: float = DEFAULT_UPLOAD_TTL):
+        self.transcriber = transcriber
+        # With no cache file the map is kept in memory for this run only
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.max_age = max_age
+        self.stats = {"uploads": 0, "reused": 0, "bytes_uploaded": 0, "upload_time": 0.0}
+        self._lock = threading.Lock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._entries = self._load()
+
+    def _load(self) -> Dict:
+        """
+        Load the upload map from disk, dropping entries that have expired
+        """
+        if self.cache_file is None or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            print(f"Warning: Ignoring unreadable upload cache {self.cache_file}")
+            return {}
+
+        now = time.time()
+        return {key: entry for key, entry in entries.items() if now - entry["uploaded_at"] < self.max_age}
+
+    def _save(self):
+        """
+        Atomically write the upload map to disk
+        """
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+    def get_upload_url(self, file_path: str, phases: Optional[Dict] = None) -> str:
+        """
+        Return an AssemblyAI upload URL for a local file, uploading it only if
+        no fresh URL is known for its content. URLs are passed through unchanged.
+        If a `phases` dict is given, the number of bytes sent is added to it.
+        """
+        if is_remote_url(file_path):
+            return file_path
+
+        file_hash = file_sha256(file_path)
+        with self._lock:
+            file_lock = self._file_locks.setdefault(file_hash, threading.Lock())
+
+        # Concurrent passes over the same audio wait here for a single upload
+        with file_lock:
+            with self._lock:
+                entry = self._entries.get(file_hash)
+                if entry and time.time() - entry["uploaded_at"] < self.max_age:
+                    self.stats["reused"] += 1
+                    return entry["upload_url"]
+
+            print(f"Uploading {file_path}...")
+            start_time = time.time()
+            upload_url = self.transcriber.upload_file(file_path)
+            upload_time = time.time() - start_time
+
+            if phases is not None:
+                phases["bytes_uploaded"] += os.path.getsize(file_path)
+            with self._lock:
+                self.stats["uploads"] += 1
+                self.stats["bytes_uploaded"] += os.path.getsize(file_path)
+                self.stats["upload_time"] += upload_time
+                self._entries[file_hash] = {
+                    "upload_url": upload_url,
+                    "uploaded_at": time.time(),
+                    "file_name": os.path.basename(file_path),
+                    "size": os.path.getsize(file_path)
+                }
+                self._save()
+            return upload_url
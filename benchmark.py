@@ -0,0 +1,222 @@
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import assemblyai as aai
+from dotenv import load_dotenv
+
+from transcription_backends import create_backend_from_args, add_backend_arguments, LANGUAGE_BY_FILE
+from transcript_cache import transcript_language
+
+# Load environment variables
+load_dotenv()
+
+ENGINES = ["assemblyai_punctuated", "assemblyai_unpunctuated", "deepmultilingual"]
+
+# Modules whose import cost is measured in a fresh interpreter
+IMPORT_MODULES = ["assemblyai", "numpy", "deepmultilingualpunctuation", "comparison_engine"]
+# Commands whose startup (full process wall time) is measured
+STARTUP_COMMANDS = {"cli --help": ["cli.py", "--help"], "cli compare --help": ["cli.py", "compare", "--help"]}
+
+def measure_import_times(repetitions: int = 3) -> Dict:
+    """
+    Median import time of each module in a fresh interpreter (None if it is not
+    installed) and median wall time of each CLI startup command
+    """
+    timer = "import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)"
+    results = {"modules": {}, "commands": {}}
+    for module in IMPORT_MODULES:
+        times = []
+        for _ in range(repetitions):
+            completed = subprocess.run([sys.executable, "-c", timer.format(module)], capture_output=True, text=True)
+            if completed.returncode != 0:
+                break
+            times.append(float(completed.stdout.strip().splitlines()[-1]))
+        results["modules"][module] = percentile(times, 50) if times else None
+
+    for name, command in STARTUP_COMMANDS.items():
+        times = []
+        for _ in range(repetitions):
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable] + command, capture_output=True)
+            times.append(time.perf_counter() - start_time)
+        results["commands"][name] = percentile(times, 50)
+    return results
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Linearly interpolated percentile of a list of values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def summarize(latencies: List[float], word_count: int, audio_duration: Optional[float]) -> Dict:
+    """
+    Latency percentiles, throughput and real-time factor for one engine on one file
+    """
+    p50 = percentile(latencies, 50)
+    return {
+        "runs": len(latencies),
+        "latencies": latencies,
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50": p50,
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "min": min(latencies) if latencies else 0.0,
+        "max": max(latencies) if latencies else 0.0,
+        "word_count": word_count,
+        "words_per_second": word_count / p50 if p50 > 0 else 0.0,
+        "audio_duration": audio_duration,
+        # Processing time per second of audio; below 1.0 is faster than real time
+        "real_time_factor": p50 / audio_duration if audio_duration else None
+    }
+
+class Benchmark:
+    """
+    Times each engine on each audio file N times after warmup runs, using
+    perf_counter. AssemblyAI runs never use the transcript cache.
+    """
+    def __init__(self, backend, repetitions: int = 5, warmup: int = 1, engines: List[str] = ENGINES):
+        self.backend = backend
+        self.repetitions = repetitions
+        self.warmup = warmup
+        self.engines = engines
+        self.punctuation_model = None
+
+    def _transcribe(self, audio_file: Path, punctuate: bool):
+        config = aai.TranscriptionConfig(language_detection=True, punctuate=punctuate, format_text=True)
+        start_time = time.perf_counter()
+        transcript = self.backend.transcribe(str(audio_file), config)
+        latency = time.perf_counter() - start_time
+        if transcript is None or transcript.status == aai.TranscriptStatus.error:
+            raise RuntimeError(transcript.error if transcript else "Transcription returned None")
+        return latency, transcript
+
+    def _punctuate(self, text: str) -> float:
+        start_time = time.perf_counter()
+        self.punctuation_model.restore_punctuation(text)
+        return time.perf_counter() - start_time
+
+    def _repeat(self, run) -> List[float]:
+        for _ in range(self.warmup):
+            run()
+        return [run() for _ in range(self.repetitions)]
+
+    def run_file(self, audio_file: Path) -> Dict:
+        """
+        Benchmark every selected engine on one file
+        """
+        results = {}
+        # One untimed reference transcript provides the text, duration and language
+        _, reference = self._transcribe(audio_file, punctuate=False)
+        audio_duration = getattr(reference, 'audio_duration', None)
+        language = transcript_language(reference) or LANGUAGE_BY_FILE.get(audio_file.stem, "unknown")
+        word_count = len(reference.words or [])
+
+        for engine in self.engines:
+            print(f"Benchmarking {engine} on {audio_file.name}...")
+            if engine == "deepmultilingual":
+                if self.punctuation_model is None:
+                    from punctuation_daemon import load_punctuation_model
+                    self.punctuation_model = load_punctuation_model()
+                latencies = self._repeat(lambda: self._punctuate(reference.text))
+            else:
+                punctuate = engine == "assemblyai_punctuated"
+                latencies = self._repeat(lambda: self._transcribe(audio_file, punctuate)[0])
+            results[engine] = summarize(latencies, word_count, audio_duration)
+
+        return {"file_name": audio_file.name, "language": str(language), "engines": results}
+
+    def run(self, audio_files: List[Path]) -> Dict:
+        """
+        Benchmark every file and group the results per language
+        """
+        summary = {
+            "timestamp": datetime.now().isoformat(),
+            "backend": self.backend.name,
+            "repetitions": self.repetitions,
+            "warmup": self.warmup,
+            "languages": {}
+        }
+        for audio_file in audio_files:
+            try:
+                file_result = self.run_file(audio_file)
+            except Exception as e:
+                print(f"Error benchmarking {audio_file.name}: {str(e)}")
+                continue
+            summary["languages"].setdefault(file_result["language"], {"files": []})["files"].append(file_result)
+
+        # Pool the runs of every file per language and engine
+        for language_summary in summary["languages"].values():
+            language_summary["engines"] = {}
+            for engine in self.engines:
+                runs = [file_result["engines"][engine] for file_result in language_summary["files"]]
+                audio_durations = [stats["audio_duration"] for stats in runs]
+                language_summary["engines"][engine] = summarize(
+                    [latency for stats in runs for latency in stats["latencies"]],
+                    sum(stats["word_count"] for stats in runs) // len(runs),
+                    sum(audio_durations) / len(audio_durations) if all(audio_durations) else None
+                )
+        return summary
+
+def print_summary(summary: Dict):
+    print(f"\nBenchmark Results ({summary['backend']}, {summary['repetitions']} runs after {summary['warmup']} warmup):")
+    import_times = summary.get("import_times")
+    if import_times:
+        print("\nImport times (fresh interpreter, median):")
+        for module, seconds in import_times["modules"].items():
+            print(f"import {module:<28} {seconds:.2f}s" if seconds is not None else f"import {module:<28} not installed")
+        for name, seconds in import_times["commands"].items():
+            print(f"{name:<35} {seconds:.2f}s wall time")
+    for language, language_summary in summary["languages"].items():
+        files = ", ".join(file_result["file_name"] for file_result in language_summary["files"])
+        print(f"\n[{language}] {files}")
+        for engine, stats in language_summary["engines"].items():
+            rtf = f"{stats['real_time_factor']:.3f}" if stats["real_time_factor"] is not None else "n/a"
+            print(f"{engine:<26} p50 {stats['p50']:.2f}s  p90 {stats['p90']:.2f}s  p99 {stats['p99']:.2f}s  "
+                  f"{stats['words_per_second']:.1f} words/s  RTF {rtf}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AssemblyAI and DeepMultilingual on the files in test_audio")
+    parser.add_argument("--repetitions", type=int, default=5, help="Timed runs per engine and file (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before timing (default: 1)")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--output-dir", default="benchmark_results", help="Where to write the JSON summary")
+    parser.add_argument("--skip-import-times", action="store_true",
+                        help="Do not measure module import and CLI startup times")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    test_files_dir = Path("test_audio")
+    audio_files = [audio_file for audio_file in sorted(test_files_dir.glob("*"))
+                   if audio_file.suffix.lower() in ['.mp3', '.wav', '.m4a', '.ogg']]
+    if not audio_files:
+        print(f"Please add audio files to the '{test_files_dir}' directory.")
+        return
+
+    benchmark = Benchmark(create_backend_from_args(args), repetitions=args.repetitions,
+                          warmup=args.warmup, engines=args.engines)
+    summary = benchmark.run(audio_files)
+    if not args.skip_import_times:
+        summary["import_times"] = measure_import_times()
+    print_summary(summary)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"\nBenchmark summary saved to: {output_file}")
+
+if __name__ == "__main__":
+    main()
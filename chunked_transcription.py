@@ -0,0 +1,230 @@
+"""
+Chunked transcription for long audio.
+
+A long local file is split on silence into overlapping segments (ffmpeg),
+the segments are transcribed concurrently, and their words are merged back
+into one transcript: timestamps are shifted by each segment's offset and the
+words in each overlap are kept from only one side of the cut. The merged
+transcript has the same attributes as a normal one, so
+`TranscriptionAnalyzer.transcribe_with_metrics` produces the usual result schema.
+
+    python chunked_transcription.py --segment-length 60   # accuracy check on test_audio
+"""
+import re
+import shutil
+import difflib
+import hashlib
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from audio_upload import file_sha256
+from transcript_cache import payload_to_transcript, transcript_to_payload
+from single_pass import token_differences
+
+SEGMENT_DIR = Path(".cache/segments")
+DEFAULT_SEGMENT_LENGTH = 600.0
+DEFAULT_OVERLAP = 2.0
+
+def _require_ffmpeg():
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        raise RuntimeError("Chunked transcription needs ffmpeg and ffprobe on the PATH")
+
+def probe_duration(file_path: str) -> float:
+    """
+    Audio duration in seconds
+    """
+    _require_ffmpeg()
+    output = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                             "-of", "default=noprint_wrappers=1:nokey=1", file_path],
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip())
+
+def detect_silences(file_path: str, noise_db: float = -35.0, min_silence: float = 0.4) -> List[Tuple[float, float]]:
+    """
+    Return (start, end) of every silence ffmpeg's silencedetect filter finds
+    """
+    _require_ffmpeg()
+    stderr = subprocess.run(["ffmpeg", "-hide_banner", "-nostats", "-i", file_path,
+                             "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+                            capture_output=True, text=True, check=True).stderr
+    starts = [float(value) for value in re.findall(r"silence_start: (-?[\d.]+)", stderr)]
+    ends = [float(value) for value in re.findall(r"silence_end: ([\d.]+)", stderr)]
+    return list(zip(starts, ends))
+
+def plan_cuts(duration: float, silences: List[Tuple[float, float]], segment_length: float) -> List[float]:
+    """
+    Choose cut points about `segment_length` apart, each in the middle of the
+    silence closest to the target. Without a silence within a quarter of the
+    segment length, the cut falls exactly on the target.
+    """
+    cuts = []
+    position = 0.0
+    while duration - position > segment_length * 1.25:
+        target = position + segment_length
+        candidates = [(start + end) / 2 for start, end in silences
+                      if abs((start + end) / 2 - target) <= segment_length / 4]
+        cut = min(candidates, key=lambda middle: abs(middle - target)) if candidates else target
+        cuts.append(cut)
+        position = cut
+    return cuts
+
+def extract_segment(file_path: str, start: float, end: Optional[float], output_file: Path) -> Path:
+    """
+    Cut [start, end) out of the audio. Re-encoded to FLAC so the cut is
+    sample-accurate and word offsets line up exactly.
+    """
+    if output_file.exists():
+        return output_file
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-i", file_path]
+    if end is not None:
+        command += ["-t", f"{end - start:.3f}"]
+    tmp_file = output_file.with_suffix(".tmp.flac")
+    subprocess.run(command + ["-vn", "-ac", "1", "-c:a", "flac", str(tmp_file)], check=True)
+    tmp_file.replace(output_file)
+    return output_file
+
+def split_audio(file_path: str, segment_length: float = DEFAULT_SEGMENT_LENGTH,
+                overlap: float = DEFAULT_OVERLAP) -> List[Dict]:
+    """
+    Split a file on silence into segments that overlap by `overlap` seconds on
+    each side of every cut. Segment files are cached by source hash and layout.
+    """
+    duration = probe_duration(file_path)
+    cuts = plan_cuts(duration, detect_silences(file_path), segment_length)
+    if not cuts:
+        return [{"index": 0, "path": file_path, "offset_ms": 0, "keep_from_ms": 0, "keep_until_ms": None}]
+    boundaries = [0.0] + cuts + [duration]
+
+    layout = hashlib.sha256(f"{file_sha256(file_path)}:{segment_length}:{overlap}".encode()).hexdigest()[:16]
+    segments = []
+    for index, (cut_start, cut_end) in enumerate(zip(boundaries, boundaries[1:])):
+        start = max(cut_start - overlap, 0.0)
+        end = cut_end + overlap if index < len(cuts) else None
+        segments.append({
+            "index": index,
+            "path": str(extract_segment(file_path, start, end, SEGMENT_DIR / layout / f"{index:04d}.flac")),
+            "offset_ms": int(round(start * 1000)),
+            # Words whose midpoint falls in [keep_from_ms, keep_until_ms) belong to this segment
+            "keep_from_ms": int(round(cut_start * 1000)),
+            "keep_until_ms": int(round(cut_end * 1000)) if index < len(cuts) else None
+        })
+    return segments
+
+def merge_segments(segments: List[Dict], transcripts: List, duration: Optional[float] = None) -> Dict:
+    """
+    Merge segment transcripts into one payload. Word times are shifted by the
+    segment offset, and each overlap is resolved at its cut point so no word
+    is kept twice.
+    """
+    words = []
+    languages = Counter()
+    for segment, transcript in zip(segments, transcripts):
+        payload = transcript_to_payload(transcript)
+        if payload["language_code"]:
+            languages[payload["language_code"]] += len(payload["words"])
+        for word in payload["words"]:
+            start, end = word["start"] + segment["offset_ms"], word["end"] + segment["offset_ms"]
+            middle = (start + end) / 2
+            if middle < segment["keep_from_ms"]:
+                continue
+            if segment["keep_until_ms"] is not None and middle >= segment["keep_until_ms"]:
+                continue
+            words.append(dict(word, start=start, end=end))
+
+    return {
+        "id": "chunked-" + "-".join(str(getattr(transcript, 'id', '')) for transcript in transcripts),
+        "status": "completed",
+        "error": None,
+        "text": " ".join(word["text"] for word in words),
+        "language_code": languages.most_common(1)[0][0] if languages else None,
+        "audio_duration": duration,
+        "words": words,
+        "utterances": []
+    }
+
+def transcribe_chunked(client, file_path: str, config, segment_length: float = DEFAULT_SEGMENT_LENGTH,
+                       overlap: float = DEFAULT_OVERLAP, concurrency: int = 4):
+    """
+    Transcribe a long local file as concurrent segments through a
+    TranscriptionClient and return one merged transcript. Files shorter than
+    a segment are transcribed in a single request.
+    """
+    segments = split_audio(file_path, segment_length, overlap)
+    if len(segments) == 1:
+        return client.transcribe(file_path, config)
+
+    print(f"Transcribing {file_path} as {len(segments)} segments...")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        transcripts = list(executor.map(lambda segment: client.transcribe(segment["path"], config), segments))
+
+    for segment, transcript in zip(segments, transcripts):
+        if transcript is None or str(getattr(transcript.status, 'value', transcript.status)) == "error":
+            error = transcript.error if transcript else "Transcription returned None"
+            return payload_to_transcript({"id": None, "status": "error", "error": f"Segment {segment['index']}: {error}",
+                                          "text": None, "language_code": None, "audio_duration": None,
+                                          "words": [], "utterances": []})
+
+    return payload_to_transcript(merge_segments(segments, transcripts, round(probe_duration(file_path))))
+
+def compare_with_unsplit(unsplit, chunked) -> Dict:
+    """
+    Word agreement between an unsplit and a chunked transcript, plus the
+    timestamp drift of the words both contain
+    """
+    unsplit_words = [word.text for word in unsplit.words]
+    chunked_words = [word.text for word in chunked.words]
+    report = token_differences(" ".join(unsplit_words), " ".join(chunked_words))
+
+    drifts = []
+    matcher = difflib.SequenceMatcher(None, unsplit_words, chunked_words, autojunk=False)
+    for block in matcher.get_matching_blocks():
+        for offset in range(block.size):
+            drifts.append(abs(unsplit.words[block.a + offset].start - chunked.words[block.b + offset].start))
+    drifts.sort()
+    report["median_start_drift_ms"] = drifts[len(drifts) // 2] if drifts else None
+    report["max_start_drift_ms"] = drifts[-1] if drifts else None
+    return report
+
+def main():
+    import assemblyai as aai
+    from dotenv import load_dotenv
+    from transcription_client import TranscriptionClient, add_cache_arguments
+    from transcription_backends import create_backend_from_args, add_backend_arguments
+
+    parser = argparse.ArgumentParser(description="Check chunked transcription against unsplit transcripts of test_audio")
+    parser.add_argument("--segment-length", type=float, default=60.0,
+                        help="Target segment length in seconds (default: 60, short enough to split the samples)")
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP, help="Seconds of overlap on each side of a cut")
+    parser.add_argument("--concurrency", type=int, default=4, help="Segments transcribed at once")
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = TranscriptionClient(create_backend_from_args(args), use_cache=not args.no_cache, refresh=args.refresh)
+    config = aai.TranscriptionConfig(language_detection=True, punctuate=True, format_text=True)
+
+    for audio_file in sorted(Path("test_audio").glob("*")):
+        if audio_file.suffix.lower() not in ['.mp3', '.wav', '.m4a', '.ogg']:
+            continue
+        print(f"\n{audio_file.name}")
+        unsplit = client.transcribe(str(audio_file), config)
+        chunked = transcribe_chunked(client, str(audio_file), config, args.segment_length, args.overlap, args.concurrency)
+        if any(str(getattr(t.status, 'value', t.status)) == "error" for t in (unsplit, chunked)):
+            print(f"Error: {unsplit.error or chunked.error}")
+            continue
+        report = compare_with_unsplit(unsplit, chunked)
+        print(f"Words (unsplit/chunked): {report['reference_tokens']}/{report['derived_tokens']}")
+        print(f"Word agreement: {report['token_agreement']:.2%}")
+        print(f"Start drift of matching words: median {report['median_start_drift_ms']} ms, "
+              f"max {report['max_start_drift_ms']} ms")
+        for example in report["examples"][:5]:
+            print(f"  {example['type']}: '{example['reference']}' -> '{example['derived']}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+One entry point for the transcription and punctuation scripts.
+
+    python cli.py transcribe [options]          # test_transcription.py
+    python cli.py analyze [options]             # corpus_analysis.py
+    python cli.py compare [options]             # compare_punctuation.py
+    python cli.py compare-one AUDIO [options]   # compare_single_audio.py
+
+Only the module of the chosen command is imported, after the command name
+is parsed, so `python cli.py --help` imports nothing but argparse, and
+torch/transformers are only imported once a command actually punctuates text.
+"""
+import sys
+import argparse
+import importlib
+
+# Command -> (module, one-line help)
+COMMANDS = {
+    "transcribe": ("test_transcription", "Transcribe and analyze every audio file in test_audio"),
+    "analyze": ("corpus_analysis", "Analyse every stored transcription result at once"),
+    "compare": ("compare_punctuation", "Compare AssemblyAI and DeepMultilingual punctuation on every file in test_audio"),
+    "compare-one": ("compare_single_audio", "Compare AssemblyAI and DeepMultilingual punctuation on one audio file")
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Transcription and punctuation comparison tools")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    for command, (_, help_text) in COMMANDS.items():
+        # The command's own options are added below, once its module is imported
+        subparsers.add_parser(command, help=help_text, add_help=False)
+    command = parser.parse_known_args(argv[:1])[0].command
+
+    module = importlib.import_module(COMMANDS[command][0])
+    command_parser = argparse.ArgumentParser(prog=f"{parser.prog} {command}", description=module.DESCRIPTION)
+    module.add_arguments(command_parser)
+    module.run(command_parser.parse_args(argv[1:]))
+
+if __name__ == "__main__":
+    main()
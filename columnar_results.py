@@ -0,0 +1,230 @@
+"""
+Compact columnar storage for word-level transcription results.
+
+A `.words` file holds the same data as a `transcription_results` JSON file,
+with `word_confidences` stored as typed columns instead of a list of dicts:
+
+    MAGIC | uint32 header length | JSON header | padding
+    text_offsets uint32[n + 1] | start int32[n] | end int32[n] | confidence float32[n] | text utf-8
+
+The header holds every other result field plus the byte offset of each
+column, so a reader can memory-map the file and touch only the columns an
+analysis needs. `duration` is not stored; it is end - start.
+
+    python columnar_results.py                    # convert transcription_results/*.json
+    python columnar_results.py --verify           # also check each round trip
+"""
+import sys
+import json
+import mmap
+import array
+import struct
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+MAGIC = b"WORDCOL1"
+COLUMN_TYPES = {"text_offsets": "I", "start": "i", "end": "i", "confidence": "f"}
+_ALIGNMENT = 8
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGNMENT)
+
+def write_columnar(results: Dict, output_file: Path) -> Path:
+    """
+    Write a result dict (as built by TranscriptionAnalyzer.transcribe_with_metrics)
+    to a columnar `.words` file
+    """
+    words = results.get("word_confidences") or []
+    encoded = [word["word"].encode('utf-8') for word in words]
+
+    columns = {name: array.array(typecode) for name, typecode in COLUMN_TYPES.items()}
+    offset = 0
+    columns["text_offsets"].append(0)
+    for word, text in zip(words, encoded):
+        offset += len(text)
+        columns["text_offsets"].append(offset)
+        columns["start"].append(word["start"])
+        columns["end"].append(word["end"])
+        columns["confidence"].append(word["confidence"])
+    text_blob = b"".join(encoded)
+
+    # Column positions are relative to the start of the data section
+    layout = {}
+    position = 0
+    for name, column in columns.items():
+        layout[name] = {"offset": position, "length": len(column), "type": column.typecode}
+        position += len(column) * column.itemsize
+    layout["text"] = {"offset": position, "length": len(text_blob), "type": "utf-8"}
+
+    header = {
+        "metadata": {key: value for key, value in results.items() if key != "word_confidences"},
+        "word_count": len(words),
+        "byteorder": sys.byteorder,
+        "columns": layout
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    prefix = MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes
+
+    output_file = Path(output_file)
+    with open(output_file, 'wb') as f:
+        f.write(prefix + _padding(len(prefix)))
+        for column in columns.values():
+            column.tofile(f)
+        f.write(text_blob)
+    return output_file
+
+class ColumnarResults:
+    """
+    Memory-mapped reader for `.words` files. Columns are zero-copy views into
+    the mapping and are only paged in when they are read.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._columns: Dict[str, memoryview] = {}
+
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a columnar results file")
+        header_length = struct.unpack_from("<I", self._mmap, len(MAGIC))[0]
+        header_end = len(MAGIC) + 4 + header_length
+        self.header = json.loads(bytes(self._view[len(MAGIC) + 4:header_end]))
+        if self.header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{self.path} was written on a {self.header['byteorder']}-endian machine")
+        self._data_start = header_end + len(_padding(header_end))
+
+    @property
+    def metadata(self) -> Dict:
+        return self.header["metadata"]
+
+    @property
+    def word_count(self) -> int:
+        return self.header["word_count"]
+
+    def column(self, name: str) -> memoryview:
+        """
+        Return one column as a typed view ("start", "end", "confidence",
+        "text_offsets", or "text" for the raw UTF-8 bytes)
+        """
+        if name not in self._columns:
+            layout = self.header["columns"][name]
+            start = self._data_start + layout["offset"]
+            if name == "text":
+                self._columns[name] = self._view[start:start + layout["length"]]
+            else:
+                size = struct.calcsize(layout["type"])
+                self._columns[name] = self._view[start:start + layout["length"] * size].cast(layout["type"])
+        return self._columns[name]
+
+    def word(self, index: int) -> str:
+        offsets = self.column("text_offsets")
+        return bytes(self.column("text")[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def words(self) -> Iterator[str]:
+        for index in range(self.word_count):
+            yield self.word(index)
+
+    def to_results(self) -> Dict:
+        """
+        Rebuild the original result dict, including the per-word `duration`
+        """
+        starts, ends, confidences = self.column("start"), self.column("end"), self.column("confidence")
+        word_confidences = [{
+            "word": text,
+            "confidence": confidences[index],
+            "start": starts[index],
+            "end": ends[index],
+            "duration": ends[index] - starts[index]
+        } for index, text in enumerate(self.words())]
+        return dict(self.metadata, word_confidences=word_confidences)
+
+    def close(self):
+        # Views must be released before the mapping can be closed
+        for column in self._columns.values():
+            column.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def verify_round_trip(json_file: Path, words_file: Path) -> List[str]:
+    """
+    Compare a JSON result with its columnar copy and return any differences.
+    Confidences are compared at float32 precision.
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        original = json.load(f)
+    with ColumnarResults(words_file) as reader:
+        restored = reader.to_results()
+
+    problems = []
+    restored_metadata = {key: value for key, value in restored.items() if key != "word_confidences"}
+    if {key: value for key, value in original.items() if key != "word_confidences"} != restored_metadata:
+        problems.append("metadata differs")
+    original_words = original.get("word_confidences") or []
+    if len(original_words) != len(restored["word_confidences"]):
+        problems.append("word count differs")
+    for index, (before, after) in enumerate(zip(original_words, restored["word_confidences"])):
+        if (before["word"], before["start"], before["end"]) != (after["word"], after["start"], after["end"]) \
+                or abs(before["confidence"] - after["confidence"]) > 1e-6:
+            problems.append(f"word {index} differs: {before} != {after}")
+            break
+    return problems
+
+def convert_results_dir(results_dir: Path = Path("transcription_results"), output_dir: Optional[Path] = None,
+                        verify: bool = False) -> List[Dict]:
+    """
+    Write a `.words` copy of every JSON result with word timings in `results_dir`
+    """
+    output_dir = Path(output_dir) if output_dir else Path(results_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report = []
+    for json_file in sorted(Path(results_dir).glob("*.json")):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        if "word_confidences" not in results:
+            continue
+
+        words_file = write_columnar(results, output_dir / f"{json_file.stem}.words")
+        entry = {
+            "file_name": json_file.name,
+            "json_bytes": json_file.stat().st_size,
+            "columnar_bytes": words_file.stat().st_size,
+            "word_count": len(results["word_confidences"])
+        }
+        if verify:
+            entry["problems"] = verify_round_trip(json_file, words_file)
+        report.append(entry)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert transcription results to compact columnar .words files")
+    parser.add_argument("--results-dir", default="transcription_results")
+    parser.add_argument("--output-dir", help="Where to write .words files (default: next to the JSON files)")
+    parser.add_argument("--verify", action="store_true", help="Check that every converted file round-trips")
+    args = parser.parse_args()
+
+    report = convert_results_dir(Path(args.results_dir), args.output_dir, verify=args.verify)
+    for entry in report:
+        ratio = entry["columnar_bytes"] / entry["json_bytes"] if entry["json_bytes"] else 0
+        print(f"{entry['file_name']}: {entry['word_count']} words, "
+              f"{entry['json_bytes']} -> {entry['columnar_bytes']} bytes ({ratio:.1%})")
+        for problem in entry.get("problems", []):
+            print(f"  Round trip problem: {problem}")
+
+    total_json = sum(entry["json_bytes"] for entry in report)
+    total_columnar = sum(entry["columnar_bytes"] for entry in report)
+    print(f"\nConverted {len(report)} files: {total_json} -> {total_columnar} bytes")
+
+if __name__ == "__main__":
+    main()
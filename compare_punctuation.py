@@ -1,122 +1,281 @@
-import os
-import time
-import json
-from datetime import datetime
-from typing import Dict, List, Tuple
-import assemblyai as aai
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 from pathlib import Path
-from deepmultilingualpunctuation import PunctuationModel
+from transcription_client import add_cache_arguments
+from transcription_backends import create_backend_from_args, add_backend_arguments
+from comparison_engine import ComparisonEngine
+from quantized_punctuation import BACKENDS
+from punctuation_metrics import print_metrics
+from pipeline import Pipeline, Stage, print_pipeline_report
+from run_manifest import RunManifest, add_manifest_arguments
+from request_scheduler import print_scheduler_report
+from punctuation_pool import print_pool_report
+from audio_preprocessing import add_preprocessing_arguments, preprocessor_from_args, print_preprocessing_report
+from punctuation_profiler import add_profiling_arguments, print_profile_report
 
 # Load environment variables
 load_dotenv()
 
-# Configure AssemblyAI
-api_key = os.getenv('ASSEMBLYAI_API_KEY')
-if not api_key:
-    raise ValueError("Please set the ASSEMBLYAI_API_KEY environment variable")
-aai.settings.api_key = api_key
+# The AssemblyAI API key is read from ASSEMBLYAI_API_KEY when the live backend is created
 
-class PunctuationComparison:
-    def __init__(self):
-        self.transcriber = aai.Transcriber()
-        self.punctuation_model = PunctuationModel()
-        self.results_dir = Path("punctuation_comparison_results")
-        self.results_dir.mkdir(exist_ok=True)
+class PunctuationComparison(ComparisonEngine):
+    def __init__(self, use_cache: bool = True, refresh: bool = False, backend=None, punctuation_backend: str = "fp32",
+                 punctuation_workers: int = 1, threads_per_worker: Optional[int] = None, preprocessor=None,
+                 profile_punctuation: bool = False, profile_trace: Optional[str] = None):
+        super().__init__(Path("punctuation_comparison_results"), use_cache=use_cache, refresh=refresh, backend=backend,
+                         punctuation_backend=punctuation_backend, punctuation_workers=punctuation_workers,
+                         threads_per_worker=threads_per_worker, preprocessor=preprocessor,
+                         profile_punctuation=profile_punctuation, profile_trace=profile_trace)
+        # Set by main() to skip files that earlier runs already compared
+        self.manifest: Optional[RunManifest] = None
+        self.manifest_config: Dict = {}
 
-    def transcribe_with_assemblyai(self, file_path: str, punctuate: bool = True) -> Dict:
-        """
-        Transcribe audio using AssemblyAI with or without punctuation
-        """
-        start_time = time.time()
-        
-        try:
-            print(f"Starting AssemblyAI transcription of {file_path}...")
-            
-            config = aai.TranscriptionConfig(
-                language_detection=True,
-                punctuate=punctuate,
-                format_text=True
-            )
-            
-            transcript = self.transcriber.transcribe(file_path, config=config)
-            processing_time = time.time() - start_time
-            
-            if transcript is None or transcript.status == aai.TranscriptStatus.error:
-                return {
-                    "status": "error",
-                    "error": transcript.error if transcript else "Transcription returned None",
-                    "processing_time": processing_time
-                }
-            
-            return {
-                "status": "success",
-                "processing_time": processing_time,
-                "text": transcript.text,
-                "language": getattr(transcript, 'language_code', 'unknown'),
-                "word_count": len(transcript.words) if hasattr(transcript, 'words') else 0
-            }
-            
-        except Exception as e:
-            print(f"AssemblyAI transcription error: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "processing_time": time.time() - start_time
-            }
+    @property
+    def manifest_engine(self) -> str:
+        if self.punctuation_backend != "fp32":
+            return f"{self.client.backend.name}+deepmultilingual-{self.punctuation_backend}"
+        return f"{self.client.backend.name}+deepmultilingual"
 
-    def process_with_deepmultilingual(self, text: str) -> Dict:
+    def record_outcome(self, audio_file: Path, output_file: Optional[Path] = None, error: Optional[str] = None):
         """
-        Process text using DeepMultilingual Punctuation
+        Record a file's outcome in the run manifest, if one is in use
         """
-        start_time = time.time()
+        if self.manifest is None:
+            return
+        if error is None:
+            self.manifest.mark_completed(audio_file, self.manifest_config, self.manifest_engine, output_file)
+        else:
+            self.manifest.mark_failed(audio_file, self.manifest_config, self.manifest_engine, error, output_file)
+            last_output = self.manifest.last_output(audio_file, self.manifest_config, self.manifest_engine)
+            if last_output is not None:
+                print(f"The result of the last successful run is kept at {last_output}")
+
+def compare_and_report(analyzer: PunctuationComparison, audio_file: Path, unpunctuated: Dict, assemblyai_punctuated: Dict,
+                       deepmultilingual: Optional[Dict] = None):
+    """
+    Run DeepMultilingual on the unpunctuated transcript (unless already done),
+    then save and display the comparison
+    """
+    if unpunctuated["status"] == "error":
+        print(f"Error in AssemblyAI transcription: {unpunctuated['error']}")
+        analyzer.record_outcome(audio_file, error=unpunctuated["error"])
+        return
+    
+    if assemblyai_punctuated["status"] == "error":
+        print(f"Error in AssemblyAI punctuation: {assemblyai_punctuated['error']}")
+        analyzer.record_outcome(audio_file, error=assemblyai_punctuated["error"])
+        return
+    
+    # Process with DeepMultilingual
+    if deepmultilingual is None:
+        deepmultilingual = analyzer.process_with_deepmultilingual(unpunctuated["text"], label=audio_file.stem)
+    if deepmultilingual["status"] == "error":
+        print(f"Error in DeepMultilingual processing: {deepmultilingual['error']}")
+        analyzer.record_outcome(audio_file, error=deepmultilingual["error"])
+        return
+    
+    # Compare results
+    comparison = analyzer.compare_texts(
+        unpunctuated["text"],
+        assemblyai_punctuated["text"],
+        deepmultilingual["text"]
+    )
+    
+    # Prepare results
+    results = {
+        "file_name": audio_file.name,
+        "language": unpunctuated["language"],
+        "single_pass": unpunctuated.get("derived_locally", False),
+        "punctuation_backend": analyzer.punctuation_backend,
+        "processing_times": {
+            "assemblyai_transcription": unpunctuated["processing_time"],
+            "assemblyai_punctuation": assemblyai_punctuated["processing_time"],
+            "deepmultilingual": deepmultilingual["processing_time"]
+        },
+        "comparison": comparison,
+        "texts": {
+            "unpunctuated": unpunctuated["text"],
+            "assemblyai_punctuated": assemblyai_punctuated["text"],
+            "deepmultilingual_punctuated": deepmultilingual["text"]
+        }
+    }
+    if "profile" in deepmultilingual:
+        results["punctuation_profile"] = deepmultilingual["profile"]
+    
+    # Save results
+    output_file = analyzer.save_results(results, audio_file.stem)
+    print(f"\nResults saved to: {output_file}")
+    analyzer.record_outcome(audio_file, output_file)
+    
+    # Display comparison
+    print("\nComparison Results:")
+    print(f"Language: {results['language']}")
+    print(f"\nProcessing Times:")
+    print(f"AssemblyAI Transcription: {results['processing_times']['assemblyai_transcription']:.2f} seconds")
+    print(f"AssemblyAI Punctuation: {results['processing_times']['assemblyai_punctuation']:.2f} seconds")
+    print(f"DeepMultilingual Processing: {results['processing_times']['deepmultilingual']:.2f} seconds")
+    
+    print(f"\nText Statistics:")
+    print(f"Original Word Count: {comparison['original_word_count']}")
+    print(f"AssemblyAI Punctuation Marks: {comparison['assemblyai_punctuation_marks']}")
+    print(f"DeepMultilingual Punctuation Marks: {comparison['deepmultilingual_punctuation_marks']}")
+    print_metrics(comparison['alignment'])
+    
+    print("\nSample of texts (first 200 characters):")
+    print("Unpunctuated:")
+    print(results['texts']['unpunctuated'][:200] + "...")
+    print("\nAssemblyAI Punctuated:")
+    print(results['texts']['assemblyai_punctuated'][:200] + "...")
+    print("\nDeepMultilingual Punctuated:")
+    print(results['texts']['deepmultilingual_punctuated'][:200] + "...")
+
+def transcribe_file(analyzer: PunctuationComparison, audio_file: Path, single_pass: bool = False) -> Tuple[Dict, Dict]:
+    """
+    Run the AssemblyAI passes for one file and return (unpunctuated, assemblyai_punctuated)
+    """
+    if single_pass:
+        # Get punctuated text from AssemblyAI and derive the unpunctuated text from its words
+        assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
+        return analyzer.derive_unpunctuated(assemblyai_punctuated), assemblyai_punctuated
+    
+    # Get unpunctuated text from AssemblyAI
+    unpunctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=False)
+    if unpunctuated["status"] == "error":
+        return unpunctuated, unpunctuated
+    
+    # Get punctuated text from AssemblyAI
+    assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
+    return unpunctuated, assemblyai_punctuated
+
+def run_pipeline(analyzer: PunctuationComparison, audio_files: List[Path], concurrency: int = 1,
+                 single_pass: bool = False, queue_size: int = 2) -> Dict:
+    """
+    Process the corpus as three stages connected by bounded queues:
+    transcription (network-bound, `concurrency` workers), DeepMultilingual
+    punctuation (CPU-bound, one worker per punctuation process) and
+    comparison/saving (one worker)
+    """
+    def transcribe_stage(audio_file: Path):
+        unpunctuated, assemblyai_punctuated = transcribe_file(analyzer, audio_file, single_pass)
+        return audio_file, unpunctuated, assemblyai_punctuated
+    
+    def punctuate_stage(item):
+        audio_file, unpunctuated, assemblyai_punctuated = item
+        deepmultilingual = None
+        if unpunctuated["status"] == "success" and assemblyai_punctuated["status"] == "success":
+            deepmultilingual = analyzer.process_with_deepmultilingual(unpunctuated["text"], label=audio_file.stem)
+        return audio_file, unpunctuated, assemblyai_punctuated, deepmultilingual
+    
+    def save_stage(item):
+        audio_file, unpunctuated, assemblyai_punctuated, deepmultilingual = item
+        print(f"\nResults for {audio_file.name}...")
+        compare_and_report(analyzer, audio_file, unpunctuated, assemblyai_punctuated, deepmultilingual)
+        return audio_file
+    
+    pipeline = Pipeline([
+        Stage("transcription", transcribe_stage, workers=concurrency, queue_size=max(queue_size, concurrency)),
+        Stage("punctuation", punctuate_stage, workers=analyzer.punctuation_workers, queue_size=queue_size),
+        Stage("comparison", save_stage, workers=1, queue_size=queue_size)
+    ])
+    pipeline.run(audio_files)
+    return pipeline.report()
+
+def transcribe_corpus(analyzer: PunctuationComparison, audio_files: List[Path], concurrency: int = 1,
+                      single_pass: bool = False) -> Iterator[Tuple[Path, Dict, Dict]]:
+    """
+    Yield (audio_file, unpunctuated, assemblyai_punctuated) for every file as its
+    AssemblyAI passes finish, running up to `concurrency` transcriptions at once
+    """
+    if concurrency <= 1:
+        # Process each audio file in the test directory
+        for audio_file in audio_files:
+            print(f"\nProcessing {audio_file.name}...")
+            unpunctuated, assemblyai_punctuated = transcribe_file(analyzer, audio_file, single_pass)
+            yield audio_file, unpunctuated, assemblyai_punctuated
+        return
+    
+    # Submit the AssemblyAI passes for every file up front and hand each file
+    # back as soon as all of its passes have finished
+    passes_per_file = [True] if single_pass else [False, True]
+    print(f"\nSubmitting {len(audio_files) * len(passes_per_file)} transcriptions with up to {concurrency} in flight...")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        for audio_file in audio_files:
+            for punctuate in passes_per_file:
+                future = executor.submit(analyzer.transcribe_with_assemblyai, str(audio_file), punctuate)
+                futures[future] = (audio_file, punctuate)
         
-        try:
-            print("Processing with DeepMultilingual Punctuation...")
-            punctuated_text = self.punctuation_model.restore_punctuation(text)
-            processing_time = time.time() - start_time
-            
-            return {
-                "status": "success",
-                "processing_time": processing_time,
-                "text": punctuated_text,
-                "word_count": len(text.split())
-            }
+        finished = {}
+        for future in as_completed(futures):
+            audio_file, punctuate = futures[future]
+            passes = finished.setdefault(audio_file, {})
+            passes[punctuate] = future.result()
+            if len(passes) < len(passes_per_file):
+                continue
             
-        except Exception as e:
-            print(f"DeepMultilingual processing error: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "processing_time": time.time() - start_time
-            }
+            print(f"\nProcessing {audio_file.name}...")
+            unpunctuated = passes[False] if False in passes else analyzer.derive_unpunctuated(passes[True])
+            del finished[audio_file]
+            yield audio_file, unpunctuated, passes[True]
 
-    def save_results(self, results: Dict, filename: str):
-        """
-        Save comparison results to a JSON file
-        """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.results_dir / f"{filename}_{timestamp}.json"
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        
-        return output_file
+DESCRIPTION = "Compare AssemblyAI and DeepMultilingual punctuation on every file in test_audio"
 
-    def compare_texts(self, original: str, assemblyai: str, deepmultilingual: str) -> Dict:
-        """
-        Compare the different versions of the text
-        """
-        return {
-            "original_word_count": len(original.split()),
-            "assemblyai_word_count": len(assemblyai.split()),
-            "deepmultilingual_word_count": len(deepmultilingual.split()),
-            "assemblyai_punctuation_marks": sum(1 for c in assemblyai if c in '.,!?;:'),
-            "deepmultilingual_punctuation_marks": sum(1 for c in deepmultilingual if c in '.,!?;:')
-        }
+def add_arguments(parser):
+    """
+    Add the options of this script (the `compare` command of cli.py) to an argument parser
+    """
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum number of AssemblyAI transcriptions in flight at once (default: 1, sequential)")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Transcribe once with punctuation and derive the unpunctuated text locally")
+    parser.add_argument("--batch-punctuation", action="store_true",
+                        help="Transcribe every file first, then punctuate all transcripts in batches")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Windows per DeepMultilingual forward pass with --batch-punctuation (default: 8)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="torch intra-op thread count for DeepMultilingual")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap transcription, punctuation and saving in stages connected by bounded queues")
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="Capacity of each queue between pipeline stages (default: 2)")
+    parser.add_argument("--punctuation-backend", choices=BACKENDS, default="fp32",
+                        help="DeepMultilingual inference: fp32 (default), dynamic int8 quantization or ONNX Runtime")
+    parser.add_argument("--punctuation-workers", type=int, default=1,
+                        help="DeepMultilingual worker processes pulling transcripts from a shared queue "
+                             "(default: 1, in-process); use with --batch-punctuation or --pipeline")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per punctuation worker (default: cores / workers)")
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_manifest_arguments(parser)
+    add_preprocessing_arguments(parser)
+    add_profiling_arguments(parser)
 
-def main():
-    analyzer = PunctuationComparison()
+def finish_run(analyzer: PunctuationComparison):
+    """
+    Stop the punctuation workers, if any, and print the scheduler, pool, profiling and preprocessing reports
+    """
+    analyzer.close()
+    print_scheduler_report(analyzer.client.backend)
+    print_pool_report(analyzer.punctuation_pool)
+    print_profile_report(analyzer.punctuation_profiler)
+    print_preprocessing_report(analyzer.client.preprocessor, analyzer.client.backend)
+
+def run(args):
+    if args.torch_threads:
+        import torch
+        torch.set_num_threads(args.torch_threads)
+    
+    analyzer = PunctuationComparison(use_cache=not args.no_cache, refresh=args.refresh,
+                                     backend=create_backend_from_args(args), punctuation_backend=args.punctuation_backend,
+                                     punctuation_workers=args.punctuation_workers,
+                                     threads_per_worker=args.threads_per_worker,
+                                     preprocessor=preprocessor_from_args(args),
+                                     profile_punctuation=args.profile_punctuation, profile_trace=args.profile_trace)
+    if analyzer.profile_punctuation and args.batch_punctuation:
+        print("Note: --profile-punctuation profiles one transcript at a time and is ignored with --batch-punctuation")
     
     # Test files directory
     test_files_dir = Path("test_audio")
@@ -124,77 +283,63 @@ def main():
         print(f"Please create a 'test_audio' directory and add your audio files there.")
         return
     
-    # Process each audio file in the test directory
-    for audio_file in test_files_dir.glob("*"):
-        if audio_file.suffix.lower() in ['.mp3', '.wav', '.m4a', '.ogg']:
-            print(f"\nProcessing {audio_file.name}...")
-            
-            # Get unpunctuated text from AssemblyAI
-            unpunctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=False)
-            if unpunctuated["status"] == "error":
-                print(f"Error in AssemblyAI transcription: {unpunctuated['error']}")
-                continue
-            
-            # Get punctuated text from AssemblyAI
-            assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
-            if assemblyai_punctuated["status"] == "error":
-                print(f"Error in AssemblyAI punctuation: {assemblyai_punctuated['error']}")
-                continue
-            
-            # Process with DeepMultilingual
-            deepmultilingual = analyzer.process_with_deepmultilingual(unpunctuated["text"])
-            if deepmultilingual["status"] == "error":
-                print(f"Error in DeepMultilingual processing: {deepmultilingual['error']}")
-                continue
-            
-            # Compare results
-            comparison = analyzer.compare_texts(
-                unpunctuated["text"],
-                assemblyai_punctuated["text"],
-                deepmultilingual["text"]
-            )
-            
-            # Prepare results
-            results = {
-                "file_name": audio_file.name,
-                "language": unpunctuated["language"],
-                "processing_times": {
-                    "assemblyai_transcription": unpunctuated["processing_time"],
-                    "assemblyai_punctuation": assemblyai_punctuated["processing_time"],
-                    "deepmultilingual": deepmultilingual["processing_time"]
-                },
-                "comparison": comparison,
-                "texts": {
-                    "unpunctuated": unpunctuated["text"],
-                    "assemblyai_punctuated": assemblyai_punctuated["text"],
-                    "deepmultilingual_punctuated": deepmultilingual["text"]
-                }
-            }
-            
-            # Save results
-            output_file = analyzer.save_results(results, audio_file.stem)
-            print(f"\nResults saved to: {output_file}")
-            
-            # Display comparison
-            print("\nComparison Results:")
-            print(f"Language: {results['language']}")
-            print(f"\nProcessing Times:")
-            print(f"AssemblyAI Transcription: {results['processing_times']['assemblyai_transcription']:.2f} seconds")
-            print(f"AssemblyAI Punctuation: {results['processing_times']['assemblyai_punctuation']:.2f} seconds")
-            print(f"DeepMultilingual Processing: {results['processing_times']['deepmultilingual']:.2f} seconds")
-            
-            print(f"\nText Statistics:")
-            print(f"Original Word Count: {comparison['original_word_count']}")
-            print(f"AssemblyAI Punctuation Marks: {comparison['assemblyai_punctuation_marks']}")
-            print(f"DeepMultilingual Punctuation Marks: {comparison['deepmultilingual_punctuation_marks']}")
-            
-            print("\nSample of texts (first 200 characters):")
-            print("Unpunctuated:")
-            print(results['texts']['unpunctuated'][:200] + "...")
-            print("\nAssemblyAI Punctuated:")
-            print(results['texts']['assemblyai_punctuated'][:200] + "...")
-            print("\nDeepMultilingual Punctuated:")
-            print(results['texts']['deepmultilingual_punctuated'][:200] + "...")
+    audio_files = [audio_file for audio_file in test_files_dir.glob("*")
+                   if audio_file.suffix.lower() in ['.mp3', '.wav', '.m4a', '.ogg']]
+    
+    # Skip files that an earlier run already compared with the same settings
+    analyzer.manifest = RunManifest(Path(".cache/manifests/compare_punctuation.json"),
+                                    retry_failed=args.retry_failed, rerun_all=args.rerun_all)
+    analyzer.manifest_config = {"single_pass": args.single_pass}
+    # Options that change the saved results; left out at their defaults so older manifest entries still match
+    if analyzer.client.preprocessor is not None:
+        analyzer.manifest_config["preprocessing"] = analyzer.client.preprocessor.manifest_config
+    if analyzer.profile_punctuation and not args.batch_punctuation:
+        analyzer.manifest_config["profile_punctuation"] = analyzer.profile_trace or True
+    all_files = audio_files
+    audio_files = [audio_file for audio_file in all_files
+                   if analyzer.manifest.needs_processing(audio_file, analyzer.manifest_config, analyzer.manifest_engine)]
+    print(f"{len(audio_files)} of {len(all_files)} files to process "
+          f"({len(all_files) - len(audio_files)} already done or failed; see --retry-failed, --rerun-all)")
+    for audio_file in audio_files:
+        analyzer.manifest.mark_running(audio_file, analyzer.manifest_config, analyzer.manifest_engine)
+    
+    if analyzer.punctuation_workers > 1 and audio_files:
+        # Fork the punctuation workers now, before the transcription threads start
+        analyzer.punctuation_model
+    
+    if args.pipeline:
+        report = run_pipeline(analyzer, audio_files, args.concurrency, args.single_pass, args.queue_size)
+        print_pipeline_report(report)
+        finish_run(analyzer)
+        return
+    
+    transcribed = transcribe_corpus(analyzer, audio_files, args.concurrency, args.single_pass)
+    
+    if not args.batch_punctuation:
+        for audio_file, unpunctuated, assemblyai_punctuated in transcribed:
+            compare_and_report(analyzer, audio_file, unpunctuated, assemblyai_punctuated)
+        finish_run(analyzer)
+        return
+    
+    # Punctuate every successfully transcribed file in one batched run
+    transcribed = list(transcribed)
+    ready = [item for item in transcribed if item[1]["status"] == "success" and item[2]["status"] == "success"]
+    batch_results = analyzer.process_batch_with_deepmultilingual(
+        [unpunctuated["text"] for _, unpunctuated, _ in ready],
+        batch_size=args.batch_size
+    )
+    deepmultilingual_results = {audio_file: result for (audio_file, _, _), result in zip(ready, batch_results)}
+    
+    for audio_file, unpunctuated, assemblyai_punctuated in transcribed:
+        print(f"\nResults for {audio_file.name}...")
+        compare_and_report(analyzer, audio_file, unpunctuated, assemblyai_punctuated,
+                           deepmultilingual_results.get(audio_file))
+    finish_run(analyzer)
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run(parser.parse_args())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
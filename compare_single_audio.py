@@ -1,166 +1,96 @@
-import os
-import time
-import json
-from datetime import datetime
-from typing import Dict, List, Tuple
-import assemblyai as aai
+import argparse
 from dotenv import load_dotenv
 from pathlib import Path
-from deepmultilingualpunctuation import PunctuationModel
+from typing import Optional
+from transcription_client import add_cache_arguments
+from transcription_backends import create_backend_from_args, add_backend_arguments
+from comparison_engine import ComparisonEngine
+from quantized_punctuation import BACKENDS
+from punctuation_metrics import print_metrics
+from audio_preprocessing import add_preprocessing_arguments, preprocessor_from_args, print_preprocessing_report
+from punctuation_profiler import add_profiling_arguments, print_profile_report
 
 # Load environment variables
 load_dotenv()
 
-# Configure AssemblyAI
-api_key = os.getenv('ASSEMBLYAI_API_KEY')
-if not api_key:
-    raise ValueError("Please set the ASSEMBLYAI_API_KEY environment variable")
-aai.settings.api_key = api_key
+# The AssemblyAI API key is read from ASSEMBLYAI_API_KEY when the live backend is created
 
-# ============================================================
-# EDIT THIS VARIABLE TO SPECIFY WHICH AUDIO FILE TO TEST
-# Example: TARGET_AUDIO = "grit-english.mp3"
-# The audio file should be in the test_audio directory
-TARGET_AUDIO = "grit-english.mp3"
-# ============================================================
+# Compared when no file is given on the command line
+DEFAULT_AUDIO = "grit-english.mp3"
 
-class SingleAudioComparison:
-    def __init__(self):
-        self.transcriber = aai.Transcriber()
-        self.punctuation_model = PunctuationModel()
-        self.results_dir = Path("single_audio_results")
-        self.results_dir.mkdir(exist_ok=True)
+class SingleAudioComparison(ComparisonEngine):
+    def __init__(self, use_cache: bool = True, refresh: bool = False, backend=None, punctuation_backend: str = "fp32",
+                 preprocessor=None, profile_punctuation: bool = False, profile_trace: Optional[str] = None):
+        super().__init__(Path("single_audio_results"), use_cache=use_cache, refresh=refresh, backend=backend,
+                         punctuation_backend=punctuation_backend, preprocessor=preprocessor,
+                         profile_punctuation=profile_punctuation, profile_trace=profile_trace)
 
-    def transcribe_with_assemblyai(self, file_path: str, punctuate: bool = True) -> Dict:
-        """
-        Transcribe audio using AssemblyAI with or without punctuation
-        """
-        start_time = time.time()
-        
-        try:
-            print(f"Starting AssemblyAI transcription of {file_path}...")
-            
-            config = aai.TranscriptionConfig(
-                language_detection=True,
-                punctuate=punctuate,
-                format_text=True
-            )
-            
-            transcript = self.transcriber.transcribe(file_path, config=config)
-            processing_time = time.time() - start_time
-            
-            if transcript is None or transcript.status == aai.TranscriptStatus.error:
-                return {
-                    "status": "error",
-                    "error": transcript.error if transcript else "Transcription returned None",
-                    "processing_time": processing_time
-                }
-            
-            return {
-                "status": "success",
-                "processing_time": processing_time,
-                "text": transcript.text,
-                "language": getattr(transcript, 'language_code', 'unknown'),
-                "word_count": len(transcript.words) if hasattr(transcript, 'words') else 0
-            }
-            
-        except Exception as e:
-            print(f"AssemblyAI transcription error: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "processing_time": time.time() - start_time
-            }
-
-    def process_with_deepmultilingual(self, text: str) -> Dict:
-        """
-        Process text using DeepMultilingual Punctuation
-        """
-        start_time = time.time()
-        
-        try:
-            print("Processing with DeepMultilingual Punctuation...")
-            punctuated_text = self.punctuation_model.restore_punctuation(text)
-            processing_time = time.time() - start_time
-            
-            return {
-                "status": "success",
-                "processing_time": processing_time,
-                "text": punctuated_text,
-                "word_count": len(text.split())
-            }
-            
-        except Exception as e:
-            print(f"DeepMultilingual processing error: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "processing_time": time.time() - start_time
-            }
+DESCRIPTION = "Compare AssemblyAI and DeepMultilingual punctuation on one audio file"
 
-    def save_results(self, results: Dict, filename: str):
-        """
-        Save comparison results to a JSON file
-        """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.results_dir / f"{filename}_{timestamp}.json"
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        
-        return output_file
+def add_arguments(parser):
+    """
+    Add the options of this script (the `compare-one` command of cli.py) to an argument parser
+    """
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO,
+                        help=f"Audio file: a path, or a file name in test_audio (default: {DEFAULT_AUDIO})")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Transcribe once with punctuation and derive the unpunctuated text locally")
+    parser.add_argument("--punctuation-backend", choices=BACKENDS, default="fp32",
+                        help="DeepMultilingual inference: fp32 (default), dynamic int8 quantization or ONNX Runtime")
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_preprocessing_arguments(parser)
+    add_profiling_arguments(parser)
 
-    def compare_texts(self, original: str, assemblyai: str, deepmultilingual: str) -> Dict:
-        """
-        Compare the different versions of the text
-        """
-        return {
-            "original_word_count": len(original.split()),
-            "assemblyai_word_count": len(assemblyai.split()),
-            "deepmultilingual_word_count": len(deepmultilingual.split()),
-            "assemblyai_punctuation_marks": sum(1 for c in assemblyai if c in '.,!?;:'),
-            "deepmultilingual_punctuation_marks": sum(1 for c in deepmultilingual if c in '.,!?;:')
-        }
-
-def main():
-    analyzer = SingleAudioComparison()
-    
-    # Test files directory
-    test_files_dir = Path("test_audio")
-    if not test_files_dir.exists():
-        print(f"Error: Please create a 'test_audio' directory and add your audio files there.")
-        return
+def run(args):
+    analyzer = SingleAudioComparison(use_cache=not args.no_cache, refresh=args.refresh,
+                                     backend=create_backend_from_args(args), punctuation_backend=args.punctuation_backend,
+                                     preprocessor=preprocessor_from_args(args),
+                                     profile_punctuation=args.profile_punctuation, profile_trace=args.profile_trace)
     
-    # Get the target audio file
-    audio_file = test_files_dir / TARGET_AUDIO
+    # A path as given, otherwise a file in the test_audio directory
+    audio_file = Path(args.audio)
+    if not audio_file.exists():
+        audio_file = Path("test_audio") / args.audio
     if not audio_file.exists():
-        print(f"Error: The specified audio file '{TARGET_AUDIO}' was not found in the test_audio directory.")
+        print(f"Error: The specified audio file '{args.audio}' was not found (as a path or in the test_audio directory).")
         return
     
     if audio_file.suffix.lower() not in ['.mp3', '.wav', '.m4a', '.ogg']:
-        print(f"Error: The file '{TARGET_AUDIO}' is not a supported audio format.")
+        print(f"Error: The file '{args.audio}' is not a supported audio format.")
         print("Supported formats: .mp3, .wav, .m4a, .ogg")
         return
     
     print(f"\nProcessing {audio_file.name}...")
     
-    # Get unpunctuated text from AssemblyAI
-    print("\n1. Getting unpunctuated transcription...")
-    unpunctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=False)
-    if unpunctuated["status"] == "error":
-        print(f"Error in AssemblyAI transcription: {unpunctuated['error']}")
-        return
-    
-    # Get punctuated text from AssemblyAI
-    print("\n2. Getting punctuated transcription from AssemblyAI...")
-    assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
-    if assemblyai_punctuated["status"] == "error":
-        print(f"Error in AssemblyAI punctuation: {assemblyai_punctuated['error']}")
-        return
+    if args.single_pass:
+        # Get punctuated text from AssemblyAI and derive the unpunctuated text from its words
+        print("\n1. Getting punctuated transcription from AssemblyAI...")
+        assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
+        if assemblyai_punctuated["status"] == "error":
+            print(f"Error in AssemblyAI punctuation: {assemblyai_punctuated['error']}")
+            return
+        
+        print("\n2. Deriving unpunctuated transcription locally...")
+        unpunctuated = analyzer.derive_unpunctuated(assemblyai_punctuated)
+    else:
+        # Get unpunctuated text from AssemblyAI
+        print("\n1. Getting unpunctuated transcription...")
+        unpunctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=False)
+        if unpunctuated["status"] == "error":
+            print(f"Error in AssemblyAI transcription: {unpunctuated['error']}")
+            return
+        
+        # Get punctuated text from AssemblyAI
+        print("\n2. Getting punctuated transcription from AssemblyAI...")
+        assemblyai_punctuated = analyzer.transcribe_with_assemblyai(str(audio_file), punctuate=True)
+        if assemblyai_punctuated["status"] == "error":
+            print(f"Error in AssemblyAI punctuation: {assemblyai_punctuated['error']}")
+            return
     
     # Process with DeepMultilingual
     print("\n3. Processing with DeepMultilingual Punctuation...")
-    deepmultilingual = analyzer.process_with_deepmultilingual(unpunctuated["text"])
+    deepmultilingual = analyzer.process_with_deepmultilingual(unpunctuated["text"], label=audio_file.stem)
     if deepmultilingual["status"] == "error":
         print(f"Error in DeepMultilingual processing: {deepmultilingual['error']}")
         return
@@ -176,6 +106,8 @@ def main():
     results = {
         "file_name": audio_file.name,
         "language": unpunctuated["language"],
+        "single_pass": unpunctuated.get("derived_locally", False),
+        "punctuation_backend": analyzer.punctuation_backend,
         "processing_times": {
             "assemblyai_transcription": unpunctuated["processing_time"],
             "assemblyai_punctuation": assemblyai_punctuated["processing_time"],
@@ -188,6 +120,8 @@ def main():
             "deepmultilingual_punctuated": deepmultilingual["text"]
         }
     }
+    if "profile" in deepmultilingual:
+        results["punctuation_profile"] = deepmultilingual["profile"]
     
     # Save results
     output_file = analyzer.save_results(results, audio_file.stem)
@@ -206,6 +140,7 @@ def main():
     print(f"Original Word Count: {comparison['original_word_count']}")
     print(f"AssemblyAI Punctuation Marks: {comparison['assemblyai_punctuation_marks']}")
     print(f"DeepMultilingual Punctuation Marks: {comparison['deepmultilingual_punctuation_marks']}")
+    print_metrics(comparison['alignment'])
     
     print("\n=== Sample Outputs (first 200 characters) ===")
     print("\n1. Unpunctuated Text:")
@@ -214,6 +149,13 @@ def main():
     print(results['texts']['assemblyai_punctuated'][:200] + "...")
     print("\n3. DeepMultilingual Punctuated:")
     print(results['texts']['deepmultilingual_punctuated'][:200] + "...")
+    print_profile_report(analyzer.punctuation_profiler)
+    print_preprocessing_report(analyzer.client.preprocessor, analyzer.client.backend)
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run(parser.parse_args())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""
+The steps shared by the comparison commands (`compare` and `compare-one`):
+AssemblyAI transcription with or without punctuation, local derivation of
+the unpunctuated text, DeepMultilingual punctuation and the text comparison.
+
+The DeepMultilingual model (torch + transformers) is only imported and
+loaded when a text is actually punctuated.
+"""
+import time
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import assemblyai as aai
+
+from transcription_client import TranscriptionClient
+from transcript_cache import transcript_language
+from transcription_backends import create_backend
+from single_pass import derive_unpunctuated_text
+from punctuation_daemon import load_punctuation_model
+from punctuation_metrics import punctuation_metrics
+
+class ComparisonEngine:
+    def __init__(self, results_dir: Path, use_cache: bool = True, refresh: bool = False, backend=None,
+                 punctuation_backend: str = "fp32", punctuation_workers: int = 1,
+                 threads_per_worker: Optional[int] = None, preprocessor=None, profile_punctuation: bool = False,
+                 profile_trace: Optional[str] = None):
+        # Live AssemblyAI unless a replay or fake-server backend is passed in
+        self.client = TranscriptionClient(backend or create_backend(), use_cache=use_cache, refresh=refresh,
+                                          preprocessor=preprocessor)
+        # "fp32", or an optimized CPU backend from quantized_punctuation.py
+        self.punctuation_backend = punctuation_backend
+        # More than one worker punctuates in a PunctuationPool of processes
+        self.punctuation_workers = punctuation_workers
+        self.threads_per_worker = threads_per_worker
+        # Loaded on first use, so runs where every file is skipped or fails never load it
+        self._punctuation_model = None
+        self.results_dir = Path(results_dir)
+        self.results_dir.mkdir(exist_ok=True)
+        # Per-stage punctuation timings (see punctuation_profiler.py), traces go to <results_dir>/profiles
+        self.profile_punctuation = profile_punctuation or profile_trace is not None
+        self.profile_trace = profile_trace
+        self._punctuation_profiler = None
+
+    @property
+    def punctuation_model(self):
+        # Served by the punctuation daemon when it is running, loaded in-process otherwise
+        if self._punctuation_model is None:
+            if self.punctuation_workers > 1:
+                from punctuation_pool import PunctuationPool
+                self._punctuation_model = PunctuationPool(self.punctuation_workers, self.threads_per_worker,
+                                                          self.punctuation_backend).start()
+            else:
+                self._punctuation_model = load_punctuation_model(backend=self.punctuation_backend)
+        return self._punctuation_model
+
+    @property
+    def punctuation_profiler(self):
+        """
+        The PunctuationProfiler timing the punctuation stages, once a text has been profiled
+        """
+        return self._punctuation_profiler
+
+    @property
+    def punctuation_pool(self):
+        """
+        The PunctuationPool punctuating for this engine, if one was started
+        """
+        from punctuation_pool import PunctuationPool
+        return self._punctuation_model if isinstance(self._punctuation_model, PunctuationPool) else None
+
+    def close(self):
+        """
+        Stop the punctuation worker pool, if one was started
+        """
+        if self.punctuation_pool is not None:
+            self.punctuation_pool.close()
+
+    def transcribe_with_assemblyai(self, file_path: str, punctuate: bool = True) -> Dict:
+        """
+        Transcribe audio using AssemblyAI with or without punctuation
+        """
+        start_time = time.time()
+        
+        try:
+            print(f"Starting AssemblyAI transcription of {file_path}...")
+            
+            config = aai.TranscriptionConfig(
+                language_detection=True,
+                punctuate=punctuate,
+                format_text=True
+            )
+            
+            transcript = self.client.transcribe(file_path, config)
+            processing_time = time.time() - start_time
+            
+            if transcript is None or transcript.status == aai.TranscriptStatus.error:
+                return {
+                    "status": "error",
+                    "error": transcript.error if transcript else "Transcription returned None",
+                    "processing_time": processing_time
+                }
+            
+            return {
+                "status": "success",
+                "processing_time": processing_time,
+                "text": transcript.text,
+                "language": transcript_language(transcript) or 'unknown',
+                "word_count": len(transcript.words) if hasattr(transcript, 'words') else 0,
+                "words": [word.text for word in transcript.words] if getattr(transcript, 'words', None) else []
+            }
+            
+        except Exception as e:
+            print(f"AssemblyAI transcription error: {str(e)}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "processing_time": time.time() - start_time
+            }
+
+    def derive_unpunctuated(self, punctuated: Dict) -> Dict:
+        """
+        Build the punctuate=False transcript locally from a punctuated AssemblyAI result
+        """
+        if punctuated["status"] == "error":
+            return punctuated
+        
+        start_time = time.time()
+        text = derive_unpunctuated_text(punctuated["words"])
+        return {
+            "status": "success",
+            "processing_time": time.time() - start_time,
+            "text": text,
+            "language": punctuated["language"],
+            "word_count": punctuated["word_count"],
+            "derived_locally": True
+        }
+
+    def process_with_deepmultilingual(self, text: str, label: str = "punctuation") -> Dict:
+        """
+        Process text using DeepMultilingual Punctuation. With profiling on,
+        the result also carries the per-stage breakdown under "profile";
+        `label` names the trace file.
+        """
+        start_time = time.time()
+        
+        try:
+            print("Processing with DeepMultilingual Punctuation...")
+            profile = None
+            if self.profile_punctuation:
+                if self._punctuation_profiler is None:
+                    from punctuation_profiler import PunctuationProfiler
+                    self._punctuation_profiler = PunctuationProfiler(self.punctuation_model, trace=self.profile_trace,
+                                                                     trace_dir=self.results_dir / "profiles")
+                punctuated_text, profile = self._punctuation_profiler.restore_punctuation(text, label=label)
+            else:
+                punctuated_text = self.punctuation_model.restore_punctuation(text)
+            processing_time = time.time() - start_time
+            
+            result = {
+                "status": "success",
+                "processing_time": processing_time,
+                "text": punctuated_text,
+                "word_count": len(text.split())
+            }
+            if profile is not None:
+                result["profile"] = profile
+            return result
+            
+        except Exception as e:
+            print(f"DeepMultilingual processing error: {str(e)}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "processing_time": time.time() - start_time
+            }
+
+    def process_batch_with_deepmultilingual(self, texts: List[str], batch_size: int = 8, num_threads: Optional[int] = None) -> List[Dict]:
+        """
+        Process many texts at once with the batched DeepMultilingual engine.
+        Each text is charged a share of the batch time proportional to its word count.
+        """
+        start_time = time.time()
+        
+        try:
+            print(f"Processing {len(texts)} transcripts with batched DeepMultilingual Punctuation...")
+            if hasattr(self.punctuation_model, 'restore_punctuation_batch'):
+                # The punctuation daemon batches on its side
+                punctuated_texts = self.punctuation_model.restore_punctuation_batch(texts)
+            else:
+                from punctuation_engine import BatchPunctuationEngine
+                engine = BatchPunctuationEngine(model=self.punctuation_model, batch_size=batch_size, num_threads=num_threads)
+                punctuated_texts = engine.restore_punctuation_batch(texts)
+            processing_time = time.time() - start_time
+            
+            total_words = max(1, sum(len(text.split()) for text in texts))
+            print(f"Batched throughput: {total_words / processing_time:.2f} words/second")
+            return [{
+                "status": "success",
+                "processing_time": processing_time * len(text.split()) / total_words,
+                "text": punctuated_text,
+                "word_count": len(text.split())
+            } for text, punctuated_text in zip(texts, punctuated_texts)]
+            
+        except Exception as e:
+            print(f"DeepMultilingual processing error: {str(e)}")
+            return [{
+                "status": "error",
+                "error": str(e),
+                "processing_time": time.time() - start_time
+            } for _ in texts]
+
+    def save_results(self, results: Dict, filename: str):
+        """
+        Save comparison results to a JSON file
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = self.results_dir / f"{filename}_{timestamp}.json"
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        
+        return output_file
+
+    def compare_texts(self, original: str, assemblyai: str, deepmultilingual: str) -> Dict:
+        """
+        Compare the different versions of the text: mark counts plus
+        alignment-based per-mark F1, capitalization agreement and WER
+        """
+        return {
+            "original_word_count": len(original.split()),
+            "assemblyai_word_count": len(assemblyai.split()),
+            "deepmultilingual_word_count": len(deepmultilingual.split()),
+            "assemblyai_punctuation_marks": sum(1 for c in assemblyai if c in '.,!?;:'),
+            "deepmultilingual_punctuation_marks": sum(1 for c in deepmultilingual if c in '.,!?;:'),
+            "alignment": punctuation_metrics(original, assemblyai, deepmultilingual)
+        }
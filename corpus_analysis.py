@@ -0,0 +1,300 @@
+"""
+Corpus-wide analysis of every stored transcription result.
+
+All word-level results in `transcription_results/` (JSON, streamed `.jsonl`
+or columnar `.words` files) are loaded into flat numpy arrays once, and every statistic
+is computed with vectorized operations over the whole corpus:
+
+- confidence histograms, overall and per language/config
+- confidence percentiles per language/config
+- runs of consecutive low-confidence words (spans)
+- speaking rate, word duration and pause statistics from start/end
+
+    python corpus_analysis.py
+    python corpus_analysis.py --low-confidence 0.6 --top-spans 20
+"""
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from columnar_results import ColumnarResults
+from streaming_results import StreamingResults
+
+PERCENTILES = [5, 25, 50, 75, 95]
+# Gaps between words longer than this count as pauses, not articulation
+PAUSE_THRESHOLD_MS = 250
+
+class Corpus:
+    """
+    Flat, word-aligned arrays for a whole results directory. `file_index`
+    maps every word to its entry in `files`.
+    """
+    def __init__(self, files: List[Dict], words: List[str], confidence: np.ndarray, start: np.ndarray,
+                 end: np.ndarray, file_index: np.ndarray):
+        self.files = files
+        self.words = words
+        self.confidence = confidence
+        self.start = start
+        self.end = end
+        self.file_index = file_index
+
+    @classmethod
+    def load(cls, results_dir: Path = Path("transcription_results")) -> "Corpus":
+        """
+        Load every result with word timings. A columnar copy is preferred over
+        a streamed one, and both over the JSON file with the same name.
+        """
+        sources = {}
+        for pattern in ("*.json", "*.jsonl", "*.words"):
+            for result_file in sorted(Path(results_dir).glob(pattern)):
+                sources[result_file.stem] = result_file
+
+        files, words, confidences, starts, ends = [], [], [], [], []
+        for stem, result_file in sorted(sources.items()):
+            if result_file.suffix == ".words":
+                with ColumnarResults(result_file) as reader:
+                    metadata = reader.metadata
+                    if metadata.get("status") != "success":
+                        continue
+                    confidences.append(np.frombuffer(reader.column("confidence"), dtype=np.float32).copy())
+                    starts.append(np.frombuffer(reader.column("start"), dtype=np.int32).copy())
+                    ends.append(np.frombuffer(reader.column("end"), dtype=np.int32).copy())
+                    words.extend(reader.words())
+            elif result_file.suffix == ".jsonl":
+                with StreamingResults(result_file) as reader:
+                    metadata = reader.header
+                    if metadata.get("status") != "success":
+                        continue
+                    # Word records are read one chunk at a time
+                    chunk_confidences, chunk_starts, chunk_ends = [], [], []
+                    for chunk in reader.chunks():
+                        chunk_confidences.append(np.array(chunk["confidence"], np.float32))
+                        chunk_starts.append(np.array(chunk["start"], np.int32))
+                        chunk_ends.append(np.array(chunk["end"], np.int32))
+                        words.extend(chunk["word"])
+                    confidences.append(np.concatenate(chunk_confidences) if chunk_confidences else np.zeros(0, np.float32))
+                    starts.append(np.concatenate(chunk_starts) if chunk_starts else np.zeros(0, np.int32))
+                    ends.append(np.concatenate(chunk_ends) if chunk_ends else np.zeros(0, np.int32))
+            else:
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                if result.get("status") != "success" or "word_confidences" not in result:
+                    continue
+                metadata = result
+                word_confidences = result["word_confidences"]
+                confidences.append(np.fromiter((word["confidence"] for word in word_confidences), np.float32,
+                                               len(word_confidences)))
+                starts.append(np.fromiter((word["start"] for word in word_confidences), np.int32, len(word_confidences)))
+                ends.append(np.fromiter((word["end"] for word in word_confidences), np.int32, len(word_confidences)))
+                words.extend(word["word"] for word in word_confidences)
+
+            files.append({
+                "file_name": result_file.name,
+                "language": metadata.get("language") or "unknown",
+                # Results saved before punctuation was configurable were punctuated
+                "config": "punctuated" if metadata.get("punctuated", True) else "unpunctuated",
+                "word_count": len(confidences[-1])
+            })
+
+        if not files:
+            return cls([], [], np.zeros(0, np.float32), np.zeros(0, np.int32), np.zeros(0, np.int32),
+                       np.zeros(0, np.int32))
+
+        counts = np.array([file["word_count"] for file in files])
+        return cls(files, words, np.concatenate(confidences), np.concatenate(starts), np.concatenate(ends),
+                   np.repeat(np.arange(len(files), dtype=np.int32), counts))
+
+    def groups(self) -> Dict[str, np.ndarray]:
+        """
+        Word masks per "language/config" group, plus "all"
+        """
+        labels = np.array([f"{file['language']}/{file['config']}" for file in self.files])
+        word_labels = labels[self.file_index] if len(self.files) else np.array([], dtype=str)
+        groups = {"all": np.ones(len(self.confidence), dtype=bool)}
+        for label in np.unique(labels):
+            groups[str(label)] = word_labels == label
+        return groups
+
+def confidence_statistics(corpus: Corpus, bins: int = 10) -> Dict:
+    """
+    Confidence histogram and percentiles for every language/config group
+    """
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    statistics = {}
+    for label, mask in corpus.groups().items():
+        confidence = corpus.confidence[mask]
+        if not len(confidence):
+            continue
+        counts, _ = np.histogram(confidence, bins=edges)
+        statistics[label] = {
+            "word_count": int(len(confidence)),
+            "mean": float(confidence.mean()),
+            "percentiles": {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(confidence, PERCENTILES))},
+            "histogram": {"edges": edges.round(2).tolist(), "counts": counts.tolist()}
+        }
+    return statistics
+
+def low_confidence_spans(corpus: Corpus, threshold: float = 0.5, top: int = 10) -> Dict:
+    """
+    Find runs of consecutive words below the confidence threshold. Runs never
+    cross file boundaries. Returns span counts and the longest spans.
+    """
+    low = corpus.confidence < threshold
+    # A run starts where a low word follows a confident word or begins a file
+    new_file = np.ones(len(low), dtype=bool)
+    new_file[1:] = corpus.file_index[1:] != corpus.file_index[:-1]
+    previous_low = np.zeros(len(low), dtype=bool)
+    previous_low[1:] = low[:-1]
+    run_starts = np.flatnonzero(low & (new_file | ~previous_low))
+
+    # and ends at a low word followed by a confident word or a new file
+    next_breaks = np.ones(len(low), dtype=bool)
+    next_breaks[:-1] = ~low[1:] | new_file[1:]
+    run_ends = np.flatnonzero(low & next_breaks) + 1
+    lengths = run_ends - run_starts
+
+    spans = []
+    for index in np.argsort(-lengths, kind='stable')[:top]:
+        first, last = int(run_starts[index]), int(run_ends[index])
+        spans.append({
+            "file_name": corpus.files[corpus.file_index[first]]["file_name"],
+            "words": int(lengths[index]),
+            "start": int(corpus.start[first]),
+            "end": int(corpus.end[last - 1]),
+            "mean_confidence": float(corpus.confidence[first:last].mean()),
+            "text": " ".join(corpus.words[first:last])
+        })
+
+    return {
+        "threshold": threshold,
+        "low_confidence_words": int(low.sum()),
+        "span_count": int(len(run_starts)),
+        "multi_word_spans": int((lengths > 1).sum()),
+        "longest_spans": spans
+    }
+
+def speaking_rate_statistics(corpus: Corpus) -> Dict:
+    """
+    Speaking rate per file and word/pause duration percentiles per group
+    """
+    if not len(corpus.files):
+        return {}
+
+    # Per-file speech span from the first word start to the last word end
+    boundaries = np.concatenate(([0], np.cumsum([file["word_count"] for file in corpus.files])))
+    non_empty = boundaries[1:] > boundaries[:-1]
+    first_start = corpus.start[boundaries[:-1][non_empty]]
+    last_end = corpus.end[boundaries[1:][non_empty] - 1]
+    minutes = np.maximum(last_end - first_start, 1) / 60000.0
+    word_counts = np.diff(boundaries)[non_empty]
+    words_per_minute = word_counts / minutes
+
+    durations = corpus.end - corpus.start
+    gaps = np.zeros(len(durations), dtype=np.int64)
+    same_file = corpus.file_index[1:] == corpus.file_index[:-1]
+    gaps[1:] = np.where(same_file, corpus.start[1:] - corpus.end[:-1], 0)
+
+    statistics = {"files": {}}
+    for file, rate in zip([file for file, keep in zip(corpus.files, non_empty) if keep], words_per_minute):
+        statistics["files"][file["file_name"]] = float(rate)
+
+    for label, mask in corpus.groups().items():
+        if not mask.any():
+            continue
+        pauses = gaps[mask & (gaps > PAUSE_THRESHOLD_MS)]
+        speech_ms = durations[mask].sum()
+        statistics[label] = {
+            "word_duration_ms": {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(durations[mask], PERCENTILES))},
+            "pause_count": int(len(pauses)),
+            "pause_ms": {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(pauses, PERCENTILES))} if len(pauses) else {},
+            # Words per minute of voiced time, excluding pauses
+            "articulation_rate": float(mask.sum() / (speech_ms / 60000.0)) if speech_ms else 0.0
+        }
+    statistics["words_per_minute"] = {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(words_per_minute, PERCENTILES))} \
+        if len(words_per_minute) else {}
+    return statistics
+
+def analyze_corpus(results_dir: Path = Path("transcription_results"), low_confidence: float = 0.5,
+                   top_spans: int = 10) -> Dict:
+    start_time = time.perf_counter()
+    corpus = Corpus.load(results_dir)
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "results_dir": str(results_dir),
+        "file_count": len(corpus.files),
+        "word_count": int(len(corpus.confidence)),
+        "confidence": confidence_statistics(corpus),
+        "low_confidence_spans": low_confidence_spans(corpus, low_confidence, top_spans),
+        "speaking_rate": speaking_rate_statistics(corpus)
+    }
+    report["load_time"] = load_time
+    report["analysis_time"] = time.perf_counter() - start_time
+    return report
+
+def print_report(report: Dict):
+    print(f"\nCorpus: {report['file_count']} files, {report['word_count']} words "
+          f"(loaded in {report['load_time']:.2f}s, analysed in {report['analysis_time']:.3f}s)")
+
+    print("\nConfidence by language/config:")
+    for label, stats in report["confidence"].items():
+        percentiles = "  ".join(f"p{p} {v:.2f}" for p, v in stats["percentiles"].items())
+        print(f"{label:<26} {stats['word_count']:>7} words  mean {stats['mean']:.2%}  {percentiles}")
+
+    spans = report["low_confidence_spans"]
+    print(f"\nLow-confidence words (< {spans['threshold']}): {spans['low_confidence_words']} "
+          f"in {spans['span_count']} spans ({spans['multi_word_spans']} longer than one word)")
+    for span in spans["longest_spans"]:
+        print(f"  {span['file_name']} {span['start'] / 1000:.1f}-{span['end'] / 1000:.1f}s "
+              f"({span['words']} words, {span['mean_confidence']:.2f}): "
+              f"{span['text'][:200] + '...' if len(span['text']) > 200 else span['text']}")
+
+    rates = report["speaking_rate"]
+    if rates:
+        percentiles = "  ".join(f"p{p} {v:.0f}" for p, v in rates["words_per_minute"].items())
+        print(f"\nSpeaking rate across files (words per minute): {percentiles}")
+        if len(rates["files"]) <= 20:
+            for file_name, rate in rates["files"].items():
+                print(f"  {file_name}: {rate:.0f}")
+        for label, stats in rates.items():
+            if label in ("files", "words_per_minute"):
+                continue
+            print(f"{label:<26} articulation {stats['articulation_rate']:.0f} wpm, "
+                  f"median word {stats['word_duration_ms']['50']:.0f} ms, {stats['pause_count']} pauses")
+
+DESCRIPTION = "Analyse every stored transcription result at once"
+
+def add_arguments(parser):
+    """
+    Add the options of this script (the `analyze` command of cli.py) to an argument parser
+    """
+    parser.add_argument("--results-dir", default="transcription_results")
+    parser.add_argument("--low-confidence", type=float, default=0.5, help="Confidence below which a word is low (default: 0.5)")
+    parser.add_argument("--top-spans", type=int, default=10, help="Number of longest low-confidence spans to list")
+    parser.add_argument("--output-dir", default="analysis_results", help="Where to write the JSON report")
+
+def run(args):
+    report = analyze_corpus(Path(args.results_dir), args.low_confidence, args.top_spans)
+    print_report(report)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / f"corpus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nCorpus report saved to: {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+import urllib.request
+from collections import deque
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from audio_upload import file_sha256
+from transcription_backends import ReplayBackend
+
+class _FakeAssemblyAIHandler(BaseHTTPRequestHandler):
+    server_version = "FakeAssemblyAI/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, status_code: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _before_request(self) -> bool:
+        """
+        Apply the configured latency, rate limiting and failure injection.
+        Returns False if the request was answered with a 429 or an injected failure.
+        """
+        self.server.count_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        retry_after = self.server.should_throttle()
+        if retry_after is not None:
+            self._send_json(429, {"error": "Too many requests"}, {"Retry-After": f"{retry_after:.2f}"})
+            return False
+        if self.server.should_fail():
+            self._send_json(500, {"error": "Injected failure from the fake AssemblyAI server"})
+            return False
+        return True
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self._before_request():
+            return
+
+        if self.path == "/v2/upload":
+            self._send_json(200, {"upload_url": self.server.store_upload(body)})
+        elif self.path == "/v2/transcript":
+            self._send_json(200, self.server.create_transcript(json.loads(body)))
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_GET(self):
+        if not self._before_request():
+            return
+
+        if self.path.startswith("/v2/transcript/"):
+            transcript = self.server.get_transcript(self.path.rsplit("/", 1)[-1])
+            if transcript is None:
+                self._send_json(404, {"error": "Transcript not found"})
+            else:
+                self._send_json(200, transcript)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+class FakeAssemblyAIServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the AssemblyAI upload/submit/poll endpoints.
+    Transcripts are served from stored results (via ReplayBackend) by matching
+    the uploaded bytes against the files in `audio_dir`, or against the
+    transcodes in `prepared_dir` (see audio_preprocessing.py), which keep the
+    source file's stem. Latency, queueing,
+    processing time and failure rate are configurable and seeded so that runs
+    are repeatable. Requests beyond `rate_limit` per second, and a random
+    `throttle_rate` fraction of the rest, are rejected with HTTP 429.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, audio_dir: Path = Path("test_audio"),
+                 replay: Optional[ReplayBackend] = None, latency: float = 0.0, queue_time: float = 0.0,
+                 processing_time: float = 2.0, failure_rate: float = 0.0, polling_interval: float = 0.1,
+                 webhook_drop_rate: float = 0.0, throttle_rate: float = 0.0, rate_limit: float = 0.0,
+                 seed: int = 0, verbose: bool = False, prepared_dir: Path = Path(".cache/prepared_audio")):
+        super().__init__((host, port), _FakeAssemblyAIHandler)
+        self.replay = replay or ReplayBackend()
+        self.latency = latency
+        self.queue_time = queue_time
+        self.processing_time = processing_time
+        self.failure_rate = failure_rate
+        self.polling_interval = polling_interval
+        self.webhook_drop_rate = webhook_drop_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.verbose = verbose
+        self.stats = {"requests": 0, "failures": 0, "throttled": 0, "uploads": 0, "bytes_uploaded": 0,
+                      "transcripts": 0, "webhooks_sent": 0, "webhooks_dropped": 0}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._uploads: Dict[str, str] = {}
+        self._transcripts: Dict[str, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._accepted_at = deque()
+
+        # Map audio content to file stems so uploads can be matched to stored transcripts
+        self._stems_by_hash = {file_sha256(str(audio_file)): audio_file.stem
+                               for audio_file in Path(audio_dir).glob("*") if audio_file.is_file()}
+        self.prepared_dir = Path(prepared_dir)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.stats["requests"] += 1
+
+    def should_throttle(self) -> Optional[float]:
+        """
+        Decide whether to reject a request with 429. Returns the Retry-After
+        seconds if so, None if the request may proceed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.rate_limit:
+                # Sliding one-second window of accepted requests
+                while self._accepted_at and now - self._accepted_at[0] >= 1.0:
+                    self._accepted_at.popleft()
+                if len(self._accepted_at) >= self.rate_limit:
+                    self.stats["throttled"] += 1
+                    return 1.0 - (now - self._accepted_at[0])
+            if self.throttle_rate and self._random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return 0.0
+            self._accepted_at.append(now)
+            return None
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.stats["failures"] += 1
+            return failed
+
+    def store_upload(self, data: bytes) -> str:
+        upload_id = hashlib.sha256(data).hexdigest()
+        if upload_id not in self._stems_by_hash and self.prepared_dir.exists():
+            # Transcodes are created while the server runs, so look for new ones
+            for audio_file in self.prepared_dir.rglob("*"):
+                if audio_file.is_file() and ".tmp" not in audio_file.suffixes:
+                    self._stems_by_hash.setdefault(file_sha256(str(audio_file)), audio_file.stem)
+        with self._lock:
+            self._uploads[upload_id] = self._stems_by_hash.get(upload_id, upload_id)
+            self.stats["uploads"] += 1
+            self.stats["bytes_uploaded"] += len(data)
+        return f"{self.url}/uploads/{upload_id}"
+
+    def create_transcript(self, request: Dict) -> Dict:
+        transcript_id = str(uuid.UUID(int=self._random.getrandbits(128)))
+        audio_url = request["audio_url"]
+        with self._lock:
+            stem = self._uploads.get(audio_url.rsplit("/", 1)[-1], Path(audio_url).stem)
+            self._transcripts[transcript_id] = {
+                "request": request,
+                "stem": stem,
+                "created_at": time.time()
+            }
+            self.stats["transcripts"] += 1
+
+        if request.get("webhook_url"):
+            timer = threading.Timer(self.queue_time + self.processing_time, self.send_webhook, (transcript_id,))
+            timer.daemon = True
+            timer.start()
+        return dict(request, id=transcript_id, status="queued")
+
+    def send_webhook(self, transcript_id: str):
+        """
+        POST the completion callback for a finished transcript, like AssemblyAI does
+        """
+        with self._lock:
+            request = self._transcripts[transcript_id]["request"]
+            if self._random.random() < self.webhook_drop_rate:
+                self.stats["webhooks_dropped"] += 1
+                return
+            self.stats["webhooks_sent"] += 1
+
+        status = self.get_transcript(transcript_id)["status"]
+        headers = {"Content-Type": "application/json"}
+        if request.get("webhook_auth_header_name"):
+            headers[request["webhook_auth_header_name"]] = request.get("webhook_auth_header_value", "")
+        notification = json.dumps({"transcript_id": transcript_id, "status": status}).encode('utf-8')
+        try:
+            urllib.request.urlopen(urllib.request.Request(request["webhook_url"], data=notification, headers=headers),
+                                   timeout=10)
+        except OSError as e:
+            if self.verbose:
+                print(f"Webhook for {transcript_id} failed: {str(e)}")
+
+    def get_transcript(self, transcript_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._transcripts.get(transcript_id)
+        if job is None:
+            return None
+
+        request = job["request"]
+        elapsed = time.time() - job["created_at"]
+        if elapsed < self.queue_time:
+            return dict(request, id=transcript_id, status="queued")
+        if elapsed < self.queue_time + self.processing_time:
+            return dict(request, id=transcript_id, status="processing")
+
+        payload = self.replay.lookup(job["stem"], request.get("punctuate") is not False)
+        if payload is None:
+            return dict(request, id=transcript_id, status="error", error=f"No stored transcript for {job['stem']}")
+
+        response = dict(request, **payload)
+        response.update(id=transcript_id, status="completed")
+        if response.get("language_code") is None:
+            response.pop("language_code")
+        return response
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests on a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-assemblyai", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake AssemblyAI API that serves stored transcripts")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--queue-time", type=float, default=0.0, help="Seconds a transcript stays queued")
+    parser.add_argument("--processing-time", type=float, default=2.0, help="Seconds a transcript stays processing")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--webhook-drop-rate", type=float, default=0.0,
+                        help="Fraction of completion webhooks that are never sent")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requests per second above which requests are answered with HTTP 429 (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeAssemblyAIServer(port=args.port, latency=args.latency, queue_time=args.queue_time,
+                                  processing_time=args.processing_time, failure_rate=args.failure_rate,
+                                  webhook_drop_rate=args.webhook_drop_rate, throttle_rate=args.throttle_rate,
+                                  rate_limit=args.rate_limit, seed=args.seed, verbose=True)
+    print(f"Fake AssemblyAI server listening on {server.url}")
+    print(f"Point the SDK at it with aai.settings.base_url = \"{server.url}\"")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
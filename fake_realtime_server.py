@@ -0,0 +1,152 @@
+import json
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from websockets.sync.server import serve
+
+from transcription_backends import ReplayBackend
+from single_pass import strip_punctuation
+
+# Silence after an utterance's last word before its final transcript is sent
+END_UTTERANCE_SILENCE_MS = 700
+
+def split_utterances(words: List[Dict], pause_ms: int = 500) -> List[List[Dict]]:
+    """
+    Group stored words into utterances at pauses and sentence ends,
+    roughly where the realtime service would finalize a transcript
+    """
+    utterances = [[]]
+    for index, word in enumerate(words):
+        utterances[-1].append(word)
+        next_word = words[index + 1] if index + 1 < len(words) else None
+        if next_word and (next_word["start"] - word["end"] > pause_ms or word["text"][-1:] in ".?!"):
+            utterances.append([])
+    return [utterance for utterance in utterances if utterance]
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _message(message_type: str, words: List[Dict], punctuated: bool) -> Dict:
+    texts = [word["text"] if punctuated else strip_punctuation(word["text"]) for word in words]
+    message = {
+        "message_type": message_type,
+        "audio_start": words[0]["start"],
+        "audio_end": words[-1]["end"],
+        "confidence": sum(word["confidence"] for word in words) / len(words),
+        "text": " ".join(texts),
+        "words": [{"start": word["start"], "end": word["end"], "confidence": word["confidence"], "text": text}
+                  for word, text in zip(words, texts)],
+        "created": _now()
+    }
+    if message_type == "FinalTranscript":
+        message.update(punctuated=punctuated, text_formatted=punctuated)
+    return message
+
+class FakeRealtimeServer:
+    """
+    Local stand-in for the AssemblyAI realtime websocket endpoint.
+    It replays the stored transcript of one test_audio file: the audio bytes a
+    client streams only advance the session's audio clock (PCM16 at the
+    requested sample rate), and partial/final transcripts are sent for the
+    stored words that clock has passed.
+    Point the SDK at it with `aai.Settings(base_url=server.url)`.
+    """
+    def __init__(self, stem: str, host: str = "127.0.0.1", port: int = 0,
+                 replay: Optional[ReplayBackend] = None, punctuated: bool = True):
+        payload = (replay or ReplayBackend()).lookup(stem, True)
+        if payload is None:
+            raise ValueError(f"No stored transcript for {stem}")
+        self.utterances = split_utterances(payload["words"])
+        self.punctuated = punctuated
+        self.stats = {"sessions": 0, "bytes_received": 0, "partials": 0, "finals": 0}
+        self._lock = threading.Lock()
+        self._server = serve(self._handle_session, host, port)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def _handle_session(self, connection):
+        query = parse_qs(urlparse(connection.request.path).query)
+        bytes_per_ms = int(query.get("sample_rate", ["16000"])[0]) * 2 / 1000
+        self._count("sessions")
+        connection.send(json.dumps({
+            "message_type": "SessionBegins",
+            "session_id": str(uuid.uuid4()),
+            "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        }))
+
+        received = 0
+        utterance_index, partial_words = 0, 0
+        for data in connection:
+            if isinstance(data, str):
+                if json.loads(data).get("terminate_session"):
+                    break
+                continue
+
+            received += len(data)
+            self._count("bytes_received", len(data))
+            audio_ms = received / bytes_per_ms
+
+            # Finalize every utterance followed by enough silence, then send a partial for the next
+            while utterance_index < len(self.utterances):
+                utterance = self.utterances[utterance_index]
+                if utterance[-1]["end"] + END_UTTERANCE_SILENCE_MS > audio_ms:
+                    break
+                connection.send(json.dumps(_message("FinalTranscript", utterance, self.punctuated)))
+                self._count("finals")
+                utterance_index, partial_words = utterance_index + 1, 0
+
+            if utterance_index < len(self.utterances):
+                heard = [word for word in self.utterances[utterance_index] if word["end"] <= audio_ms]
+                if len(heard) > partial_words:
+                    connection.send(json.dumps(_message("PartialTranscript", heard, False)))
+                    self._count("partials")
+                    partial_words = len(heard)
+
+        # Flush what is left when the session is terminated
+        for utterance in self.utterances[utterance_index:]:
+            connection.send(json.dumps(_message("FinalTranscript", utterance, self.punctuated)))
+            self._count("finals")
+        connection.send(json.dumps({"message_type": "SessionTerminated"}))
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> threading.Thread:
+        """
+        Serve sessions on a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-realtime", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake AssemblyAI realtime endpoint for one test_audio file")
+    parser.add_argument("file", help="Audio file (or stem) whose stored transcript is replayed, e.g. test_audio_eng.mp3")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = FakeRealtimeServer(Path(args.file).stem, port=args.port)
+    print(f"Fake AssemblyAI realtime server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
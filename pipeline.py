@@ -0,0 +1,148 @@
+import time
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Marks the end of the input on a stage queue
+_DONE = object()
+
+class Stage:
+    """
+    One step of a Pipeline: `workers` threads apply `func` to items taken from a
+    bounded input queue. Returning None from `func` drops the item.
+    """
+    def __init__(self, name: str, func: Callable, workers: int = 1, queue_size: int = 2):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.stats = {
+            "items": 0,
+            "dropped": 0,
+            "errors": 0,
+            "busy_time": 0.0,
+            "blocked_time": 0.0,
+            "max_queue_depth": 0,
+            "queue_depth_samples": 0,
+            "queue_depth_total": 0
+        }
+        self._lock = threading.Lock()
+        self._finished_workers = 0
+
+    def put(self, item):
+        """
+        Enqueue an item, blocking while the queue is full (backpressure)
+        """
+        start_time = time.perf_counter()
+        self.queue.put(item)
+        blocked_time = time.perf_counter() - start_time
+        depth = self.queue.qsize()
+        with self._lock:
+            self.stats["blocked_time"] += blocked_time
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], depth)
+            self.stats["queue_depth_samples"] += 1
+            self.stats["queue_depth_total"] += depth
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues, so that
+    each stage works on item N+1 while the next stage handles item N.
+    """
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.wall_time = 0.0
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        next_stage: Optional[Stage] = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+
+            start_time = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                print(f"Error in pipeline stage '{stage.name}': {str(e)}")
+                result = None
+                with stage._lock:
+                    stage.stats["errors"] += 1
+            busy_time = time.perf_counter() - start_time
+
+            with stage._lock:
+                stage.stats["items"] += 1
+                stage.stats["busy_time"] += busy_time
+                if result is None:
+                    stage.stats["dropped"] += 1
+
+            if result is not None and next_stage is not None:
+                next_stage.put(result)
+
+        # The last worker of a stage to finish closes the next stage
+        with stage._lock:
+            stage._finished_workers += 1
+            last_worker = stage._finished_workers == stage.workers
+        if last_worker and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.queue.put(_DONE)
+
+    def run(self, items: Iterable):
+        """
+        Feed every item into the first stage and wait for all stages to drain
+        """
+        start_time = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for worker_index in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(index,),
+                                          name=f"{stage.name}-{worker_index}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        first_stage = self.stages[0]
+        for item in items:
+            first_stage.put(item)
+        for _ in range(first_stage.workers):
+            first_stage.queue.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        self.wall_time = time.perf_counter() - start_time
+
+    def report(self) -> Dict:
+        """
+        Summarise throughput, utilisation and queue depth per stage
+        """
+        report = {"wall_time": self.wall_time, "stages": {}}
+        for stage in self.stages:
+            stats = stage.stats
+            capacity = stage.workers * self.wall_time
+            report["stages"][stage.name] = {
+                "workers": stage.workers,
+                "items": stats["items"],
+                "dropped": stats["dropped"],
+                "errors": stats["errors"],
+                "busy_time": stats["busy_time"],
+                "utilisation": stats["busy_time"] / capacity if capacity > 0 else 0,
+                "max_queue_depth": stats["max_queue_depth"],
+                "average_queue_depth": stats["queue_depth_total"] / stats["queue_depth_samples"] if stats["queue_depth_samples"] else 0,
+                "queue_capacity": stage.queue.maxsize,
+                "time_blocked_on_full_queue": stats["blocked_time"]
+            }
+        return report
+
+def print_pipeline_report(report: Dict):
+    """
+    Print a pipeline report in the same style as the scripts' statistics
+    """
+    print("\nPipeline Statistics:")
+    print(f"Wall Time: {report['wall_time']:.2f} seconds")
+    for name, stats in report["stages"].items():
+        print(f"\nStage '{name}' ({stats['workers']} worker{'s' if stats['workers'] != 1 else ''}):")
+        print(f"Items Processed: {stats['items']} ({stats['dropped']} dropped, {stats['errors']} errors)")
+        print(f"Busy Time: {stats['busy_time']:.2f} seconds")
+        print(f"Utilisation: {stats['utilisation']:.1%}")
+        print(f"Queue Depth (max/avg/capacity): {stats['max_queue_depth']}/{stats['average_queue_depth']:.2f}/{stats['queue_capacity']}")
+        print(f"Time Blocked Enqueuing: {stats['time_blocked_on_full_queue']:.2f} seconds")
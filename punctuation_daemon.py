@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+from pathlib import Path
+from typing import Dict, List
+
+# Where the daemon listens; override with PUNCTUATION_DAEMON_SOCKET
+DEFAULT_SOCKET_PATH = os.getenv('PUNCTUATION_DAEMON_SOCKET', ".cache/punctuation.sock")
+
+class PunctuationClient:
+    """
+    Talks to a running punctuation daemon over its Unix socket.
+    Exposes the same restore_punctuation method as PunctuationModel.
+    """
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 600.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, request: Dict) -> Dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            with sock.makefile('rwb') as stream:
+                stream.write(json.dumps(request).encode('utf-8') + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+
+        if response["status"] == "error":
+            raise RuntimeError(f"Punctuation daemon error: {response['error']}")
+        return response
+
+    def ping(self) -> bool:
+        """
+        Check whether a daemon is listening and has its model loaded
+        """
+        try:
+            return self._request({"command": "ping"})["status"] == "success"
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def restore_punctuation(self, text: str) -> str:
+        return self._request({"command": "restore_punctuation", "texts": [text]})["texts"][0]
+
+    def restore_punctuation_batch(self, texts: List[str]) -> List[str]:
+        return self._request({"command": "restore_punctuation_batch", "texts": texts})["texts"]
+
+def load_punctuation_model(socket_path: str = DEFAULT_SOCKET_PATH, backend: str = "fp32"):
+    """
+    Return a client for the punctuation daemon if one is running,
+    otherwise load PunctuationModel in-process. The daemon serves the fp32
+    model, so the optimized backends (see quantized_punctuation.py) are
+    always loaded in-process.
+    """
+    if backend != "fp32":
+        from quantized_punctuation import load_model
+        print(f"Loading DeepMultilingual Punctuation model ({backend})...")
+        return load_model(backend)
+
+    client = PunctuationClient(socket_path)
+    if os.path.exists(socket_path) and client.ping():
+        print(f"Using punctuation daemon at {socket_path}")
+        return client
+
+    from deepmultilingualpunctuation import PunctuationModel
+    print("Loading DeepMultilingual Punctuation model...")
+    return PunctuationModel()
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {"status": "error", "error": str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+class PunctuationDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Holds a loaded DeepMultilingual model and serves punctuation requests
+    over a Unix socket. Inference is serialized through a single lock.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, batch_size: int = 8):
+        from punctuation_engine import BatchPunctuationEngine
+
+        print("Loading DeepMultilingual Punctuation model...")
+        start_time = time.time()
+        self.engine = BatchPunctuationEngine(batch_size=batch_size)
+        print(f"Model loaded in {time.time() - start_time:.2f} seconds")
+
+        self.inference_lock = threading.Lock()
+        self.requests_served = 0
+
+        Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def dispatch(self, request: Dict) -> Dict:
+        command = request.get("command")
+        if command == "ping":
+            return {"status": "success", "requests_served": self.requests_served}
+
+        if command not in ("restore_punctuation", "restore_punctuation_batch"):
+            return {"status": "error", "error": f"Unknown command: {command}"}
+
+        with self.inference_lock:
+            if command == "restore_punctuation":
+                texts = [self.engine.model.restore_punctuation(text) for text in request["texts"]]
+            else:
+                texts = self.engine.restore_punctuation_batch(request["texts"])
+            self.requests_served += 1
+        return {"status": "success", "texts": texts}
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the DeepMultilingual punctuation model loaded and serve it over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--batch-size", type=int, default=8, help="Windows per forward pass for batch requests")
+    args = parser.parse_args()
+
+    with PunctuationDaemon(args.socket, batch_size=args.batch_size) as daemon:
+        print(f"Punctuation daemon listening on {args.socket} (Ctrl-C to stop)")
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopping punctuation daemon")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import time
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+from deepmultilingualpunctuation import PunctuationModel
+
+# Window layout used by PunctuationModel.predict; kept identical so that the
+# batched output matches the per-text path word for word
+CHUNK_SIZE = 230
+OVERLAP = 5
+
+class BatchPunctuationEngine:
+    """
+    Restores punctuation for many transcripts at once.
+    Every transcript is split into the same overlapping word windows that
+    `PunctuationModel.predict` uses, the windows of all transcripts are run
+    through the model in padded batches, and the labels are stitched back per
+    transcript with the same overlap rule.
+    """
+    def __init__(self, model: Optional[PunctuationModel] = None, batch_size: int = 8, num_threads: Optional[int] = None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model = model or PunctuationModel()
+        self.batch_size = batch_size
+        self.stats = {"texts": 0, "words": 0, "windows": 0, "processing_time": 0.0}
+
+    @staticmethod
+    def split_windows(words: List[str]) -> List[List[str]]:
+        """
+        Split a word list into overlapping windows exactly like PunctuationModel.predict
+        """
+        overlap = OVERLAP if len(words) > CHUNK_SIZE else 0
+        windows = [words[i:i + CHUNK_SIZE] for i in range(0, len(words), CHUNK_SIZE - overlap)]
+
+        # if the last window is smaller than the overlap, its words are
+        # already covered by the previous window
+        if windows and len(windows[-1]) <= overlap:
+            windows.pop()
+        return windows
+
+    @staticmethod
+    def tag_window(window: List[str], result: List[Dict], overlap: int) -> List[List]:
+        """
+        Assign each word of a window the label of its last sub-token,
+        skipping the trailing overlap words that the next window labels
+        """
+        window_text = " ".join(window)
+        assert len(window_text) == result[-1]["end"], "chunk size too large, text got clipped"
+
+        tagged_words = []
+        char_index = 0
+        result_index = 0
+        score = 0
+        for word in window[:len(window) - overlap]:
+            char_index += len(word) + 1
+            # if any subtoken of a word is labeled as sentence end
+            # we label the whole word as sentence end
+            label = 0
+            while result_index < len(result) and char_index > result[result_index]["end"]:
+                label = result[result_index]['entity']
+                score = result[result_index]['score']
+                result_index += 1
+            tagged_words.append([word, label, score])
+        return tagged_words
+
+    def predict_batch(self, word_lists: List[List[str]]) -> List[List[List]]:
+        """
+        Label every word of every transcript, running all windows through the model in batches
+        """
+        windows_per_text = [self.split_windows(words) for words in word_lists]
+        flat_windows = [(text_index, window_index, " ".join(window))
+                        for text_index, windows in enumerate(windows_per_text)
+                        for window_index, window in enumerate(windows)]
+
+        # Batch windows of similar length together to keep padding small
+        flat_windows.sort(key=lambda item: len(item[2]))
+        outputs = self.model.pipe([text for _, _, text in flat_windows], batch_size=self.batch_size)
+        results = {(text_index, window_index): output
+                   for (text_index, window_index, _), output in zip(flat_windows, outputs)}
+
+        predictions = []
+        for text_index, (words, windows) in enumerate(zip(word_lists, windows_per_text)):
+            overlap = OVERLAP if len(words) > CHUNK_SIZE else 0
+            tagged_words = []
+            for window_index, window in enumerate(windows):
+                # use last window completely
+                if window == windows[-1]:
+                    overlap = 0
+                tagged_words.extend(self.tag_window(window, results[(text_index, window_index)], overlap))
+            assert len(tagged_words) == len(words)
+            predictions.append(tagged_words)
+
+        self.stats["windows"] += len(flat_windows)
+        return predictions
+
+    def restore_punctuation_batch(self, texts: List[str]) -> List[str]:
+        """
+        Restore punctuation for a list of texts. Returns the texts in the same order.
+        """
+        start_time = time.perf_counter()
+
+        word_lists = [self.model.preprocess(text) for text in texts]
+        non_empty = [index for index, words in enumerate(word_lists) if words]
+        predictions = self.predict_batch([word_lists[index] for index in non_empty])
+
+        punctuated = [""] * len(texts)
+        for index, prediction in zip(non_empty, predictions):
+            punctuated[index] = self.model.prediction_to_text(prediction)
+
+        self.stats["texts"] += len(texts)
+        self.stats["words"] += sum(len(words) for words in word_lists)
+        self.stats["processing_time"] += time.perf_counter() - start_time
+        return punctuated
+
+    def restore_punctuation(self, text: str) -> str:
+        """
+        Drop-in replacement for PunctuationModel.restore_punctuation
+        """
+        return self.restore_punctuation_batch([text])[0]
+
+    @property
+    def words_per_second(self) -> float:
+        return self.stats["words"] / self.stats["processing_time"] if self.stats["processing_time"] > 0 else 0
+
+def load_sample_transcripts(results_dirs: List[Path]) -> Dict[str, str]:
+    """
+    Load the unpunctuated transcripts stored by the comparison scripts
+    """
+    transcripts = {}
+    for results_dir in results_dirs:
+        for result_file in sorted(results_dir.glob("*.json")):
+            with open(result_file, 'r', encoding='utf-8') as f:
+                transcripts[result_file.name] = json.load(f)["texts"]["unpunctuated"]
+    return transcripts
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-punctuate the stored sample transcripts")
+    parser.add_argument("--batch-size", type=int, default=8, help="Windows per forward pass")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op thread count")
+    parser.add_argument("--verify", action="store_true",
+                        help="Also run the per-text path and check that the output is identical")
+    args = parser.parse_args()
+
+    transcripts = load_sample_transcripts([Path("punctuation_comparison_results"), Path("single_audio_results")])
+    if not transcripts:
+        print("No stored transcripts found.")
+        return
+
+    engine = BatchPunctuationEngine(batch_size=args.batch_size, num_threads=args.threads)
+    batched = engine.restore_punctuation_batch(list(transcripts.values()))
+
+    print(f"Transcripts: {engine.stats['texts']}")
+    print(f"Words: {engine.stats['words']}")
+    print(f"Windows: {engine.stats['windows']}")
+    print(f"Batched Processing Time: {engine.stats['processing_time']:.2f} seconds")
+    print(f"Batched Throughput: {engine.words_per_second:.2f} words/second")
+
+    if not args.verify:
+        return
+
+    start_time = time.perf_counter()
+    per_text = [engine.model.restore_punctuation(text) for text in transcripts.values()]
+    per_text_time = time.perf_counter() - start_time
+    print(f"\nPer-text Processing Time: {per_text_time:.2f} seconds")
+    print(f"Per-text Throughput: {engine.stats['words'] / per_text_time:.2f} words/second")
+
+    mismatches = [name for name, a, b in zip(transcripts, batched, per_text) if a != b]
+    if mismatches:
+        print(f"\nOutput differs from the per-text path for: {', '.join(mismatches)}")
+    else:
+        print("\nBatched output is identical to the per-text path for every transcript.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Alignment-based punctuation quality metrics.
+
+Both punctuated outputs are aligned token by token to the unpunctuated
+transcript with a patience diff over word tokens, which stays close to
+linear for the near-identical sequences being compared. Every unpunctuated
+word slot then carries the mark and casing each engine gave it, which yields:
+
+- per-mark precision/recall/F1 of DeepMultilingual against AssemblyAI
+  (AssemblyAI serves as the reference; there is no human gold standard)
+- overall punctuation placement F1, ignoring the mark type
+- capitalization agreement on cased words
+- WER of each output (and of the two outputs against each other)
+
+    python punctuation_metrics.py     # score every stored comparison result
+"""
+import re
+import json
+import time
+import bisect
+import difflib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MARKS = [".", ",", "?", "!", ";", ":", "-"]
+# Full-width and typographic variants count as their ASCII mark
+_MARK_ALIASES = {"。": ".", "．": ".", "…": ".", "，": ",", "、": ",", "？": "?", "！": "!", "；": ";", "：": ":", "–": "-", "—": "-"}
+_trailing_marks = re.compile(f"[{re.escape(''.join(MARKS) + ''.join(_MARK_ALIASES))}]+$")
+_leading_marks = re.compile(r"^[¿¡\"'“”«»(\[]+")
+_closing_quotes = re.compile(r"[\"'“”«»)\]]+$")
+
+def tokenize(text: str) -> Tuple[List[str], List[Optional[str]], List[Optional[bool]]]:
+    """
+    Split punctuated text into parallel lists of normalized words, the mark
+    following each word (None if there is none), and whether each word is
+    capitalized (None for words without cased letters).
+    Standalone marks attach to the preceding word.
+    """
+    words, marks, capitals = [], [], []
+    for token in text.split():
+        token = _closing_quotes.sub("", _leading_marks.sub("", token))
+        trailing = _trailing_marks.search(token)
+        core = token[:trailing.start()] if trailing else token
+        mark = _MARK_ALIASES.get(trailing.group()[0], trailing.group()[0]) if trailing else None
+
+        if not core:
+            if mark and marks and marks[-1] is None:
+                marks[-1] = mark
+            continue
+        words.append(core.lower())
+        marks.append(mark)
+        first_cased = next((char for char in core if char.lower() != char.upper()), None)
+        capitals.append(first_cased.isupper() if first_cased else None)
+    return words, marks, capitals
+
+def _matched_pairs(a: List[str], b: List[str]) -> List[Tuple[int, int]]:
+    """
+    Matching (i, j) index pairs of a patience diff: identical prefixes and
+    suffixes are matched directly, words occurring exactly once on both sides
+    of a region anchor it (longest increasing run of such words), and the gaps
+    between anchors are diffed again. Only regions without any such anchor go
+    to difflib, which keeps hour-long transcripts with many repeated common
+    words near-linear.
+    """
+    pairs = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            pairs.append((alo, blo))
+            alo, blo = alo + 1, blo + 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi, bhi = ahi - 1, bhi - 1
+            pairs.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        a_positions, b_positions = {}, {}
+        for i in range(alo, ahi):
+            a_positions[a[i]] = i if a[i] not in a_positions else -1
+        for j in range(blo, bhi):
+            b_positions[b[j]] = j if b[j] not in b_positions else -1
+        candidates = [(i, b_positions[word]) for word, i in a_positions.items()
+                      if i >= 0 and b_positions.get(word, -1) >= 0]
+        if not candidates:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for block in matcher.get_matching_blocks():
+                pairs.extend((alo + block.a + k, blo + block.b + k) for k in range(block.size))
+            continue
+
+        anchors = _longest_increasing(sorted(candidates))
+        previous_a, previous_b = alo, blo
+        for i, j in anchors:
+            pairs.append((i, j))
+            regions.append((previous_a, i, previous_b, j))
+            previous_a, previous_b = i + 1, j + 1
+        regions.append((previous_a, ahi, previous_b, bhi))
+    pairs.sort()
+    return pairs
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Longest subsequence of (i, j) pairs, already sorted by i, whose j also increases
+    """
+    tails, tail_indexes, parents = [], [], [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[position] = j
+            tail_indexes[position] = index
+        parents[index] = tail_indexes[position - 1] if position else -1
+    result = []
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index >= 0:
+        result.append(pairs[index])
+        index = parents[index]
+    return result[::-1]
+
+def align(reference: List[str], hypothesis: List[str]) -> Tuple[Dict[int, int], Dict[str, int]]:
+    """
+    Align two word sequences. Returns the mapping of matched reference indexes
+    to hypothesis indexes and the substitution/deletion/insertion counts.
+    The words between two consecutive matches are counted as substitutions
+    up to the shorter side and deletions or insertions for the rest.
+    """
+    pairs = _matched_pairs(reference, hypothesis)
+    errors = {"substitutions": 0, "deletions": 0, "insertions": 0}
+    previous_i = previous_j = -1
+    for i, j in pairs + [(len(reference), len(hypothesis))]:
+        deleted, inserted = i - previous_i - 1, j - previous_j - 1
+        errors["substitutions"] += min(deleted, inserted)
+        errors["deletions"] += max(deleted - inserted, 0)
+        errors["insertions"] += max(inserted - deleted, 0)
+        previous_i, previous_j = i, j
+    return dict(pairs), errors
+
+def word_error_rate(errors: Dict[str, int], reference_length: int) -> float:
+    return sum(errors.values()) / reference_length if reference_length else 0.0
+
+def _prf(true_positives: int, false_positives: int, false_negatives: int) -> Dict:
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1,
+            "reference": true_positives + false_negatives, "predicted": true_positives + false_positives}
+
+def punctuation_metrics(unpunctuated: str, assemblyai: str, deepmultilingual: str) -> Dict:
+    """
+    Align both punctuated outputs to the unpunctuated words and score
+    DeepMultilingual's marks and casing against AssemblyAI's
+    """
+    base_words = unpunctuated.lower().split()
+    assemblyai_words, assemblyai_marks, assemblyai_capitals = tokenize(assemblyai)
+    deep_words, deep_marks, deep_capitals = tokenize(deepmultilingual)
+
+    assemblyai_mapping, assemblyai_errors = align(base_words, assemblyai_words)
+    deep_mapping, deep_errors = align(base_words, deep_words)
+    _, between_errors = align(assemblyai_words, deep_words)
+
+    # Word slots both outputs kept, with their marks and casing
+    counts = {mark: [0, 0, 0] for mark in MARKS}
+    placement = [0, 0, 0]
+    cased = agreeing_case = 0
+    shared_slots = 0
+    for base_index, assemblyai_index in assemblyai_mapping.items():
+        deep_index = deep_mapping.get(base_index)
+        if deep_index is None:
+            continue
+        shared_slots += 1
+        reference, predicted = assemblyai_marks[assemblyai_index], deep_marks[deep_index]
+        if reference and predicted == reference:
+            counts[reference][0] += 1
+        else:
+            if predicted:
+                counts[predicted][1] += 1
+            if reference:
+                counts[reference][2] += 1
+        if reference and predicted:
+            placement[0] += 1
+        elif predicted:
+            placement[1] += 1
+        elif reference:
+            placement[2] += 1
+
+        reference_capital, predicted_capital = assemblyai_capitals[assemblyai_index], deep_capitals[deep_index]
+        if reference_capital is not None and predicted_capital is not None:
+            cased += 1
+            agreeing_case += reference_capital == predicted_capital
+
+    return {
+        "aligned_words": shared_slots,
+        "per_mark": {mark: _prf(*counts[mark]) for mark in MARKS if any(counts[mark])},
+        "punctuation_placement": _prf(*placement),
+        "capitalization_agreement": agreeing_case / cased if cased else None,
+        "wer": {
+            "assemblyai_vs_unpunctuated": word_error_rate(assemblyai_errors, len(base_words)),
+            "deepmultilingual_vs_unpunctuated": word_error_rate(deep_errors, len(base_words)),
+            "deepmultilingual_vs_assemblyai": word_error_rate(between_errors, len(assemblyai_words))
+        },
+        "edit_operations": {
+            "assemblyai_vs_unpunctuated": assemblyai_errors,
+            "deepmultilingual_vs_unpunctuated": deep_errors
+        }
+    }
+
+def print_metrics(metrics: Dict):
+    placement = metrics["punctuation_placement"]
+    print(f"Punctuation placement vs AssemblyAI: P {placement['precision']:.2%}  R {placement['recall']:.2%}  "
+          f"F1 {placement['f1']:.2%}")
+    for mark, scores in metrics["per_mark"].items():
+        print(f"  '{mark}'  P {scores['precision']:.2%}  R {scores['recall']:.2%}  F1 {scores['f1']:.2%}  "
+              f"(AssemblyAI {scores['reference']}, DeepMultilingual {scores['predicted']})")
+    if metrics["capitalization_agreement"] is not None:
+        print(f"Capitalization agreement: {metrics['capitalization_agreement']:.2%}")
+    wer = metrics["wer"]
+    print(f"WER vs unpunctuated: AssemblyAI {wer['assemblyai_vs_unpunctuated']:.2%}, "
+          f"DeepMultilingual {wer['deepmultilingual_vs_unpunctuated']:.2%}; "
+          f"between outputs {wer['deepmultilingual_vs_assemblyai']:.2%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every stored punctuation comparison with alignment-based metrics")
+    parser.add_argument("--results-dirs", nargs="+", default=["punctuation_comparison_results", "single_audio_results"])
+    args = parser.parse_args()
+
+    scored, total_time = 0, 0.0
+    for results_dir in args.results_dirs:
+        for result_file in sorted(Path(results_dir).glob("*.json")):
+            with open(result_file, 'r', encoding='utf-8') as f:
+                texts = json.load(f).get("texts")
+            if not texts:
+                continue
+            start_time = time.perf_counter()
+            metrics = punctuation_metrics(texts["unpunctuated"], texts["assemblyai_punctuated"],
+                                          texts["deepmultilingual_punctuated"])
+            elapsed = time.perf_counter() - start_time
+            scored, total_time = scored + 1, total_time + elapsed
+            print(f"\n{result_file} ({metrics['aligned_words']} aligned words, {elapsed * 1000:.1f} ms)")
+            print_metrics(metrics)
+    print(f"\nScored {scored} results in {total_time:.3f} seconds")
+
+if __name__ == "__main__":
+    main()
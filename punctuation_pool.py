@@ -0,0 +1,313 @@
+"""
+Multi-process DeepMultilingual punctuation.
+
+One PunctuationModel cannot keep a many-core machine busy, and letting torch
+spread a single inference across every core scales badly. PunctuationPool
+instead runs `workers` processes that
+
+- each use a fixed number of torch intra-op threads (`threads_per_worker`),
+- pull transcripts from one shared task queue, longest first,
+- report their throughput, busy time and memory when the pool is closed.
+
+Where the platform can fork, the model is loaded once in the parent and the
+workers are forked from it, so they share its weights copy-on-write instead
+of each loading a copy. Otherwise (spawn) every worker loads its own.
+
+    python punctuation_pool.py --workers 4 --threads-per-worker 2
+    python punctuation_pool.py --sweep      # try every workers x threads split of the cores
+"""
+import gc
+import os
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from quantized_punctuation import BACKENDS, load_model, resident_memory_mb
+
+# Model loaded by the parent before forking, inherited by the workers
+_shared_model = None
+
+def proportional_memory_mb() -> Optional[float]:
+    """
+    Proportional set size of this process (Linux): shared pages such as the
+    inherited model weights are divided between the processes sharing them
+    """
+    try:
+        with open("/proc/self/smaps_rollup", 'r') as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def default_threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def _worker_main(worker_id: int, backend: str, threads: int, tasks, results):
+    import torch
+    torch.set_num_threads(threads)
+
+    start_time = time.perf_counter()
+    model = _shared_model if _shared_model is not None else load_model(backend)
+    stats = {"texts": 0, "words": 0, "errors": 0, "busy_time": 0.0, "load_time": time.perf_counter() - start_time,
+             "threads": threads, "pid": os.getpid()}
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, text = task
+        start_time = time.perf_counter()
+        try:
+            results.put(("result", task_id, model.restore_punctuation(text), None))
+        except Exception as e:
+            stats["errors"] += 1
+            results.put(("result", task_id, None, str(e)))
+        stats["busy_time"] += time.perf_counter() - start_time
+        stats["texts"] += 1
+        stats["words"] += len(text.split())
+
+    stats["rss_mb"] = resident_memory_mb()
+    stats["pss_mb"] = proportional_memory_mb()
+    results.put(("stats", worker_id, stats, None))
+
+class PunctuationPool:
+    """
+    Worker processes serving DeepMultilingual punctuation from a shared queue.
+    Exposes restore_punctuation and restore_punctuation_batch like the
+    punctuation daemon's client, and is safe to call from several threads.
+    """
+    def __init__(self, workers: int = 2, threads_per_worker: Optional[int] = None, backend: str = "fp32",
+                 share_weights: bool = True):
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(self.workers)
+        self.backend = backend
+        # Forked workers inherit the parent's model; ONNX Runtime sessions do not survive a fork
+        start_methods = multiprocessing.get_all_start_methods()
+        self.share_weights = share_weights and "fork" in start_methods and backend != "onnx"
+        self._context = multiprocessing.get_context("fork" if self.share_weights else "spawn")
+        self._tasks = None
+        self._results = None
+        self._processes: List = []
+        self._collector: Optional[threading.Thread] = None
+        self._pending: Dict[int, Future] = {}
+        self._next_task_id = 0
+        self._lock = threading.Lock()
+        # Set once a worker has died; results are no longer collected after that
+        self.broken: Optional[str] = None
+        self.worker_stats: Dict[int, Dict] = {}
+        self.load_time = 0.0
+        self.started_at: Optional[float] = None
+        # Throughput is measured from the first task queued to the last result returned
+        self.first_task_at: Optional[float] = None
+        self.last_result_at: Optional[float] = None
+        self.wall_time = 0.0
+
+    def start(self) -> "PunctuationPool":
+        global _shared_model
+
+        start_time = time.perf_counter()
+        if self.share_weights:
+            print(f"Loading DeepMultilingual Punctuation model ({self.backend}) to share with {self.workers} workers...")
+            _shared_model = load_model(self.backend)
+            # Move everything allocated so far out of the collector's reach, so
+            # garbage collection in the workers does not write to (and copy)
+            # the inherited pages
+            gc.freeze()
+        else:
+            print(f"Starting {self.workers} punctuation workers, each loading its own model ({self.backend})...")
+
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        for worker_id in range(self.workers):
+            process = self._context.Process(target=_worker_main, name=f"punctuation-{worker_id}", daemon=True,
+                                            args=(worker_id, self.backend, self.threads_per_worker,
+                                                  self._tasks, self._results))
+            process.start()
+            self._processes.append(process)
+        if self.share_weights:
+            gc.unfreeze()
+            _shared_model = None
+        self.load_time = time.perf_counter() - start_time
+        self.started_at = time.perf_counter()
+
+        self._collector = threading.Thread(target=self._collect, name="punctuation-pool-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def _collect(self):
+        """
+        Hand results back to the waiting futures until every worker has sent its final stats
+        """
+        while len(self.worker_stats) < self.workers:
+            try:
+                kind, key, value, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if any(not process.is_alive() and process.exitcode != 0 for process in self._processes):
+                    self._fail_pending("A punctuation worker exited unexpectedly")
+                    return
+                continue
+
+            if kind == "stats":
+                self.worker_stats[key] = value
+                continue
+            with self._lock:
+                future = self._pending.pop(key)
+                self.last_result_at = time.perf_counter()
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(f"Punctuation worker error: {error}"))
+
+    def _fail_pending(self, message: str):
+        with self._lock:
+            self.broken = message
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError(message))
+
+    def submit(self, text: str) -> Future:
+        if self.started_at is None:
+            self.start()
+        future = Future()
+        with self._lock:
+            if self.broken is not None:
+                raise RuntimeError(f"{self.broken}; the punctuation pool cannot take more work")
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            if self.first_task_at is None:
+                self.first_task_at = time.perf_counter()
+            self._pending[task_id] = future
+        self._tasks.put((task_id, text))
+        return future
+
+    def restore_punctuation(self, text: str) -> str:
+        return self.submit(text).result()
+
+    def restore_punctuation_batch(self, texts: List[str]) -> List[str]:
+        # Queue the longest transcripts first so no worker is left with a long one at the end
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]), reverse=True)
+        futures = {index: self.submit(texts[index]) for index in order}
+        return [futures[index].result() for index in range(len(texts))]
+
+    def close(self):
+        """
+        Let the workers finish the queued transcripts, then stop them and collect
+        their stats. A broken pool's remaining workers are terminated.
+        """
+        if self.started_at is None or self._collector is None:
+            return
+        if self.broken is not None:
+            # Nothing reads the results any more, so the surviving workers could block on exit
+            for process in self._processes:
+                process.terminate()
+                process.join()
+            self._collector = None
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        self._collector.join()
+        for process in self._processes:
+            process.join()
+        if self.first_task_at is not None and self.last_result_at is not None:
+            self.wall_time = self.last_result_at - self.first_task_at
+        self._collector = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def report(self) -> Dict:
+        """
+        Per-worker throughput, utilisation and memory, plus pool totals
+        """
+        workers = {}
+        for worker_id, stats in sorted(self.worker_stats.items()):
+            workers[worker_id] = dict(stats,
+                                      words_per_second=stats["words"] / stats["busy_time"] if stats["busy_time"] > 0 else 0,
+                                      utilisation=stats["busy_time"] / self.wall_time if self.wall_time > 0 else 0)
+        words = sum(stats["words"] for stats in self.worker_stats.values())
+        pss = [stats["pss_mb"] for stats in self.worker_stats.values() if stats.get("pss_mb") is not None]
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "backend": self.backend,
+            "shared_weights": self.share_weights,
+            "load_time": self.load_time,
+            "wall_time": self.wall_time,
+            "texts": sum(stats["texts"] for stats in self.worker_stats.values()),
+            "words": words,
+            "words_per_second": words / self.wall_time if self.wall_time > 0 else 0,
+            "total_pss_mb": sum(pss) if pss else None,
+            "per_worker": workers
+        }
+
+def print_pool_report(pool):
+    """
+    Print the per-worker statistics of a punctuation pool, if one was used
+    """
+    if not isinstance(pool, PunctuationPool) or not pool.worker_stats:
+        return
+    report = pool.report()
+    print(f"\nPunctuation Pool: {report['workers']} workers x {report['threads_per_worker']} threads "
+          f"({report['backend']}, weights {'shared' if report['shared_weights'] else 'loaded per worker'})")
+    print(f"Load Time: {report['load_time']:.2f} seconds, Wall Time: {report['wall_time']:.2f} seconds")
+    print(f"Throughput: {report['words_per_second']:.2f} words/second over {report['texts']} transcripts")
+    if report["total_pss_mb"] is not None:
+        print(f"Worker Memory (PSS, shared pages split): {report['total_pss_mb']:.0f} MB in total")
+    for worker_id, stats in report["per_worker"].items():
+        memory = f", RSS {stats['rss_mb']:.0f} MB" if stats.get("rss_mb") is not None else ""
+        print(f"  worker {worker_id}: {stats['texts']} transcripts, {stats['words']} words, "
+              f"{stats['words_per_second']:.2f} words/second, {stats['utilisation']:.1%} busy{memory}")
+
+def run_pool(texts: List[str], workers: int, threads_per_worker: Optional[int], backend: str) -> Dict:
+    with PunctuationPool(workers, threads_per_worker, backend) as pool:
+        pool.restore_punctuation_batch(texts)
+    print_pool_report(pool)
+    return pool.report()
+
+def main():
+    from punctuation_engine import load_sample_transcripts
+
+    parser = argparse.ArgumentParser(description="Punctuate the stored sample transcripts with a pool of worker processes")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (default: 2)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--backend", choices=BACKENDS, default="fp32", help="DeepMultilingual inference backend")
+    parser.add_argument("--repeat", type=int, default=1, help="Queue the sample transcripts this many times")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Try 1, 2, 4, ... workers, each with cores / workers threads, and compare throughput")
+    args = parser.parse_args()
+
+    transcripts = load_sample_transcripts([Path("punctuation_comparison_results"), Path("single_audio_results")])
+    if not transcripts:
+        print("No stored transcripts found.")
+        return
+    texts = list(transcripts.values()) * max(1, args.repeat)
+
+    if not args.sweep:
+        run_pool(texts, args.workers, args.threads_per_worker, args.backend)
+        return
+
+    cores = os.cpu_count() or 1
+    results = []
+    workers = 1
+    while workers <= cores:
+        results.append(run_pool(texts, workers, default_threads_per_worker(workers), args.backend))
+        workers *= 2
+
+    print("\nWorkers x Threads   Words/second   Worker PSS")
+    for report in results:
+        memory = f"{report['total_pss_mb']:.0f} MB" if report["total_pss_mb"] is not None else "n/a"
+        print(f"{report['workers']:>7} x {report['threads_per_worker']:<7}   {report['words_per_second']:>12.2f}   {memory:>10}")
+
+if __name__ == "__main__":
+    main()
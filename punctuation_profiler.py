@@ -0,0 +1,278 @@
+"""
+Per-stage profiling of DeepMultilingual punctuation.
+
+`restore_punctuation` is one call, but its time goes to several stages:
+
+- preprocess: stripping the existing marks and splitting the text into words
+- tokenize:   the pipeline's tokenizer, once per window
+- forward:    the model's forward pass, once per window
+- decode:     the pipeline turning logits into sub-token labels
+- pipeline:   the rest of the pipeline call (argument handling, batching, tensors)
+- align:      window splitting and mapping sub-token labels back onto words
+- rebuild:    building the punctuated string from the word labels
+
+PunctuationProfiler runs restore_punctuation with timers hooked into each
+stage. It records the stage times, the number of word windows and the number
+of tokens for every transcript, and can write a cProfile or torch profiler
+trace of each call. The comparison scripts attach the breakdown to their
+result JSON with `--profile-punctuation`.
+
+    python punctuation_profiler.py                    # stage breakdown of the stored sample transcripts
+    python punctuation_profiler.py --trace cprofile   # plus one .prof file per transcript
+"""
+import time
+import inspect
+import argparse
+import threading
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+STAGES = ["preprocess", "tokenize", "forward", "decode", "pipeline", "align", "rebuild"]
+TRACE_FORMATS = ["cprofile", "torch"]
+
+class _TimedPipe:
+    """
+    Stands in for the model's pipeline during a profiled call: counts and
+    times the calls (one per window) and passes everything else through
+    """
+    def __init__(self, pipe, profile: Dict):
+        self._pipe = pipe
+        self._profile = profile
+
+    def __call__(self, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return self._pipe(*args, **kwargs)
+        finally:
+            self._profile["pipeline_time"] += time.perf_counter() - start_time
+            texts = args[0] if args else None
+            self._profile["windows"] += len(texts) if isinstance(texts, list) else 1
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+def _count_tokens(model_inputs) -> Optional[int]:
+    input_ids = model_inputs.get("input_ids") if hasattr(model_inputs, "get") else None
+    if input_ids is None:
+        return None
+    return int(input_ids.numel()) if hasattr(input_ids, "numel") else len(input_ids)
+
+class PunctuationProfiler:
+    """
+    Profiles restore_punctuation calls of an in-process PunctuationModel
+    (any backend from quantized_punctuation.py). Models served by the
+    punctuation daemon or a PunctuationPool cannot be looked into; for those
+    only the total time is recorded.
+    """
+    def __init__(self, model, trace: Optional[str] = None, trace_dir: Path = Path("profiles")):
+        if trace is not None and trace not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format: {trace}")
+        self.model = model
+        self.trace = trace
+        self.trace_dir = Path(trace_dir)
+        # The hooks patch the shared model, so profiled calls run one at a time
+        self._lock = threading.Lock()
+        self.profiles: List[Dict] = []
+
+    @property
+    def detailed(self) -> bool:
+        return all(hasattr(self.model, name) for name in ("pipe", "preprocess", "predict", "prediction_to_text"))
+
+    @contextmanager
+    def _stage_hooks(self, profile: Dict):
+        """
+        Time the pipeline's own preprocess (tokenizer), forward and
+        postprocess steps by shadowing them on the pipeline instance
+        """
+        pipe = self.model.pipe
+        stage_times = profile["stages"]
+
+        def timed(stage, method):
+            def wrapper(*args, **kwargs):
+                start_time = time.perf_counter()
+                result = method(*args, **kwargs)
+                stage_times[stage] += time.perf_counter() - start_time
+                if stage == "forward":
+                    tokens = _count_tokens(args[0] if args else kwargs.get("model_inputs"))
+                    if tokens is not None:
+                        profile["tokens"] = (profile["tokens"] or 0) + tokens
+                if inspect.isgenerator(result):
+                    # Chunked pipelines tokenize lazily, one chunk per step
+                    return timed_steps(stage, result)
+                return result
+            return wrapper
+
+        def timed_steps(stage, steps):
+            while True:
+                start_time = time.perf_counter()
+                try:
+                    item = next(steps)
+                except StopIteration:
+                    return
+                finally:
+                    stage_times[stage] += time.perf_counter() - start_time
+                yield item
+
+        hooked = [(stage, name) for stage, name in (("tokenize", "preprocess"), ("forward", "forward"),
+                                                     ("decode", "postprocess"))
+                  if callable(getattr(pipe, name, None))]
+        for stage, name in hooked:
+            setattr(pipe, name, timed(stage, getattr(pipe, name)))
+        self.model.pipe = _TimedPipe(pipe, profile)
+        try:
+            yield
+        finally:
+            self.model.pipe = pipe
+            for _, name in hooked:
+                # Drop the instance attribute so the class method shows through again
+                if name in vars(pipe):
+                    delattr(pipe, name)
+
+    @contextmanager
+    def _tracing(self, label: str, profile: Dict):
+        if self.trace is None:
+            yield
+            return
+
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        if self.trace == "cprofile":
+            trace_file = self.trace_dir / f"{label}_{timestamp}.prof"
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(str(trace_file))
+        else:
+            from torch.profiler import profile as torch_profile, ProfilerActivity
+
+            trace_file = self.trace_dir / f"{label}_{timestamp}.json"
+            with torch_profile(activities=[ProfilerActivity.CPU], record_shapes=True) as profiler:
+                yield
+            # Chrome trace format: open in chrome://tracing or Perfetto
+            profiler.export_chrome_trace(str(trace_file))
+        profile["trace_file"] = str(trace_file)
+
+    def restore_punctuation(self, text: str, label: str = "punctuation") -> Tuple[str, Dict]:
+        """
+        Restore punctuation like model.restore_punctuation and return
+        (punctuated text, profile of the call)
+        """
+        profile = {
+            "words": 0,
+            "windows": 0,
+            "tokens": None,
+            "total_time": 0.0,
+            "pipeline_time": 0.0,
+            "stages": {stage: 0.0 for stage in STAGES},
+        }
+
+        with self._lock, self._tracing(label, profile):
+            start_time = time.perf_counter()
+            if not self.detailed:
+                punctuated = self.model.restore_punctuation(text)
+                profile["words"] = len(text.split())
+                profile["stages"] = None
+            else:
+                stage_times = profile["stages"]
+                words = self.model.preprocess(text)
+                stage_times["preprocess"] = time.perf_counter() - start_time
+                profile["words"] = len(words)
+
+                predict_start = time.perf_counter()
+                with self._stage_hooks(profile):
+                    prediction = self.model.predict(words)
+                predict_time = time.perf_counter() - predict_start
+
+                rebuild_start = time.perf_counter()
+                punctuated = self.model.prediction_to_text(prediction)
+                stage_times["rebuild"] = time.perf_counter() - rebuild_start
+
+                hooked_time = stage_times["tokenize"] + stage_times["forward"] + stage_times["decode"]
+                stage_times["pipeline"] = max(0.0, profile["pipeline_time"] - hooked_time)
+                stage_times["align"] = max(0.0, predict_time - profile["pipeline_time"])
+            profile["total_time"] = time.perf_counter() - start_time
+
+        del profile["pipeline_time"]
+        self.profiles.append(dict(profile, label=label))
+        return punctuated, profile
+
+    def summary(self) -> Dict:
+        """
+        Stage totals and shares over every profiled call
+        """
+        total_time = sum(profile["total_time"] for profile in self.profiles)
+        detailed = [profile for profile in self.profiles if profile["stages"] is not None]
+        stages = {stage: sum(profile["stages"][stage] for profile in detailed) for stage in STAGES}
+        detailed_time = sum(profile["total_time"] for profile in detailed)
+        token_counts = [profile["tokens"] for profile in detailed if profile["tokens"] is not None]
+        return {
+            "transcripts": len(self.profiles),
+            "words": sum(profile["words"] for profile in self.profiles),
+            "windows": sum(profile["windows"] for profile in detailed),
+            "tokens": sum(token_counts) if token_counts else None,
+            "total_time": total_time,
+            "stages": stages if detailed else None,
+            "stage_shares": {stage: stages[stage] / detailed_time if detailed_time > 0 else 0 for stage in STAGES}
+                            if detailed else None,
+            "trace_files": [profile["trace_file"] for profile in self.profiles if "trace_file" in profile]
+        }
+
+def print_profile_report(profiler):
+    """
+    Print the per-stage punctuation breakdown of a run, if it was profiled
+    """
+    if profiler is None or not profiler.profiles:
+        return
+    summary = profiler.summary()
+    print(f"\nPunctuation Profile: {summary['transcripts']} transcripts, {summary['words']} words, "
+          f"{summary['total_time']:.2f} seconds")
+    if summary["stages"] is None:
+        print("  No stage breakdown: the model runs in the punctuation daemon or a worker pool")
+    else:
+        tokens = f", {summary['tokens']} tokens" if summary["tokens"] is not None else ""
+        print(f"  {summary['windows']} windows{tokens}")
+        for stage in STAGES:
+            print(f"  {stage:<10} {summary['stages'][stage]:>8.3f}s  {summary['stage_shares'][stage]:>6.1%}")
+    if summary["trace_files"]:
+        print(f"  Traces written to {Path(summary['trace_files'][0]).parent}")
+
+def add_profiling_arguments(parser):
+    """
+    Add the shared --profile-punctuation/--profile-trace options to a script's argument parser
+    """
+    parser.add_argument("--profile-punctuation", action="store_true",
+                        help="Record a per-stage DeepMultilingual timing breakdown, token and window counts "
+                             "for every transcript and add it to the result JSON")
+    parser.add_argument("--profile-trace", choices=TRACE_FORMATS, default=None,
+                        help="With --profile-punctuation, also write a cProfile or torch profiler trace per transcript")
+
+def main():
+    from punctuation_engine import load_sample_transcripts
+    from quantized_punctuation import BACKENDS, load_model
+
+    parser = argparse.ArgumentParser(description="Profile DeepMultilingual punctuation stage by stage on the stored sample transcripts")
+    parser.add_argument("--backend", choices=BACKENDS, default="fp32", help="DeepMultilingual inference backend")
+    parser.add_argument("--trace", choices=TRACE_FORMATS, default=None, help="Also write a trace file per transcript")
+    parser.add_argument("--trace-dir", default="profiles", help="Where to write trace files (default: profiles)")
+    args = parser.parse_args()
+
+    transcripts = load_sample_transcripts([Path("punctuation_comparison_results"), Path("single_audio_results")])
+    if not transcripts:
+        print("No stored transcripts found.")
+        return
+
+    profiler = PunctuationProfiler(load_model(args.backend), trace=args.trace, trace_dir=Path(args.trace_dir))
+    for name, text in transcripts.items():
+        _, profile = profiler.restore_punctuation(text, label=Path(name).stem)
+        tokens = f", {profile['tokens']} tokens" if profile["tokens"] is not None else ""
+        print(f"{name}: {profile['words']} words, {profile['windows']} windows{tokens}, {profile['total_time']:.3f}s")
+    print_profile_report(profiler)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Production punctuation: one engine per language instead of comparing both.
+
+Each file is transcribed once with AssemblyAI punctuation on. Languages
+routed to AssemblyAI keep that text as is; for languages routed to
+DeepMultilingual the unpunctuated text is derived locally from the same
+transcript (see single_pass.py) and punctuated by the model, so no file
+needs a second API pass. The model is only loaded once a file actually
+routes to it.
+
+    python punctuation_router.py                                  # en -> DeepMultilingual, rest -> AssemblyAI
+    python punctuation_router.py --route es=deepmultilingual --default-engine assemblyai
+"""
+import time
+import json
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import assemblyai as aai
+from dotenv import load_dotenv
+
+from single_pass import derive_unpunctuated_text
+from transcript_cache import transcript_language
+
+ENGINES = ["assemblyai", "deepmultilingual"]
+# From verdict_from_gpt/comparison.md: DeepMultilingual reads better only for English
+DEFAULT_ROUTES = {"en": "deepmultilingual"}
+DEFAULT_ENGINE = "assemblyai"
+
+def parse_routes(values: List[str]) -> Dict[str, str]:
+    """
+    Parse LANG=ENGINE pairs from the command line
+    """
+    routes = {}
+    for value in values:
+        language, _, engine = value.partition("=")
+        if not language or engine not in ENGINES:
+            raise ValueError(f"Invalid route '{value}', expected LANG=ENGINE with ENGINE one of {', '.join(ENGINES)}")
+        routes[language.strip().lower()] = engine
+    return routes
+
+class PunctuationRouter:
+    """
+    Chooses the punctuation engine for a detected language and runs it.
+    Regional codes fall back to their base language ("en_us" -> "en"), and
+    languages without a route (or undetected ones) use `default_engine`.
+    The DeepMultilingual model is loaded on first use.
+    """
+    def __init__(self, routes: Optional[Dict[str, str]] = None, default_engine: str = DEFAULT_ENGINE,
+                 model_loader: Optional[Callable] = None):
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.default_engine = default_engine
+        self._model_loader = model_loader
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.stats = {"files": {engine: 0 for engine in ENGINES}, "model_load_time": None,
+                      "model_time": 0.0, "api_passes": 0}
+
+    def engine_for(self, language_code: Optional[str]) -> str:
+        if not language_code:
+            return self.default_engine
+        language_code = language_code.lower()
+        return self.routes.get(language_code, self.routes.get(language_code.split("_")[0], self.default_engine))
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                if self._model_loader is None:
+                    from punctuation_daemon import load_punctuation_model
+                    self._model_loader = load_punctuation_model
+                start_time = time.time()
+                self._model = self._model_loader()
+                self.stats["model_load_time"] = time.time() - start_time
+            return self._model
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    def punctuate(self, transcript) -> Dict:
+        """
+        Return the routed punctuated text of a transcript made with punctuate=True
+        """
+        language = transcript_language(transcript)
+        engine = self.engine_for(language)
+        self.stats["files"][engine] += 1
+        if engine == "assemblyai":
+            return {"engine": engine, "language": language, "text": transcript.text, "processing_time": 0.0}
+
+        # Silent audio has no words (None, not []); there is nothing for the model to punctuate
+        words = transcript.words or []
+        if not words:
+            return {"engine": engine, "language": language, "text": "", "processing_time": 0.0}
+
+        start_time = time.time()
+        unpunctuated = derive_unpunctuated_text([word.text for word in words])
+        text = self.model.restore_punctuation(unpunctuated)
+        processing_time = time.time() - start_time
+        self.stats["model_time"] += processing_time
+        return {"engine": engine, "language": language, "text": text, "processing_time": processing_time}
+
+def route_file(client, router: PunctuationRouter, file_path: str) -> Dict:
+    """
+    Transcribe one file with a single AssemblyAI pass and punctuate it with its routed engine
+    """
+    start_time = time.time()
+    config = aai.TranscriptionConfig(language_detection=True, punctuate=True, format_text=True)
+    transcript = client.transcribe(file_path, config)
+    router.stats["api_passes"] += 1
+    transcription_time = time.time() - start_time
+
+    if transcript is None or transcript.status == aai.TranscriptStatus.error:
+        return {"file_name": Path(file_path).name, "status": "error",
+                "error": transcript.error if transcript else "Transcription returned None"}
+
+    result = router.punctuate(transcript)
+    return {
+        "file_name": Path(file_path).name,
+        "status": "success",
+        "language": result["language"],
+        "engine": result["engine"],
+        "processing_times": {"assemblyai_transcription": transcription_time, "punctuation": result["processing_time"]},
+        "text": result["text"]
+    }
+
+def main():
+    from transcription_client import TranscriptionClient, add_cache_arguments
+    from transcription_backends import create_backend_from_args, add_backend_arguments
+    from request_scheduler import print_scheduler_report
+
+    parser = argparse.ArgumentParser(description="Punctuate every file in test_audio with the engine routed for its language")
+    parser.add_argument("--route", action="append", default=None, metavar="LANG=ENGINE",
+                        help="Route a language code to an engine; repeatable. Replaces the default routes "
+                             f"({', '.join(f'{language}={engine}' for language, engine in DEFAULT_ROUTES.items())})")
+    parser.add_argument("--default-engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"Engine for languages without a route or not detected (default: {DEFAULT_ENGINE})")
+    parser.add_argument("--output-dir", default="routed_results", help="Where to write the punctuated transcripts")
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        routes = parse_routes(args.route) if args.route else None
+    except ValueError as e:
+        parser.error(str(e))
+    router = PunctuationRouter(routes, args.default_engine)
+    client = TranscriptionClient(create_backend_from_args(args), use_cache=not args.no_cache, refresh=args.refresh)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    for audio_file in sorted(Path("test_audio").glob("*")):
+        if audio_file.suffix.lower() not in ['.mp3', '.wav', '.m4a', '.ogg']:
+            continue
+        print(f"\nProcessing {audio_file.name}...")
+        result = route_file(client, router, str(audio_file))
+        if result["status"] == "error":
+            print(f"Error: {result['error']}")
+            continue
+        print(f"Language: {result['language'] or 'unknown'} -> {result['engine']}")
+        output_file = output_dir / f"{audio_file.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Results saved to: {output_file}")
+
+    print_scheduler_report(client.backend)
+    stats = router.stats
+    print(f"\nFiles per engine: {', '.join(f'{engine} {count}' for engine, count in stats['files'].items())}")
+    print(f"AssemblyAI passes: {stats['api_passes']} (comparison mode would make {stats['api_passes'] * 2})")
+    if router.model_loaded:
+        print(f"DeepMultilingual: loaded in {stats['model_load_time']:.2f} seconds, "
+              f"{stats['model_time']:.2f} seconds punctuating")
+    else:
+        print("DeepMultilingual: not loaded (no file routed to it)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Optimized CPU backends for the DeepMultilingual punctuation model.
+
+- int8: dynamic int8 quantization of the model's Linear layers (torch only)
+- onnx: the model exported to ONNX and run with onnxruntime
+  (needs `pip install optimum[onnxruntime]`; the export is cached in .cache/onnx)
+
+Both are drop-in PunctuationModel replacements, selected in the comparison
+scripts with `--punctuation-backend`. Running this module checks them
+against the fp32 model on the stored sample transcripts: every backend runs
+in its own subprocess so its load time and resident memory are measured
+cleanly, and the report gives per-language punctuation-label agreement with
+fp32 and the speedup.
+
+    python quantized_punctuation.py                       # int8 vs fp32
+    python quantized_punctuation.py --backends int8 onnx
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKENDS = ["fp32", "int8", "onnx"]
+DEFAULT_MODEL = "oliverguhr/fullstop-punctuation-multilang-large"
+ONNX_CACHE_DIR = Path(".cache/onnx")
+
+def load_model(backend: str = "fp32", model_name: str = DEFAULT_MODEL):
+    """
+    Load PunctuationModel with the given inference backend
+    """
+    from deepmultilingualpunctuation import PunctuationModel
+
+    if backend == "fp32":
+        return PunctuationModel(model_name)
+
+    if backend == "int8":
+        import torch
+
+        model = PunctuationModel(model_name)
+        model.pipe.model = torch.quantization.quantize_dynamic(model.pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForTokenClassification
+        except ImportError:
+            raise RuntimeError("The onnx punctuation backend needs optimum[onnxruntime]: "
+                               "pip install optimum[onnxruntime]")
+        from transformers import AutoTokenizer, pipeline
+
+        export_dir = ONNX_CACHE_DIR / model_name.replace("/", "--")
+        if (export_dir / "model.onnx").exists():
+            ort_model = ORTModelForTokenClassification.from_pretrained(export_dir)
+            tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        else:
+            print(f"Exporting {model_name} to ONNX (cached in {export_dir})...")
+            ort_model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            ort_model.save_pretrained(export_dir)
+            tokenizer.save_pretrained(export_dir)
+        # Same pipeline as PunctuationModel builds, on the ONNX graph
+        model = PunctuationModel.__new__(PunctuationModel)
+        model.pipe = pipeline("ner", model=ort_model, tokenizer=tokenizer, grouped_entities=False)
+        return model
+
+    raise ValueError(f"Unknown punctuation backend: {backend}")
+
+def resident_memory_mb() -> Optional[float]:
+    """
+    Current resident set size of this process (Linux), in MB
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peak_memory_mb() -> float:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_worker(backend: str, repetitions: int) -> Dict:
+    """
+    Load one backend, label every sample transcript and time it. Runs in a
+    subprocess of `evaluate` so memory is not shared between backends.
+    """
+    from punctuation_engine import load_sample_transcripts
+    from transcription_backends import LANGUAGE_BY_FILE
+
+    transcripts = load_sample_transcripts([Path("punctuation_comparison_results"), Path("single_audio_results")])
+    baseline_memory = resident_memory_mb()
+    start_time = time.perf_counter()
+    model = load_model(backend)
+    load_time = time.perf_counter() - start_time
+    loaded_memory = resident_memory_mb()
+
+    # Warm up on the first transcript so one-off initialisation is not timed
+    if transcripts:
+        model.predict(model.preprocess(next(iter(transcripts.values()))))
+
+    files = {}
+    for name, text in transcripts.items():
+        words = model.preprocess(text)
+        if not words:
+            continue
+        times = []
+        for _ in range(repetitions):
+            start_time = time.perf_counter()
+            prediction = model.predict(words)
+            times.append(time.perf_counter() - start_time)
+        files[name] = {
+            "language": LANGUAGE_BY_FILE.get(name.rsplit('_', 2)[0], "unknown"),
+            "words": len(words),
+            "time": sorted(times)[len(times) // 2],
+            "labels": [str(label) for _, label, _ in prediction]
+        }
+
+    return {
+        "backend": backend,
+        "load_time": load_time,
+        "model_memory_mb": loaded_memory - baseline_memory if loaded_memory and baseline_memory else None,
+        "peak_memory_mb": peak_memory_mb(),
+        "files": files
+    }
+
+def label_agreement(reference: List[str], candidate: List[str]) -> Dict:
+    """
+    Share of words with the same label, and agreement on the words where
+    either model puts a punctuation mark (the labels that change the text)
+    """
+    punctuated = [(a, b) for a, b in zip(reference, candidate) if a != "0" or b != "0"]
+    return {
+        "words": len(reference),
+        "label_agreement": sum(a == b for a, b in zip(reference, candidate)) / len(reference) if reference else 1.0,
+        "punctuation_agreement": sum(a == b for a, b in punctuated) / len(punctuated) if punctuated else 1.0
+    }
+
+def evaluate(backends: List[str], repetitions: int = 3) -> Dict:
+    """
+    Run fp32 and each optimized backend in its own subprocess and compare them
+    """
+    runs = {}
+    for backend in ["fp32"] + [backend for backend in backends if backend != "fp32"]:
+        print(f"Running the {backend} backend...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            output_file = tmp.name
+        try:
+            subprocess.run([sys.executable, __file__, "--worker", backend, "--repetitions", str(repetitions),
+                            "--worker-output", output_file], check=True)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                runs[backend] = json.load(f)
+        except subprocess.CalledProcessError as e:
+            print(f"Error: the {backend} backend failed (exit code {e.returncode})")
+        finally:
+            os.unlink(output_file)
+
+    reference = runs.get("fp32")
+    report = {"timestamp": datetime.now().isoformat(), "repetitions": repetitions, "backends": {}}
+    for backend, run in runs.items():
+        summary = {key: run[key] for key in ("load_time", "model_memory_mb", "peak_memory_mb")}
+        summary["languages"] = {}
+        for name, result in run["files"].items():
+            language = summary["languages"].setdefault(result["language"], {"files": {}})
+            file_summary = {"words": result["words"], "time": result["time"]}
+            if reference and name in reference["files"]:
+                file_summary["fp32_time"] = reference["files"][name]["time"]
+                file_summary["speedup"] = file_summary["fp32_time"] / result["time"] if result["time"] else None
+                file_summary.update(label_agreement(reference["files"][name]["labels"], result["labels"]))
+            language["files"][name] = file_summary
+
+        # Word-weighted totals per language
+        for language in summary["languages"].values():
+            files = list(language["files"].values())
+            words = sum(file_summary["words"] for file_summary in files)
+            language["words"] = words
+            language["time"] = sum(file_summary["time"] for file_summary in files)
+            if reference and all("label_agreement" in file_summary for file_summary in files):
+                fp32_time = sum(file_summary["fp32_time"] for file_summary in files)
+                language["speedup"] = fp32_time / language["time"] if language["time"] else None
+                language["label_agreement"] = sum(f["label_agreement"] * f["words"] for f in files) / words
+                language["punctuation_agreement"] = sum(f["punctuation_agreement"] * f["words"] for f in files) / words
+        report["backends"][backend] = summary
+    return report
+
+def print_report(report: Dict):
+    for backend, summary in report["backends"].items():
+        memory = f"{summary['model_memory_mb']:.0f} MB" if summary["model_memory_mb"] is not None else "n/a"
+        print(f"\n[{backend}] load {summary['load_time']:.2f}s, model RSS {memory}, "
+              f"peak RSS {summary['peak_memory_mb']:.0f} MB")
+        for language, language_summary in summary["languages"].items():
+            line = f"  {language:<8} {language_summary['words']:>5} words  {language_summary['time']:.2f}s"
+            if "speedup" in language_summary and backend != "fp32":
+                line += (f"  speedup {language_summary['speedup']:.2f}x  "
+                         f"label agreement {language_summary['label_agreement']:.2%}  "
+                         f"punctuation agreement {language_summary['punctuation_agreement']:.2%}")
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check optimized DeepMultilingual backends against the fp32 model")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS[1:], default=["int8"])
+    parser.add_argument("--repetitions", type=int, default=3, help="Timed runs per transcript (median is reported)")
+    parser.add_argument("--output-dir", default="benchmark_results", help="Where to write the JSON report")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.repetitions)
+        with open(args.worker_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    report = evaluate(args.backends, args.repetitions)
+    print_report(report)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / f"quantization_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport saved to: {output_file}")
+
+if __name__ == "__main__":
+    main()
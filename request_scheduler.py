@@ -0,0 +1,219 @@
+"""
+Shared scheduling for AssemblyAI API calls.
+
+Every HTTP request an AssemblyAIBackend makes (upload, submit, poll) passes
+through one RequestScheduler, which
+
+- paces requests with a token bucket (`requests_per_second`, `burst`),
+- caps the number of transcription jobs in flight (`max_in_flight`),
+- retries rate-limited (429), transient server errors (5xx) and connection
+  failures with jittered exponential backoff, honouring Retry-After,
+- resends a transcript submission only when it cannot have created a job
+  (429, or a failure while connecting), so a retry never bills twice,
+- counts retries and the time spent throttled for the run report.
+
+    python test_transcription.py --backend fake --fake-throttle-rate 0.2 --concurrency 4
+"""
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import httpx
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+def replay_safe(request: httpx.Request) -> bool:
+    """
+    Whether sending the request twice has the same effect as sending it once.
+    Uploads only return another URL for the same audio; a second transcript
+    submission creates (and bills) a second job.
+    """
+    return request.method in IDEMPOTENT_METHODS or request.url.path.rstrip("/").endswith("/upload")
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average with bursts of up to `burst`
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available. Returns the time waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class RequestScheduler:
+    """
+    Rate limiting, concurrency control and retries shared by every request
+    of a backend. A `requests_per_second` of 0 disables pacing.
+    """
+    def __init__(self, requests_per_second: float = 5.0, burst: int = 10, max_in_flight: int = 8,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0, seed: Optional[int] = None):
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second > 0 else None
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._jobs = threading.BoundedSemaphore(max_in_flight)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "server_errors": 0, "connection_errors": 0,
+                      "gave_up": 0, "throttled_time": 0.0, "backoff_time": 0.0, "in_flight_wait_time": 0.0,
+                      "max_in_flight": 0}
+        self._in_flight = 0
+
+    def _count(self, stat: str, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    @contextmanager
+    def job(self):
+        """
+        Hold one of the `max_in_flight` job slots for the duration of the block
+        """
+        start_time = time.monotonic()
+        self._jobs.acquire()
+        with self._lock:
+            self.stats["in_flight_wait_time"] += time.monotonic() - start_time
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._jobs.release()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Full-jitter exponential backoff, or the server's Retry-After if it asks for longer
+        """
+        with self._lock:
+            delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        try:
+            return max(delay, min(float(retry_after), self.max_delay)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    def send(self, send_request, request: httpx.Request) -> httpx.Response:
+        """
+        Send a request through `send_request`, pacing it and retrying retryable
+        failures. Requests that are not replay-safe are only retried when the
+        server cannot have acted on them: a 429, or an error before the
+        connection was made.
+        """
+        # Buffer streamed bodies (uploads) so a retry can send them again
+        request.read()
+        safe = replay_safe(request)
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._count("throttled_time", self.bucket.acquire())
+            self._count("requests")
+            try:
+                response = send_request(request)
+            except httpx.TransportError as e:
+                self._count("connection_errors")
+                if not safe and not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                    # The server may already have accepted the request
+                    raise
+                if attempt >= self.max_retries:
+                    self._count("gave_up")
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response
+                self._count("rate_limited" if response.status_code == 429 else "server_errors")
+                if not safe and response.status_code != 429:
+                    return response
+                if attempt >= self.max_retries:
+                    self._count("gave_up")
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.read()
+                response.close()
+
+            delay = self.backoff_delay(attempt, retry_after)
+            self._count("retries")
+            self._count("backoff_time", delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def install(self, client):
+        """
+        Route every request of an `aai.Client` through this scheduler
+        """
+        http_client = client.http_client
+        client._http_client = httpx.Client(base_url=http_client.base_url, headers=http_client.headers,
+                                           timeout=http_client.timeout, transport=ScheduledTransport(self))
+        return client
+
+class ScheduledTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends requests through a RequestScheduler
+    """
+    def __init__(self, scheduler: RequestScheduler, transport: Optional[httpx.BaseTransport] = None):
+        self.scheduler = scheduler
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.scheduler.send(self.transport.handle_request, request)
+
+    def close(self):
+        self.transport.close()
+
+def print_scheduler_report(backend):
+    """
+    Print the retry and throttling stats of a backend's scheduler, if it has one
+    """
+    scheduler = getattr(backend, 'scheduler', None)
+    if scheduler is None:
+        return
+    stats = scheduler.stats
+    print(f"\nRequest Scheduler: {stats['requests']} requests, {stats['retries']} retries "
+          f"({stats['rate_limited']} rate limited, {stats['server_errors']} server errors, "
+          f"{stats['connection_errors']} connection errors), {stats['gave_up']} gave up")
+    print(f"Time throttled: {stats['throttled_time']:.2f}s by the token bucket, {stats['backoff_time']:.2f}s backing off, "
+          f"{stats['in_flight_wait_time']:.2f}s waiting for a job slot (peak {stats['max_in_flight']} "
+          f"of {scheduler.max_in_flight} in flight)")
+
+def add_scheduler_arguments(parser):
+    """
+    Add the shared request scheduling options to a script's argument parser
+    """
+    parser.add_argument("--requests-per-second", type=float, default=5.0,
+                        help="Average AssemblyAI requests per second, polls included (default: 5; 0 disables pacing)")
+    parser.add_argument("--burst", type=int, default=10, help="Requests allowed back to back above the average rate")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="Maximum transcription jobs submitted and not yet finished (default: 8)")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retries of a request answered with 429/5xx or a connection error; transcript "
+                             "submissions are only retried on 429 or a failed connect (default: 5)")
+
+def scheduler_options_from_args(args) -> Dict:
+    return {
+        "requests_per_second": args.requests_per_second,
+        "burst": args.burst,
+        "max_in_flight": args.max_in_flight,
+        "max_retries": args.max_retries
+    }
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from audio_upload import file_sha256
+
+# Item states. "running" items were interrupted if they are still running at the next start.
+PENDING, RUNNING, COMPLETED, FAILED = "pending", "running", "completed", "failed"
+
+class RunManifest:
+    """
+    Records the state and output path of every processed item, keyed by
+    (audio SHA-256, config, engine), so that an interrupted or nightly run only
+    processes new, changed, interrupted or (with retry_failed) failed items.
+    Changing an audio file changes its hash and therefore its key.
+    """
+    def __init__(self, manifest_file: Path, retry_failed: bool = False, rerun_all: bool = False):
+        self.manifest_file = Path(manifest_file)
+        self.retry_failed = retry_failed
+        self.rerun_all = rerun_all
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> Dict:
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"Warning: Ignoring unreadable manifest {self.manifest_file}")
+            return {}
+
+    def _save(self):
+        """
+        Atomically write the manifest; called with the lock held
+        """
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+    @staticmethod
+    def item_key(file_path: str, config: Dict, engine: str) -> str:
+        key_material = json.dumps({"audio_sha256": file_sha256(str(file_path)), "config": config, "engine": engine},
+                                  sort_keys=True)
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    def needs_processing(self, file_path: str, config: Dict, engine: str) -> bool:
+        """
+        Decide whether an item has to be (re)processed in this run
+        """
+        if self.rerun_all:
+            return True
+        with self._lock:
+            entry = self._entries.get(self.item_key(file_path, config, engine))
+        if entry is None or entry["state"] in (PENDING, RUNNING):
+            return True
+        if entry["state"] == FAILED:
+            return self.retry_failed
+        # Completed, but the output has since been deleted
+        return not (entry["output_path"] and Path(entry["output_path"]).exists())
+
+    def _update(self, file_path: str, config: Dict, engine: str, **fields):
+        key = self.item_key(file_path, config, engine)
+        with self._lock:
+            entry = self._entries.setdefault(key, {
+                "file_name": os.path.basename(str(file_path)),
+                "audio_sha256": file_sha256(str(file_path)),
+                "config": config,
+                "engine": engine,
+                "state": PENDING,
+                "output_path": None,
+                # The output of the last successful run, kept when a later retry fails
+                "last_output_path": None,
+                "error": None,
+                "attempts": 0
+            })
+            entry.update(fields, updated_at=time.time())
+            self._save()
+            return entry
+
+    def mark_running(self, file_path: str, config: Dict, engine: str):
+        key = self.item_key(file_path, config, engine)
+        with self._lock:
+            attempts = self._entries.get(key, {}).get("attempts", 0)
+        self._update(file_path, config, engine, state=RUNNING, attempts=attempts + 1)
+
+    def mark_completed(self, file_path: str, config: Dict, engine: str, output_path: Path):
+        """
+        Record a finished item. The outputs of earlier runs of the same item
+        are removed so reruns do not pile up duplicate files.
+        """
+        key = self.item_key(file_path, config, engine)
+        with self._lock:
+            entry = self._entries.get(key, {})
+            previous_outputs = {entry.get("output_path"), entry.get("last_output_path")}
+        for previous_output in previous_outputs:
+            if previous_output and previous_output != str(output_path):
+                Path(previous_output).unlink(missing_ok=True)
+        self._update(file_path, config, engine, state=COMPLETED, output_path=str(output_path),
+                     last_output_path=str(output_path), error=None)
+
+    def mark_failed(self, file_path: str, config: Dict, engine: str, error: str, output_path: Optional[Path] = None):
+        """
+        Record a failed item. `output_path` is the error result; the output of
+        the last successful run stays in `last_output_path`.
+        """
+        self._update(file_path, config, engine, state=FAILED, error=error,
+                     output_path=str(output_path) if output_path else None)
+
+    def last_output(self, file_path: str, config: Dict, engine: str) -> Optional[Path]:
+        """
+        The output of the item's last successful run, if it still exists
+        """
+        with self._lock:
+            entry = self._entries.get(self.item_key(file_path, config, engine), {})
+        last_output_path = entry.get("last_output_path")
+        return Path(last_output_path) if last_output_path and Path(last_output_path).exists() else None
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Number of items in each state
+        """
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+            for entry in self._entries.values():
+                counts[entry["state"]] += 1
+            return counts
+
+def add_manifest_arguments(parser):
+    """
+    Add the shared --retry-failed/--rerun-all options to a script's argument parser
+    """
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Also reprocess items that failed in earlier runs")
+    parser.add_argument("--rerun-all", action="store_true",
+                        help="Reprocess every item, even those already completed")
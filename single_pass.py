@@ -0,0 +1,127 @@
+"""
+Derive AssemblyAI's unpunctuated transcript locally from a punctuated one.
+
+With `punctuate=False` AssemblyAI returns the same word slots lowercased and
+with punctuation removed, so the comparison scripts can request a single
+punctuated transcript and build the text for DeepMultilingual from its words.
+
+Run this module to check the derivation against real two-pass output:
+
+    python single_pass.py          # uses the stored punctuation_comparison_results
+    python single_pass.py --live   # transcribes test_audio with both configs
+"""
+import re
+import json
+import argparse
+import difflib
+from pathlib import Path
+from typing import Dict, List
+
+# Punctuation AssemblyAI removes from the edges of a word when punctuate=False.
+# Apostrophes, hyphens and marks inside a token ("c'est-à-dire", "3.5") are kept.
+EDGE_PUNCTUATION = ".,!?;:¿¡…\"“”«»。、，？！"
+_edge_pattern = re.compile(f"^[{re.escape(EDGE_PUNCTUATION)}]+|[{re.escape(EDGE_PUNCTUATION)}]+$")
+
+def strip_punctuation(word: str) -> str:
+    """
+    Lowercase a word and remove punctuation from its edges
+    """
+    return _edge_pattern.sub("", word).lower()
+
+def derive_unpunctuated_text(words: List[str]) -> str:
+    """
+    Build the text AssemblyAI would return with punctuate=False from the word
+    texts of a punctuated transcript. Words that are pure punctuation (e.g. a
+    standalone "?") keep their slot, matching the double spaces in the API output.
+    """
+    return " ".join(strip_punctuation(word) for word in words)
+
+def token_differences(reference: str, derived: str, max_examples: int = 20) -> Dict:
+    """
+    Compare a real unpunctuated transcript with a derived one token by token
+    """
+    reference_tokens = reference.split()
+    derived_tokens = derived.split()
+    matcher = difflib.SequenceMatcher(None, reference_tokens, derived_tokens, autojunk=False)
+
+    counts = {"equal": 0, "replace": 0, "delete": 0, "insert": 0}
+    examples = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        counts[tag] += max(i2 - i1, j2 - j1)
+        if tag != "equal" and len(examples) < max_examples:
+            examples.append({
+                "type": tag,
+                "reference": " ".join(reference_tokens[i1:i2]),
+                "derived": " ".join(derived_tokens[j1:j2])
+            })
+
+    return {
+        "reference_tokens": len(reference_tokens),
+        "derived_tokens": len(derived_tokens),
+        "matching_tokens": counts["equal"],
+        "replaced_tokens": counts["replace"],
+        "deleted_tokens": counts["delete"],
+        "inserted_tokens": counts["insert"],
+        "token_agreement": counts["equal"] / len(reference_tokens) if reference_tokens else 1.0,
+        "exact_match": reference_tokens == derived_tokens,
+        "examples": examples
+    }
+
+def validate_stored_results(results_dir: Path = Path("punctuation_comparison_results")) -> Dict:
+    """
+    Validate against stored comparison results, which hold both real passes
+    """
+    report = {}
+    for result_file in sorted(results_dir.glob("*.json")):
+        with open(result_file, 'r', encoding='utf-8') as f:
+            texts = json.load(f)["texts"]
+        derived = derive_unpunctuated_text(texts["assemblyai_punctuated"].split())
+        report[result_file.name] = token_differences(texts["unpunctuated"], derived)
+    return report
+
+def validate_live(test_files_dir: Path = Path("test_audio")) -> Dict:
+    """
+    Transcribe every test file with both configs and validate the derivation
+    """
+    import assemblyai as aai
+    from dotenv import load_dotenv
+    from transcription_client import TranscriptionClient
+    from transcription_backends import create_backend
+
+    load_dotenv()
+    client = TranscriptionClient(create_backend())
+    report = {}
+    for audio_file in sorted(test_files_dir.glob("*")):
+        if audio_file.suffix.lower() not in ['.mp3', '.wav', '.m4a', '.ogg']:
+            continue
+        transcripts = {}
+        for punctuate in [False, True]:
+            config = aai.TranscriptionConfig(language_detection=True, punctuate=punctuate, format_text=True)
+            transcripts[punctuate] = client.transcribe(str(audio_file), config)
+        if any(t is None or t.status == aai.TranscriptStatus.error for t in transcripts.values()):
+            report[audio_file.name] = {"error": "AssemblyAI transcription failed"}
+            continue
+        derived = derive_unpunctuated_text([word.text for word in transcripts[True].words])
+        report[audio_file.name] = token_differences(transcripts[False].text, derived)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate single-pass unpunctuated text against real two-pass output")
+    parser.add_argument("--live", action="store_true",
+                        help="Transcribe test_audio with both configs instead of using stored results")
+    args = parser.parse_args()
+
+    report = validate_live() if args.live else validate_stored_results()
+    for file_name, diff in report.items():
+        print(f"\n{file_name}")
+        if "error" in diff:
+            print(f"Error: {diff['error']}")
+            continue
+        print(f"Tokens (real/derived): {diff['reference_tokens']}/{diff['derived_tokens']}")
+        print(f"Token agreement: {diff['token_agreement']:.2%}")
+        print(f"Replaced: {diff['replaced_tokens']}, Deleted: {diff['deleted_tokens']}, Inserted: {diff['inserted_tokens']}")
+        for example in diff["examples"]:
+            print(f"  {example['type']}: '{example['reference']}' -> '{example['derived']}'")
+
+if __name__ == "__main__":
+    main()
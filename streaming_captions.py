@@ -0,0 +1,240 @@
+"""
+Live captions from the AssemblyAI realtime transcriber with DeepMultilingual
+punctuation.
+
+Final transcript segments are fed to an IncrementalPunctuator, which
+re-punctuates only a trailing window of words instead of the whole text so
+far, so the cost per segment stays constant as the session grows. Every
+segment's end-to-end caption latency is recorded: the time from when its
+last audio was sent to when its punctuated caption was ready.
+
+    python streaming_captions.py test_audio/test_audio_eng.mp3 --fake   # local stand-in, no API key
+    python streaming_captions.py test_audio/French.mp3                  # live realtime API
+
+Audio is decoded to 16 kHz PCM16 with ffmpeg and streamed at real-time pace.
+"""
+import json
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import assemblyai as aai
+from dotenv import load_dotenv
+
+from single_pass import strip_punctuation
+
+CHUNK_MS = 100
+
+class IncrementalPunctuator:
+    """
+    Punctuates a growing transcript segment by segment. Each new segment is
+    punctuated together with the preceding words of a trailing window, so
+    earlier words inside the window can still be corrected while everything
+    before it is frozen.
+    """
+    def __init__(self, model, window_words: int = 60):
+        self.model = model
+        self.window_words = window_words
+        self.words: List[str] = []
+        self.punctuated: List[str] = []
+        self.revisions = 0
+
+    def add_segment(self, words: List[str]) -> str:
+        """
+        Add the words of a final segment and return its punctuated caption
+        """
+        raw = [word for word in (strip_punctuation(word) for word in words) if word]
+        first_new = len(self.words)
+        self.words.extend(raw)
+        self.punctuated.extend(raw)
+        if not raw:
+            return ""
+
+        window_start = max(0, len(self.words) - max(self.window_words, len(raw)))
+        restored = self.model.restore_punctuation(" ".join(self.words[window_start:])).split()
+        # The model keeps one output word per input word; anything else leaves the raw words
+        if len(restored) == len(self.words) - window_start:
+            self.revisions += sum(before != after for before, after in
+                                  zip(self.punctuated[window_start:first_new], restored))
+            self.punctuated[window_start:] = restored
+        return " ".join(self.punctuated[first_new:])
+
+    def text(self) -> str:
+        return " ".join(self.punctuated)
+
+def pcm_chunks(file_path: str, sample_rate: int = 16000, realtime: bool = True) -> Iterator[bytes]:
+    """
+    Decode an audio file to mono PCM16 with ffmpeg and yield CHUNK_MS chunks,
+    sleeping between them so the file plays at real-time pace
+    """
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("Streaming a file needs ffmpeg on the PATH")
+    process = subprocess.Popen(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", file_path,
+                                "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"], stdout=subprocess.PIPE)
+    yield from _paced(iter(lambda: process.stdout.read(sample_rate * 2 * CHUNK_MS // 1000), b""), realtime)
+    process.wait()
+
+def silent_chunks(duration: float, sample_rate: int = 16000, realtime: bool = True) -> Iterator[bytes]:
+    """
+    Yield `duration` seconds of silent PCM16 at real-time pace. The fake realtime
+    server only uses audio to advance its clock, so this stands in for the
+    decoded file when ffmpeg is unavailable.
+    """
+    chunk = b"\0" * (sample_rate * 2 * CHUNK_MS // 1000)
+    yield from _paced((chunk for _ in range(int(duration * 1000 / CHUNK_MS) + 1)), realtime)
+
+def _paced(chunks: Iterator[bytes], realtime: bool) -> Iterator[bytes]:
+    start_time = time.perf_counter()
+    for index, chunk in enumerate(chunks):
+        if realtime:
+            time.sleep(max(0.0, start_time + index * CHUNK_MS / 1000 - time.perf_counter()))
+        yield chunk
+
+class CaptionSession:
+    """
+    Receives realtime transcripts, punctuates final segments incrementally and
+    records per-segment latency. Assumes audio is streamed at real-time pace
+    from `start()`, so the moment a segment's audio was sent is
+    start + audio_end.
+    """
+    def __init__(self, punctuator: IncrementalPunctuator):
+        self.punctuator = punctuator
+        self.segments: List[Dict] = []
+        self.errors: List[str] = []
+        self.partials = 0
+        self.stream_started_at: Optional[float] = None
+
+    def start(self):
+        self.stream_started_at = time.perf_counter()
+
+    def on_data(self, transcript: aai.RealtimeTranscript):
+        if not transcript.text:
+            return
+        if not isinstance(transcript, aai.RealtimeFinalTranscript):
+            self.partials += 1
+            return
+
+        received_at = time.perf_counter()
+        caption = self.punctuator.add_segment([word.text for word in transcript.words])
+        captioned_at = time.perf_counter()
+        audio_sent_at = self.stream_started_at + transcript.audio_end / 1000
+
+        segment = {
+            "index": len(self.segments),
+            "audio_start": transcript.audio_start,
+            "audio_end": transcript.audio_end,
+            "word_count": len(transcript.words),
+            "assemblyai_text": transcript.text,
+            "caption": caption,
+            "transcript_latency": received_at - audio_sent_at,
+            "punctuation_time": captioned_at - received_at,
+            "caption_latency": captioned_at - audio_sent_at
+        }
+        self.segments.append(segment)
+        print(f"[{transcript.audio_end / 1000:7.1f}s +{segment['caption_latency']:.2f}s] {caption}")
+
+    def on_error(self, error: aai.RealtimeError):
+        self.errors.append(str(error))
+        print(f"Realtime error: {error}")
+
+    def summary(self) -> Dict:
+        latencies = sorted(segment["caption_latency"] for segment in self.segments)
+        punctuation_times = [segment["punctuation_time"] for segment in self.segments]
+        return {
+            "segments": len(self.segments),
+            "partials": self.partials,
+            "errors": self.errors,
+            "caption_latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "caption_latency_p90": latencies[int(len(latencies) * 0.9)] if latencies else None,
+            "caption_latency_max": latencies[-1] if latencies else None,
+            "mean_punctuation_time": sum(punctuation_times) / len(punctuation_times) if punctuation_times else None,
+            "punctuation_revisions": self.punctuator.revisions,
+            "window_words": self.punctuator.window_words
+        }
+
+def stream_captions(file_path: str, client: aai.Client, punctuation_model, window_words: int = 60,
+                    sample_rate: int = 16000, audio: Optional[Iterator[bytes]] = None) -> Dict:
+    """
+    Stream a file through the realtime transcriber and return the captions with
+    per-segment latency
+    """
+    session = CaptionSession(IncrementalPunctuator(punctuation_model, window_words))
+    opened = threading.Event()
+    transcriber = aai.RealtimeTranscriber(
+        on_data=session.on_data,
+        on_error=session.on_error,
+        on_open=lambda _: opened.set(),
+        sample_rate=sample_rate,
+        client=client
+    )
+    transcriber.connect()
+    opened.wait(timeout=10)
+
+    session.start()
+    transcriber.stream(audio if audio is not None else pcm_chunks(file_path, sample_rate))
+    transcriber.close()
+
+    return {
+        "file_name": Path(file_path).name,
+        "timestamp": datetime.now().isoformat(),
+        "summary": session.summary(),
+        "segments": session.segments,
+        "captions": session.punctuator.text()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Live captions from the AssemblyAI realtime API with DeepMultilingual punctuation")
+    parser.add_argument("file", help="Audio file to stream at real-time pace, e.g. test_audio/test_audio_eng.mp3")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use a local stand-in that replays the file's stored transcript instead of the live API")
+    parser.add_argument("--window", type=int, default=60, help="Words re-punctuated per segment (default: 60)")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--output-dir", default="streaming_results", help="Where to write the caption/latency JSON")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from punctuation_daemon import load_punctuation_model
+    punctuation_model = load_punctuation_model()
+
+    audio = None
+    if args.fake:
+        from fake_realtime_server import FakeRealtimeServer
+
+        server = FakeRealtimeServer(Path(args.file).stem)
+        server.start()
+        print(f"Fake AssemblyAI realtime server listening on {server.url}")
+        client = aai.Client(settings=aai.Settings(api_key="fake-api-key", base_url=server.url))
+        if not shutil.which("ffmpeg"):
+            duration = server.utterances[-1][-1]["end"] / 1000 + 1
+            print(f"ffmpeg not found; streaming {duration:.0f}s of silence to drive the stand-in's clock")
+            audio = silent_chunks(duration, args.sample_rate)
+    else:
+        from transcription_backends import configure_api_key
+
+        configure_api_key()
+        client = aai.Client.get_default()
+
+    results = stream_captions(args.file, client, punctuation_model, args.window, args.sample_rate, audio)
+
+    summary = results["summary"]
+    print(f"\nSegments: {summary['segments']} (partials received: {summary['partials']})")
+    if summary["segments"]:
+        print(f"Caption latency: p50 {summary['caption_latency_p50']:.2f}s, p90 {summary['caption_latency_p90']:.2f}s, "
+              f"max {summary['caption_latency_max']:.2f}s")
+        print(f"Mean punctuation time per segment: {summary['mean_punctuation_time'] * 1000:.0f} ms "
+              f"({summary['punctuation_revisions']} earlier words revised)")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / f"{Path(args.file).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results saved to: {output_file}")
+
+if __name__ == "__main__":
+    main()
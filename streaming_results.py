@@ -0,0 +1,359 @@
+"""
+Streaming JSON Lines storage for word-level transcription results.
+
+A multi-hour recording has hundreds of thousands of words. Holding each one
+as a dict and writing the whole result with `json.dump(indent=2)` makes peak
+memory several times the transcript size. Instead, a `.jsonl` result is
+written record by record, and read back the same way:
+
+    {"type": "header", ...}        every result field except the words, utterances and text
+    {"type": "words", "word": [...], "confidence": [...], "start": [...], "end": [...]}
+    ...                            up to CHUNK_WORDS words per record
+    {"type": "utterance", ...}     one per utterance
+    {"type": "text", "text": ...}  the full text, in pieces of up to CHUNK_CHARS characters
+    {"type": "summary", "word_count": ..., "average_confidence": ..., "utterance_count": ...}
+
+The writer keeps only the current chunk and running totals. The reader holds
+only the current record, and it collects the summary and the utterance count
+while the words are iterated. `duration` is not stored; it is end - start.
+
+In memory, the words of a transcript are held in a WordTable: typed arrays
+for the timings and confidences and one UTF-8 buffer for the text, instead
+of one dict per word.
+
+    python streaming_results.py                   # convert transcription_results/*.json
+    python streaming_results.py --verify          # also check each round trip
+"""
+import json
+import array
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+CHUNK_WORDS = 1000
+CHUNK_CHARS = 65536
+# Result fields stored as their own records rather than in the header
+_STREAMED_FIELDS = ("word_confidences", "utterances", "full_text", "word_count", "average_confidence")
+
+class Word:
+    """
+    One word of a WordTable. Can also be read like the word dicts of a
+    JSON result (`word["confidence"]`).
+    """
+    __slots__ = ("word", "confidence", "start", "end")
+    FIELDS = ("word", "confidence", "start", "end", "duration")
+
+    def __init__(self, word: str, confidence: float, start: int, end: int):
+        self.word = word
+        self.confidence = confidence
+        self.start = start
+        self.end = end
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict:
+        return {"word": self.word, "confidence": self.confidence, "start": self.start, "end": self.end,
+                "duration": self.duration}
+
+class WordTable:
+    """
+    Array-backed list of words: about 20 bytes per word plus its UTF-8 text,
+    instead of a dict and five boxed values
+    """
+    __slots__ = ("_text", "_offsets", "confidence", "start", "end")
+
+    def __init__(self):
+        self._text = bytearray()
+        self._offsets = array.array("Q", [0])
+        self.confidence = array.array("d")
+        self.start = array.array("i")
+        self.end = array.array("i")
+
+    @classmethod
+    def from_words(cls, words: Iterable) -> "WordTable":
+        """
+        Build a table from SDK words (or anything with text/confidence/start/end attributes)
+        """
+        table = cls()
+        for word in words:
+            table.append(word.text, word.confidence, word.start, word.end)
+        return table
+
+    def append(self, text: str, confidence: float, start: int, end: int):
+        self._text += text.encode('utf-8')
+        self._offsets.append(len(self._text))
+        self.confidence.append(confidence)
+        self.start.append(start)
+        self.end.append(end)
+
+    def word(self, index: int) -> str:
+        return self._text[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    def __getitem__(self, index: int) -> Word:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("word index out of range")
+        return Word(self.word(index), self.confidence[index], self.start[index], self.end[index])
+
+    def __iter__(self) -> Iterator[Word]:
+        for index in range(len(self)):
+            yield Word(self.word(index), self.confidence[index], self.start[index], self.end[index])
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._text) + sum(column.itemsize * len(column)
+                                     for column in (self._offsets, self.confidence, self.start, self.end))
+
+def encode_word_table(value):
+    """
+    `default` for json.dump: write a WordTable as the usual list of word dicts
+    """
+    if isinstance(value, WordTable):
+        return [word.to_dict() for word in value]
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class StreamingResultWriter:
+    """
+    Writes a `.jsonl` result incrementally. Words are buffered into chunks of
+    `chunk_words`; only the current chunk and the running totals are held.
+    """
+    def __init__(self, path: Path, metadata: Dict, chunk_words: int = CHUNK_WORDS):
+        self.path = Path(path)
+        self.chunk_words = chunk_words
+        self.word_count = 0
+        self.confidence_total = 0.0
+        self.utterance_count = 0
+        self._chunk = {"word": [], "confidence": [], "start": [], "end": []}
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write(dict({"type": "header"}, **{key: value for key, value in metadata.items()
+                                                 if key not in _STREAMED_FIELDS}))
+
+    def _write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+
+    def _flush_words(self):
+        if self._chunk["word"]:
+            self._write(dict({"type": "words"}, **self._chunk))
+            self._chunk = {"word": [], "confidence": [], "start": [], "end": []}
+
+    def add_word(self, word: str, confidence: float, start: int, end: int):
+        self._chunk["word"].append(word)
+        self._chunk["confidence"].append(confidence)
+        self._chunk["start"].append(start)
+        self._chunk["end"].append(end)
+        self.word_count += 1
+        self.confidence_total += confidence
+        if len(self._chunk["word"]) >= self.chunk_words:
+            self._flush_words()
+
+    def add_words(self, words: Iterable):
+        """
+        Add Word objects or word dicts (as stored in `word_confidences`)
+        """
+        for word in words:
+            self.add_word(word["word"], word["confidence"], word["start"], word["end"])
+
+    def add_utterance(self, utterance: Dict):
+        self._flush_words()
+        self._write(dict({"type": "utterance"}, **utterance))
+        self.utterance_count += 1
+
+    def write_text(self, text: str):
+        self._flush_words()
+        for index in range(0, len(text), CHUNK_CHARS):
+            self._write({"type": "text", "text": text[index:index + CHUNK_CHARS]})
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush_words()
+        self._write({
+            "type": "summary",
+            "word_count": self.word_count,
+            "average_confidence": self.confidence_total / self.word_count if self.word_count else 0,
+            "utterance_count": self.utterance_count
+        })
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_streaming(results: Dict, output_file: Path) -> Path:
+    """
+    Write a result dict (as built by TranscriptionAnalyzer.transcribe_with_metrics)
+    to a `.jsonl` file
+    """
+    with StreamingResultWriter(output_file, results) as writer:
+        writer.add_words(results.get("word_confidences") or [])
+        for utterance in results.get("utterances") or []:
+            writer.add_utterance(utterance)
+        if results.get("full_text"):
+            writer.write_text(results["full_text"])
+    return Path(output_file)
+
+class StreamingResults:
+    """
+    Iterator-based reader for `.jsonl` results. Opening reads only the header.
+    `chunks()`/`words()` read the rest of the file in one pass, and fill in
+    `summary` and `utterance_count` on the way.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'r', encoding='utf-8')
+        try:
+            header = json.loads(self._file.readline() or "null")
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("type") != "header":
+            self.close()
+            raise ValueError(f"{self.path} is not a streaming results file")
+        self.header = {key: value for key, value in header.items() if key != "type"}
+        self.summary: Optional[Dict] = None
+        self.utterance_count = 0
+
+    def records(self) -> Iterator[Dict]:
+        """
+        Yield the records after the header, in file order
+        """
+        for line in self._file:
+            record = json.loads(line)
+            if record["type"] == "utterance":
+                self.utterance_count += 1
+            elif record["type"] == "summary":
+                self.summary = {key: value for key, value in record.items() if key != "type"}
+            yield record
+
+    def chunks(self) -> Iterator[Dict]:
+        """
+        Yield the word records ({"word": [...], "confidence": [...], "start": [...], "end": [...]})
+        """
+        for record in self.records():
+            if record["type"] == "words":
+                yield record
+
+    def words(self) -> Iterator[Word]:
+        for chunk in self.chunks():
+            for word, confidence, start, end in zip(chunk["word"], chunk["confidence"], chunk["start"], chunk["end"]):
+                yield Word(word, confidence, start, end)
+
+    def to_results(self) -> Dict:
+        """
+        Read the whole file back into the result dict it was written from
+        """
+        words = WordTable()
+        utterances, text = [], []
+        for record in self.records():
+            if record["type"] == "words":
+                for word, confidence, start, end in zip(record["word"], record["confidence"], record["start"],
+                                                        record["end"]):
+                    words.append(word, confidence, start, end)
+            elif record["type"] == "utterance":
+                utterances.append({key: value for key, value in record.items() if key != "type"})
+            elif record["type"] == "text":
+                text.append(record["text"])
+
+        results = dict(self.header)
+        if results.get("status") == "success":
+            results.update(word_count=len(words), utterances=utterances, word_confidences=words,
+                           full_text="".join(text))
+            if self.summary is not None:
+                results["average_confidence"] = self.summary["average_confidence"]
+        return results
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def verify_round_trip(json_file: Path, jsonl_file: Path) -> List[str]:
+    """
+    Compare a JSON result with its streaming copy and return any differences
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        original = json.load(f)
+    with StreamingResults(jsonl_file) as reader:
+        restored = reader.to_results()
+
+    problems = []
+    for key in sorted(set(original) | set(restored)):
+        if key == "word_confidences":
+            continue
+        if original.get(key) != restored.get(key) and not (key == "average_confidence"
+                                                           and abs(original[key] - restored[key]) < 1e-9):
+            problems.append(f"{key} differs")
+    original_words = original.get("word_confidences") or []
+    restored_words = [word.to_dict() for word in restored.get("word_confidences") or []]
+    if len(original_words) != len(restored_words):
+        problems.append("word count differs")
+    for index, (before, after) in enumerate(zip(original_words, restored_words)):
+        if before != after:
+            problems.append(f"word {index} differs: {before} != {after}")
+            break
+    return problems
+
+def convert_results_dir(results_dir: Path = Path("transcription_results"), output_dir: Optional[Path] = None,
+                        verify: bool = False) -> List[Dict]:
+    """
+    Write a `.jsonl` copy of every JSON result with word timings in `results_dir`
+    """
+    output_dir = Path(output_dir) if output_dir else Path(results_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report = []
+    for json_file in sorted(Path(results_dir).glob("*.json")):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        if "word_confidences" not in results:
+            continue
+
+        jsonl_file = write_streaming(results, output_dir / f"{json_file.stem}.jsonl")
+        entry = {
+            "file_name": json_file.name,
+            "json_bytes": json_file.stat().st_size,
+            "jsonl_bytes": jsonl_file.stat().st_size,
+            "word_count": len(results["word_confidences"])
+        }
+        if verify:
+            entry["problems"] = verify_round_trip(json_file, jsonl_file)
+        report.append(entry)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert transcription results to streaming .jsonl files")
+    parser.add_argument("--results-dir", default="transcription_results")
+    parser.add_argument("--output-dir", help="Where to write .jsonl files (default: next to the JSON files)")
+    parser.add_argument("--verify", action="store_true", help="Check that every converted file round-trips")
+    args = parser.parse_args()
+
+    report = convert_results_dir(Path(args.results_dir), args.output_dir, verify=args.verify)
+    for entry in report:
+        ratio = entry["jsonl_bytes"] / entry["json_bytes"] if entry["json_bytes"] else 0
+        print(f"{entry['file_name']}: {entry['word_count']} words, "
+              f"{entry['json_bytes']} -> {entry['jsonl_bytes']} bytes ({ratio:.1%})")
+        for problem in entry.get("problems", []):
+            print(f"  Round trip problem: {problem}")
+
+    total_json = sum(entry["json_bytes"] for entry in report)
+    total_jsonl = sum(entry["jsonl_bytes"] for entry in report)
+    print(f"\nConverted {len(report)} files: {total_json} -> {total_jsonl} bytes")
+
+if __name__ == "__main__":
+    main()
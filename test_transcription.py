@@ -1,26 +1,61 @@
-import os
 import time
 import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import assemblyai as aai
 from dotenv import load_dotenv
 from pathlib import Path
+from transcription_client import TranscriptionClient, add_cache_arguments
+from transcript_cache import transcript_language
+from columnar_results import write_columnar
+from streaming_results import StreamingResults, WordTable, encode_word_table, write_streaming
+from chunked_transcription import transcribe_chunked
+from run_manifest import RunManifest, add_manifest_arguments
+from transcription_backends import create_backend, create_backend_from_args, add_backend_arguments
+from request_scheduler import print_scheduler_report
+from audio_preprocessing import add_preprocessing_arguments, preprocessor_from_args, print_preprocessing_report
 
 # Load environment variables
 load_dotenv()
 
-# Configure AssemblyAI
-api_key = os.getenv('ASSEMBLYAI_API_KEY')
-if not api_key:
-    raise ValueError("Please set the ASSEMBLYAI_API_KEY environment variable")
-aai.settings.api_key = api_key
+# The AssemblyAI API key is read from ASSEMBLYAI_API_KEY when the live backend is created
+
+def transcription_config(punctuate: bool) -> Dict:
+    """
+    TranscriptionConfig options for one pass; the base of its run manifest key
+    """
+    return {"language_detection": True, "punctuate": punctuate, "format_text": True}
 
 class TranscriptionAnalyzer:
-    def __init__(self):
-        self.transcriber = aai.Transcriber()
+    def __init__(self, use_cache: bool = True, refresh: bool = False, backend=None, storage: str = "json",
+                 chunk_length: Optional[float] = None, preprocessor=None):
+        # Live AssemblyAI unless a replay or fake-server backend is passed in
+        self.client = TranscriptionClient(backend or create_backend(), use_cache=use_cache, refresh=refresh,
+                                          preprocessor=preprocessor)
         self.results_dir = Path("transcription_results")
         self.results_dir.mkdir(exist_ok=True)
+        # "json", "columnar" (compact .words files, see columnar_results.py) or
+        # "jsonl" (streamed records, see streaming_results.py)
+        self.storage = storage
+        # Split files longer than this many seconds into concurrently transcribed segments
+        self.chunk_length = chunk_length
+
+    def manifest_config(self, punctuate: bool) -> Dict:
+        """
+        Identifies a file's pass in the run manifest: the TranscriptionConfig
+        plus the options of this run that change the stored result. Options
+        left at their defaults are omitted so older manifest entries still match.
+        """
+        config = transcription_config(punctuate)
+        if self.storage != "json":
+            config["storage"] = self.storage
+        if self.chunk_length:
+            config["chunk_length"] = self.chunk_length
+        if self.client.preprocessor is not None:
+            config["preprocessing"] = self.client.preprocessor.manifest_config
+        return config
 
     def transcribe_with_metrics(self, file_path: str, punctuate: bool = True) -> Dict:
         """
@@ -32,14 +67,13 @@ class TranscriptionAnalyzer:
             print(f"Starting transcription of {file_path}...")
             
             # Configure transcription with language detection
-            config = aai.TranscriptionConfig(
-                language_detection=True,
-                punctuate=punctuate,
-                format_text=True
-            )
+            config = aai.TranscriptionConfig(**transcription_config(punctuate))
             
-            # Transcribe the audio
-            transcript = self.transcriber.transcribe(file_path, config=config)
+            # Transcribe the audio (served from the local cache when unchanged)
+            if self.chunk_length:
+                transcript = transcribe_chunked(self.client, file_path, config, segment_length=self.chunk_length)
+            else:
+                transcript = self.client.transcribe(file_path, config)
             
             # Calculate processing time
             processing_time = time.time() - start_time
@@ -51,35 +85,32 @@ class TranscriptionAnalyzer:
                     "processing_time": processing_time
                 }
             
+            # Per-phase timings of the API request (None when served from the cache or replay)
+            phases = getattr(transcript, 'phases', None)
+            
             if transcript.status == aai.TranscriptStatus.error:
                 return {
                     "status": "error",
                     "error": transcript.error,
-                    "processing_time": processing_time
+                    "processing_time": processing_time,
+                    "phases": phases
                 }
             
             print(f"Transcription completed. Status: {transcript.status}")
             
             # Get detected language
-            detected_language = getattr(transcript, 'language_code', 'unknown')
+            detected_language = transcript_language(transcript) or 'unknown'
             print(f"Detected language: {detected_language}")
             
-            # Collect word-level confidence scores
-            word_confidences = []
+            # Collect word-level confidence scores into typed arrays rather than one dict per word
+            word_confidences = WordTable()
             if hasattr(transcript, 'words') and transcript.words:
-                for word in transcript.words:
-                    word_confidences.append({
-                        "word": word.text,
-                        "confidence": word.confidence,
-                        "start": word.start,
-                        "end": word.end,
-                        "duration": word.end - word.start
-                    })
+                word_confidences = WordTable.from_words(transcript.words)
             else:
                 print("Warning: No words found in transcript")
             
             # Calculate average confidence
-            avg_confidence = sum(word["confidence"] for word in word_confidences) / len(word_confidences) if word_confidences else 0
+            avg_confidence = sum(word_confidences.confidence) / len(word_confidences) if word_confidences else 0
             
             # Collect utterance-level information
             utterances = []
@@ -105,7 +136,8 @@ class TranscriptionAnalyzer:
                 "word_confidences": word_confidences,
                 "full_text": getattr(transcript, 'text', ''),
                 "language": detected_language,
-                "punctuated": punctuate
+                "punctuated": punctuate,
+                "phases": phases
             }
             
         except Exception as e:
@@ -121,58 +153,184 @@ class TranscriptionAnalyzer:
         Save transcription results to a JSON file
         """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.results_dir / f"{filename}_{timestamp}.json"
+        if self.storage == "columnar":
+            return write_columnar(results, self.results_dir / f"{filename}_{timestamp}.words")
+        if self.storage == "jsonl":
+            return write_streaming(results, self.results_dir / f"{filename}_{timestamp}.jsonl")
         
+        output_file = self.results_dir / f"{filename}_{timestamp}.json"
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+            json.dump(results, f, indent=2, ensure_ascii=False, default=encode_word_table)
         
         return output_file
 
-    def analyze_results(self, results: Dict) -> Dict:
+    def analyze_results(self, results) -> Dict:
         """
-        Analyze transcription results and generate statistics
+        Analyze transcription results and generate statistics. `results` is a
+        result dict or a StreamingResults reader for a saved .jsonl result;
+        either way the words are visited once and never held all at once.
         """
-        if results["status"] == "error":
-            return {"error": results["error"]}
+        if isinstance(results, StreamingResults):
+            metadata, words = results.header, results.words()
+        else:
+            metadata, words = results, results.get("word_confidences") or []
+        
+        if metadata["status"] == "error":
+            return {"error": metadata["error"]}
+        
+        # Confidence distribution
+        confidence_ranges = {
+            "high": 0,    # > 0.9
+            "medium": 0,  # 0.7-0.9
+            "low": 0      # < 0.7
+        }
+        word_count = 0
+        confidence_total = 0.0
+        for word in words:
+            conf = word["confidence"]
+            word_count += 1
+            confidence_total += conf
+            if conf > 0.9:
+                confidence_ranges["high"] += 1
+            elif conf > 0.7:
+                confidence_ranges["medium"] += 1
+            else:
+                confidence_ranges["low"] += 1
         
         # Calculate statistics
         stats = {
-            "processing_time": results["processing_time"],
-            "total_duration": results["total_duration"],
-            "word_count": results["word_count"],
-            "average_confidence": results["average_confidence"],
-            "utterance_count": len(results["utterances"]),
-            "language": results.get("language", "unknown"),
-            "punctuated": results.get("punctuated", False)
+            "processing_time": metadata["processing_time"],
+            "total_duration": metadata["total_duration"],
+            "word_count": word_count,
+            "average_confidence": confidence_total / word_count if word_count else 0,
+            # The reader counts the utterance records while the words are read
+            "utterance_count": results.utterance_count if isinstance(results, StreamingResults) else len(results["utterances"]),
+            "language": metadata.get("language", "unknown"),
+            "punctuated": metadata.get("punctuated", False)
         }
         
         # Only calculate these if we have words
         if stats["word_count"] > 0:
             stats["words_per_utterance"] = stats["word_count"] / stats["utterance_count"] if stats["utterance_count"] > 0 else 0
             stats["processing_speed"] = stats["word_count"] / stats["processing_time"] if stats["processing_time"] > 0 else 0
-            
-            # Confidence distribution
-            confidence_ranges = {
-                "high": 0,    # > 0.9
-                "medium": 0,  # 0.7-0.9
-                "low": 0      # < 0.7
-            }
-            
-            for word in results["word_confidences"]:
-                conf = word["confidence"]
-                if conf > 0.9:
-                    confidence_ranges["high"] += 1
-                elif conf > 0.7:
-                    confidence_ranges["medium"] += 1
-                else:
-                    confidence_ranges["low"] += 1
-            
             stats["confidence_distribution"] = confidence_ranges
         
         return stats
 
-def main():
-    analyzer = TranscriptionAnalyzer()
+def report_results(analyzer: TranscriptionAnalyzer, audio_file: Path, punctuate: bool, results: Dict):
+    """
+    Save, analyze and display the results of a single transcription run
+    """
+    # Save detailed results
+    output_file = analyzer.save_results(results, f"{audio_file.stem}_{'punctuated' if punctuate else 'unpunctuated'}")
+    print(f"Detailed results saved to: {output_file}")
+    
+    # Analyze and display statistics; a streamed result is analysed from the file in one pass
+    if output_file.suffix == ".jsonl":
+        with StreamingResults(output_file) as reader:
+            stats = analyzer.analyze_results(reader)
+    else:
+        stats = analyzer.analyze_results(results)
+    
+    if "error" in stats:
+        print(f"Error processing {audio_file.name}: {stats['error']}")
+        return output_file
+    
+    print("\nTranscription Statistics:")
+    print(f"Processing Time: {stats['processing_time']:.2f} seconds")
+    print(f"Total Audio Duration: {stats['total_duration']:.2f} seconds")
+    print(f"Detected Language: {stats['language']}")
+    print(f"Word Count: {stats['word_count']}")
+    print(f"Average Confidence: {stats['average_confidence']:.2%}")
+    print(f"Utterance Count: {stats['utterance_count']}")
+    
+    phases = results.get("phases")
+    if phases:
+        print(f"Request Phases (transcript {phases['transcript_id']}, {phases['poll_iterations']} polls): "
+              f"upload {phases['upload']:.2f}s, submit {phases['submit']:.2f}s, queue {phases['queue']:.2f}s, "
+              f"processing {phases['processing']:.2f}s, poll delay {phases['poll_delay']:.2f}s, "
+              f"download {phases['download']:.2f}s")
+    
+    if stats["word_count"] > 0:
+        print(f"Words per Utterance: {stats['words_per_utterance']:.2f}")
+        print(f"Processing Speed: {stats['processing_speed']:.2f} words/second")
+        
+        print("\nConfidence Distribution:")
+        for range_name, count in stats["confidence_distribution"].items():
+            percentage = (count / stats["word_count"]) * 100
+            print(f"{range_name.capitalize()} confidence words: {count} ({percentage:.1f}%)")
+        
+        print("\nSample of transcribed text:")
+        # Print first 200 characters of the text
+        sample_text = results["full_text"][:200] + "..." if len(results["full_text"]) > 200 else results["full_text"]
+        print(sample_text)
+    else:
+        print("\nNo words were detected in the audio file.")
+    
+    return output_file
+
+def finish_item(analyzer: TranscriptionAnalyzer, manifest: RunManifest, audio_file: Path, punctuate: bool,
+                results: Dict) -> Dict:
+    """
+    Report one file/config pair and record its outcome in the manifest
+    """
+    config = analyzer.manifest_config(punctuate)
+    output_file = report_results(analyzer, audio_file, punctuate, results)
+    if results["status"] == "success":
+        manifest.mark_completed(audio_file, config, analyzer.client.backend.name, output_file)
+    else:
+        manifest.mark_failed(audio_file, config, analyzer.client.backend.name, results["error"], output_file)
+        last_output = manifest.last_output(audio_file, config, analyzer.client.backend.name)
+        if last_output is not None:
+            print(f"The result of the last successful run is kept at {last_output}")
+    # Only what the run summary needs, so the words of finished files are not kept for the whole run
+    return {"status": results["status"], "phases": results.get("phases")}
+
+def print_phase_summary(run_results: List[Dict]):
+    """
+    Summarise where the time of this run's API requests went, phase by phase
+    """
+    phase_names = ["upload", "submit", "queue", "processing", "poll_delay", "download"]
+    # Failed requests stop part-way, so only completed ones are summarised
+    timed = [results["phases"] for results in run_results if results["status"] == "success" and results.get("phases")]
+    if not timed:
+        print("\nNo API requests were timed in this run (all transcripts came from the cache or replay)")
+        return
+    
+    total_time = sum(phases[name] for phases in timed for name in phase_names)
+    print(f"\nRequest Phase Summary ({len(timed)} requests):")
+    for name in phase_names:
+        values = [phases[name] for phases in timed]
+        share = sum(values) / total_time if total_time else 0
+        print(f"{name:<11} mean {sum(values) / len(values):6.2f}s  max {max(values):6.2f}s  ({share:.1%} of request time)")
+    print(f"Poll iterations: {sum(phases['poll_iterations'] for phases in timed)}, "
+          f"completions signalled by webhook: {sum(phases.get('completion_signal') == 'webhook' for phases in timed)}")
+    print(f"Bytes uploaded: {sum(phases['bytes_uploaded'] for phases in timed)}, "
+          f"downloaded: {sum(phases['bytes_downloaded'] for phases in timed)}")
+
+DESCRIPTION = "Transcribe and analyze every audio file in test_audio"
+
+def add_arguments(parser):
+    """
+    Add the options of this script (the `transcribe` command of cli.py) to an argument parser
+    """
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum number of transcriptions in flight at once (default: 1, sequential)")
+    parser.add_argument("--storage", choices=["json", "columnar", "jsonl"], default="json",
+                        help="Save results as indented JSON (default), compact columnar .words files "
+                             "or streamed .jsonl records")
+    parser.add_argument("--chunk-length", type=float, default=None,
+                        help="Split local files longer than this many seconds on silence and transcribe "
+                             "the segments concurrently (requires ffmpeg)")
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_manifest_arguments(parser)
+    add_preprocessing_arguments(parser)
+
+def run(args):
+    analyzer = TranscriptionAnalyzer(use_cache=not args.no_cache, refresh=args.refresh,
+                                     backend=create_backend_from_args(args), storage=args.storage,
+                                     chunk_length=args.chunk_length, preprocessor=preprocessor_from_args(args))
     
     # Test files directory
     test_files_dir = Path("test_audio")
@@ -180,52 +338,57 @@ def main():
         print(f"Please create a 'test_audio' directory and add your audio files there.")
         return
     
-    # Process each audio file in the test directory
-    for audio_file in test_files_dir.glob("*"):
-        if audio_file.suffix.lower() in ['.mp3', '.wav', '.m4a', '.ogg']:
+    audio_files = [audio_file for audio_file in test_files_dir.glob("*")
+                   if audio_file.suffix.lower() in ['.mp3', '.wav', '.m4a', '.ogg']]
+    
+    # Skip file/config pairs that an earlier run already completed
+    manifest = RunManifest(Path(".cache/manifests/test_transcription.json"),
+                           retry_failed=args.retry_failed, rerun_all=args.rerun_all)
+    items = [(audio_file, punctuate) for audio_file in audio_files for punctuate in [True, False]
+             if manifest.needs_processing(audio_file, analyzer.manifest_config(punctuate), analyzer.client.backend.name)]
+    print(f"{len(items)} of {len(audio_files) * 2} transcriptions to process "
+          f"({len(audio_files) * 2 - len(items)} already done or failed; see --retry-failed, --rerun-all)")
+    
+    run_results = []
+    if args.concurrency <= 1:
+        # Process each audio file/config pair that still needs it
+        for audio_file, punctuate in items:
             print(f"\nProcessing {audio_file.name}...")
+            print(f"\nTesting with punctuation={punctuate}")
             
-            # Test both with and without punctuation
-            for punctuate in [True, False]:
-                print(f"\nTesting with punctuation={punctuate}")
-                
-                # Transcribe and collect metrics
-                results = analyzer.transcribe_with_metrics(str(audio_file), punctuate=punctuate)
-                
-                # Save detailed results
-                output_file = analyzer.save_results(results, f"{audio_file.stem}_{'punctuated' if punctuate else 'unpunctuated'}")
-                print(f"Detailed results saved to: {output_file}")
-                
-                # Analyze and display statistics
-                stats = analyzer.analyze_results(results)
-                
-                if "error" in stats:
-                    print(f"Error processing {audio_file.name}: {stats['error']}")
-                    continue
-                
-                print("\nTranscription Statistics:")
-                print(f"Processing Time: {stats['processing_time']:.2f} seconds")
-                print(f"Total Audio Duration: {stats['total_duration']:.2f} seconds")
-                print(f"Detected Language: {stats['language']}")
-                print(f"Word Count: {stats['word_count']}")
-                print(f"Average Confidence: {stats['average_confidence']:.2%}")
-                print(f"Utterance Count: {stats['utterance_count']}")
-                
-                if stats["word_count"] > 0:
-                    print(f"Words per Utterance: {stats['words_per_utterance']:.2f}")
-                    print(f"Processing Speed: {stats['processing_speed']:.2f} words/second")
-                    
-                    print("\nConfidence Distribution:")
-                    for range_name, count in stats["confidence_distribution"].items():
-                        percentage = (count / stats["word_count"]) * 100
-                        print(f"{range_name.capitalize()} confidence words: {count} ({percentage:.1f}%)")
-                    
-                    print("\nSample of transcribed text:")
-                    # Print first 200 characters of the text
-                    sample_text = results["full_text"][:200] + "..." if len(results["full_text"]) > 200 else results["full_text"]
-                    print(sample_text)
-                else:
-                    print("\nNo words were detected in the audio file.")
+            # Transcribe, collect metrics and record the outcome
+            manifest.mark_running(audio_file, analyzer.manifest_config(punctuate), analyzer.client.backend.name)
+            results = analyzer.transcribe_with_metrics(str(audio_file), punctuate=punctuate)
+            run_results.append(finish_item(analyzer, manifest, audio_file, punctuate, results))
+        print_phase_summary(run_results)
+        print_scheduler_report(analyzer.client.backend)
+        print_preprocessing_report(analyzer.client.preprocessor, analyzer.client.backend)
+        print(f"\nManifest: {manifest.summary()}")
+        return
+    
+    # Submit every file/config pair up front and report them as they finish
+    print(f"\nSubmitting {len(items)} transcriptions with up to {args.concurrency} in flight...")
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {}
+        for audio_file, punctuate in items:
+            manifest.mark_running(audio_file, analyzer.manifest_config(punctuate), analyzer.client.backend.name)
+            future = executor.submit(analyzer.transcribe_with_metrics, str(audio_file), punctuate)
+            futures[future] = (audio_file, punctuate)
+        
+        for future in as_completed(futures):
+            audio_file, punctuate = futures[future]
+            print(f"\nFinished {audio_file.name} with punctuation={punctuate}")
+            run_results.append(finish_item(analyzer, manifest, audio_file, punctuate, future.result()))
+    
+    print_phase_summary(run_results)
+    print_scheduler_report(analyzer.client.backend)
+    print_preprocessing_report(analyzer.client.preprocessor, analyzer.client.backend)
+    print(f"\nManifest: {manifest.summary()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run(parser.parse_args())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from audio_upload import file_sha256
+
+# Default eviction limits for the on-disk transcript cache
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+def _word_to_dict(word) -> Dict:
+    return {
+        "text": word.text,
+        "start": word.start,
+        "end": word.end,
+        "confidence": word.confidence,
+        "speaker": getattr(word, 'speaker', None)
+    }
+
+def transcript_language(transcript) -> Optional[str]:
+    """
+    The detected language code of a transcript. `aai.Transcript` only has it in
+    its JSON response; cached, replayed and chunked transcripts carry it as an attribute.
+    """
+    language = getattr(transcript, 'language_code', None)
+    if language is None:
+        try:
+            language = (getattr(transcript, 'json_response', None) or {}).get("language_code")
+        except ValueError:
+            return None
+    # The SDK parses known codes into the LanguageCode enum
+    return getattr(language, 'value', language)
+
+def transcript_to_payload(transcript) -> Dict:
+    """
+    Extract the parts of a completed transcript that the analysis scripts use
+    into a plain, JSON-serializable dict
+    """
+    utterances = []
+    for utterance in getattr(transcript, 'utterances', None) or []:
+        utterance_dict = _word_to_dict(utterance)
+        utterance_dict["words"] = [_word_to_dict(word) for word in utterance.words]
+        utterances.append(utterance_dict)
+
+    return {
+        "id": getattr(transcript, 'id', None),
+        "status": str(getattr(transcript.status, 'value', transcript.status)),
+        "error": getattr(transcript, 'error', None),
+        "text": transcript.text,
+        "language_code": transcript_language(transcript),
+        "audio_duration": getattr(transcript, 'audio_duration', None),
+        "words": [_word_to_dict(word) for word in getattr(transcript, 'words', None) or []],
+        "utterances": utterances
+    }
+
+def payload_to_transcript(payload: Dict) -> SimpleNamespace:
+    """
+    Rebuild a transcript-like object from a stored payload. It exposes the same
+    attributes the scripts read from an `aai.Transcript` (status, text, words, ...).
+    """
+    def to_words(words: List[Dict]) -> List[SimpleNamespace]:
+        return [SimpleNamespace(**word) for word in words]
+
+    utterances = []
+    for utterance in payload.get("utterances") or []:
+        utterances.append(SimpleNamespace(**dict(utterance, words=to_words(utterance["words"]))))
+
+    return SimpleNamespace(**dict(
+        payload,
+        words=to_words(payload.get("words") or []),
+        utterances=utterances
+    ))
+
+class TranscriptCache:
+    """
+    On-disk cache of completed transcripts keyed by
+    (audio SHA-256, normalized TranscriptionConfig, SDK version, backend).
+    Entries are evicted by age and, least recently used first, by total size.
+    """
+    def __init__(self, cache_dir: Path = Path(".cache/transcripts"), sdk_version: str = "unknown",
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age: float = DEFAULT_MAX_AGE, backend: str = "assemblyai"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.sdk_version = sdk_version
+        # Transcripts from replay or the fake server never answer live lookups
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_config(config) -> Dict:
+        """
+        Return the explicitly set TranscriptionConfig fields as a plain dict
+        """
+        if config is None:
+            return {}
+        raw = config.raw.dict(exclude_none=True)
+        return json.loads(json.dumps(raw, sort_keys=True, default=str))
+
+    def cache_key(self, file_path: str, config) -> str:
+        """
+        Build the cache key for a local audio file transcribed with a given config
+        """
+        key_material = json.dumps({
+            "audio_sha256": file_sha256(file_path),
+            "config": self.normalize_config(config),
+            "sdk_version": self.sdk_version,
+            "backend": self.backend
+        }, sort_keys=True)
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, file_path: str, config) -> Optional[SimpleNamespace]:
+        """
+        Return the cached transcript for this audio/config, or None on a miss
+        """
+        entry_path = self._entry_path(self.cache_key(file_path, config))
+        try:
+            if time.time() - entry_path.stat().st_mtime > self.max_age:
+                entry_path.unlink()
+                raise FileNotFoundError
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        # Mark as recently used for size-based eviction
+        os.utime(entry_path, (time.time(), entry_path.stat().st_mtime))
+        with self._lock:
+            self.stats["hits"] += 1
+        return payload_to_transcript(entry["transcript"])
+
+    def put(self, file_path: str, config, transcript):
+        """
+        Store a completed transcript. Failed transcripts are never cached.
+        """
+        payload = transcript_to_payload(transcript)
+        if payload["status"] != "completed":
+            return
+
+        entry = {
+            "file_name": os.path.basename(file_path),
+            "config": self.normalize_config(config),
+            "sdk_version": self.sdk_version,
+            "cached_at": time.time(),
+            "transcript": payload
+        }
+        entry_path = self._entry_path(self.cache_key(file_path, config))
+        tmp_path = entry_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        """
+        Drop entries older than max_age, then the least recently used entries
+        until the cache fits in max_bytes
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+            for entry_path in self.cache_dir.glob("*.json"):
+                try:
+                    stat = entry_path.stat()
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    entry_path.unlink(missing_ok=True)
+                    self.stats["evictions"] += 1
+                else:
+                    entries.append((stat.st_atime, stat.st_size, entry_path))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            for _, size, entry_path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                entry_path.unlink(missing_ok=True)
+                total_bytes -= size
+                self.stats["evictions"] += 1
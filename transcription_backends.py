@@ -0,0 +1,384 @@
+import os
+import json
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import assemblyai as aai
+
+from audio_upload import UploadCache
+from transcript_cache import payload_to_transcript
+from single_pass import strip_punctuation, derive_unpunctuated_text
+from request_scheduler import RequestScheduler, add_scheduler_arguments, scheduler_options_from_args
+
+BACKENDS = ["assemblyai", "replay", "fake"]
+
+# Language of each sample in test_audio, used when the transcript has no language_code
+LANGUAGE_BY_FILE = {
+    "test_audio_eng": "en",
+    "French": "fr",
+    "spanish": "es",
+    "test_audio_kr": "ko",
+    "test_audio": "tl",
+    "grit-english": "en"
+}
+
+def configure_api_key():
+    """
+    Configure the global AssemblyAI settings from the ASSEMBLYAI_API_KEY environment variable
+    """
+    api_key = os.getenv('ASSEMBLYAI_API_KEY')
+    if not api_key:
+        raise ValueError("Please set the ASSEMBLYAI_API_KEY environment variable")
+    aai.settings.api_key = api_key
+
+def _punctuate_requested(config) -> bool:
+    # AssemblyAI punctuates unless punctuate=False is set explicitly
+    return config is None or config.punctuate is not False
+
+class AssemblyAIBackend:
+    """
+    Transcribes through an AssemblyAI API endpoint (the live service or the
+    local fake server), uploading each local file only once.
+    Every request is timed phase by phase (see `transcribe`).
+
+    With a `webhook_receiver`, jobs are submitted with its URL and the result
+    is fetched as soon as the completion callback arrives. Polling then only
+    serves as a fallback for lost callbacks, starting at
+    `fallback_polling_interval` and backing off up to `max_polling_interval`.
+
+    With a `scheduler` (RequestScheduler), every HTTP request is paced and
+    retried on 429/5xx, and each job holds an in-flight slot from submission
+    until its result is fetched.
+    """
+    def __init__(self, client: aai.Client, name: str = "assemblyai",
+                 upload_cache_file: Optional[Path] = Path(".cache/uploads.json"),
+                 webhook_receiver=None, fallback_polling_interval: float = 5.0,
+                 max_polling_interval: float = 60.0, scheduler: Optional[RequestScheduler] = None):
+        self.name = name
+        self.scheduler = scheduler
+        self.client = scheduler.install(client) if scheduler is not None else client
+        self.transcriber = aai.Transcriber(client=client)
+        self.upload_cache = UploadCache(self.transcriber, cache_file=upload_cache_file)
+        self.webhook_receiver = webhook_receiver
+        self.fallback_polling_interval = fallback_polling_interval
+        self.max_polling_interval = max_polling_interval
+
+    def _wait(self, transcript_id: str, interval: float) -> bool:
+        """
+        Wait before the next poll. Returns True if a completion callback ended the wait.
+        """
+        if self.webhook_receiver is None:
+            time.sleep(interval)
+            return False
+        return self.webhook_receiver.wait(transcript_id, interval)
+
+    def _poll(self, transcript_id: str, phases: Dict) -> Dict:
+        """
+        Poll a submitted transcript until it completes or fails. Records the
+        poll count and the moments the job was seen leaving the queue, last
+        seen pending, and the final (full transcript) response.
+        """
+        http_client = self.client.http_client
+        submitted_at = time.perf_counter()
+        active_at = None
+        notified_at = None
+        last_pending_at = submitted_at
+        if self.webhook_receiver is None:
+            interval, backoff = self.client.settings.polling_interval, 1.0
+        else:
+            interval, backoff = self.fallback_polling_interval, 2.0
+
+        while True:
+            request_at = time.perf_counter()
+            response = http_client.get(f"{aai.api.ENDPOINT_TRANSCRIPT}/{transcript_id}")
+            response_at = time.perf_counter()
+            phases["poll_iterations"] += 1
+            phases["bytes_downloaded"] += len(response.content)
+            if response.status_code != 200:
+                raise aai.types.TranscriptError(
+                    f"failed to retrieve transcript {transcript_id}: {aai.api._get_error_message(response)}")
+
+            body = response.json()
+            if body["status"] not in (aai.TranscriptStatus.queued, aai.TranscriptStatus.processing):
+                # A callback marks the completion; otherwise it happened somewhere
+                # between the last pending poll and this request
+                active_at = active_at or last_pending_at
+                completed_at = notified_at or last_pending_at + (request_at - last_pending_at) / 2
+                phases["queue"] = active_at - submitted_at
+                phases["processing"] = completed_at - active_at
+                phases["poll_delay"] = request_at - completed_at
+                phases["download"] = response_at - request_at
+                phases["result_bytes"] = len(response.content)
+                phases["completion_signal"] = "webhook" if notified_at else "poll"
+                return body
+
+            if body["status"] == aai.TranscriptStatus.processing and active_at is None:
+                active_at = response_at
+            last_pending_at = response_at
+            # A callback only triggers an early poll; if the job is still pending,
+            # polling continues on the fallback schedule
+            if self._wait(transcript_id, interval) and notified_at is None:
+                notified_at = time.perf_counter()
+            interval = min(interval * backoff, self.max_polling_interval)
+
+    def transcribe(self, file_path: str, config: aai.TranscriptionConfig):
+        """
+        Upload (once), submit and poll a transcript. The returned transcript has a
+        `phases` dict with the time spent in each phase, in seconds:
+
+        - upload: sending the audio (0 when an earlier upload URL is reused)
+        - submit: creating the transcript job
+        - queue: until the job was first seen processing
+        - processing: server-side work, up to the estimated completion moment
+        - poll_delay: wait between completion and the request that fetched it
+          (estimated as half the last polling gap when no callback arrived)
+        - download: the final request that carried the full transcript
+
+        plus the transcript ID, byte counts, the number of poll iterations and
+        whether a webhook or a poll signalled completion.
+        """
+        phases = {"transcript_id": None, "upload": 0.0, "submit": 0.0, "queue": 0.0, "processing": 0.0,
+                  "poll_delay": 0.0, "download": 0.0, "poll_iterations": 0, "bytes_uploaded": 0,
+                  "bytes_downloaded": 0, "result_bytes": 0, "completion_signal": None}
+        request = aai.types.TranscriptRequest(audio_url=file_path, **config.raw.dict(exclude_none=True))
+        if self.webhook_receiver is not None:
+            request.webhook_url = self.webhook_receiver.url
+            request.webhook_auth_header_name = self.webhook_receiver.auth_header_name
+            request.webhook_auth_header_value = self.webhook_receiver.secret
+
+        try:
+            # Upload once and reuse the URL for every config pass
+            start_time = time.perf_counter()
+            request.audio_url = self.upload_cache.get_upload_url(file_path, phases)
+            phases["upload"] = time.perf_counter() - start_time
+
+            with self.scheduler.job() if self.scheduler is not None else nullcontext():
+                start_time = time.perf_counter()
+                submitted = aai.api.create_transcript(self.client.http_client, request)
+                phases["submit"] = time.perf_counter() - start_time
+                phases["transcript_id"] = submitted.id
+
+                response = aai.types.TranscriptResponse.parse_obj(self._poll(submitted.id, phases))
+        except Exception as exc:
+            # Match the SDK, which reports request failures as an errored transcript
+            response = aai.types.TranscriptResponse(
+                audio_url=request.audio_url,
+                **config.raw.dict(exclude_none=True),
+                id=phases["transcript_id"],
+                status=aai.TranscriptStatus.error,
+                error=str(exc)
+            )
+        finally:
+            # Failed jobs too, or their events stay in the receiver for the rest of the run
+            if self.webhook_receiver is not None and phases["transcript_id"] is not None:
+                self.webhook_receiver.forget(phases["transcript_id"])
+
+        transcript = aai.Transcript.from_response(client=self.client, response=response)
+        transcript.phases = phases
+        return transcript
+
+class ReplayBackend:
+    """
+    Replays transcripts stored by earlier runs instead of calling the API.
+    Transcripts are looked up by the audio file's stem and the punctuate setting.
+    Unpunctuated transcripts that were never stored are derived from the
+    punctuated words the same way single-pass mode does.
+    """
+    name = "replay"
+
+    def __init__(self, results_dirs: Optional[List[Path]] = None, latency: float = 0.0):
+        self.results_dirs = results_dirs or [Path("transcription_results"), Path("punctuation_comparison_results"),
+                                             Path("single_audio_results")]
+        self.latency = latency
+        self.payloads: Dict[tuple, Dict] = {}
+        self._load()
+
+    @staticmethod
+    def _split_result_name(result_file: Path) -> tuple:
+        # Result files are named <stem>[_punctuated|_unpunctuated]_<YYYYmmdd>_<HHMMSS>.json
+        stem = result_file.stem.rsplit('_', 2)[0]
+        for suffix, punctuated in (("_unpunctuated", False), ("_punctuated", True)):
+            if stem.endswith(suffix):
+                return stem[:-len(suffix)], punctuated
+        return stem, None
+
+    @staticmethod
+    def _language_code(result: Dict, stem: str) -> Optional[str]:
+        # Results stored before the language was read from the API response say "unknown"
+        language = result.get("language")
+        if language in (None, "unknown"):
+            return LANGUAGE_BY_FILE.get(stem)
+        return language
+
+    @staticmethod
+    def _words_from_text(text: str) -> List[Dict]:
+        # Comparison results keep only the text, so timings and confidences are unknown
+        return [{"text": word, "start": 0, "end": 0, "confidence": 1.0, "speaker": None} for word in text.split()]
+
+    def _add(self, stem: str, punctuated: bool, payload: Dict, has_timings: bool):
+        key = (stem, punctuated)
+        # Prefer results with word timings over text-only ones; later files win otherwise
+        if key in self.payloads and self.payloads[key]["has_timings"] and not has_timings:
+            return
+        self.payloads[key] = {"payload": payload, "has_timings": has_timings}
+
+    def _load(self):
+        """
+        Index every stored result file by (audio stem, punctuated)
+        """
+        for results_dir in self.results_dirs:
+            for result_file in sorted(results_dir.glob("*.json")):
+                try:
+                    with open(result_file, 'r', encoding='utf-8') as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                stem, punctuated = self._split_result_name(result_file)
+
+                if "word_confidences" in result and result.get("status") == "success":
+                    self._add(stem, result.get("punctuated", True) if punctuated is None else punctuated, {
+                        "id": f"replay-{result_file.stem}",
+                        "status": "completed",
+                        "error": None,
+                        "text": result["full_text"],
+                        "language_code": self._language_code(result, stem),
+                        "audio_duration": result.get("total_duration"),
+                        "words": [{"text": word["word"], "start": word["start"], "end": word["end"],
+                                   "confidence": word["confidence"], "speaker": None}
+                                  for word in result["word_confidences"]],
+                        "utterances": []
+                    }, has_timings=True)
+                elif "texts" in result:
+                    stem = Path(result.get("file_name", stem)).stem
+                    for punctuated, text_key in ((False, "unpunctuated"), (True, "assemblyai_punctuated")):
+                        self._add(stem, punctuated, {
+                            "id": f"replay-{result_file.stem}-{text_key}",
+                            "status": "completed",
+                            "error": None,
+                            "text": result["texts"][text_key],
+                            "language_code": self._language_code(result, stem),
+                            "audio_duration": None,
+                            "words": self._words_from_text(result["texts"][text_key]),
+                            "utterances": []
+                        }, has_timings=False)
+
+    def lookup(self, stem: str, punctuate: bool) -> Optional[Dict]:
+        """
+        Return the stored payload for an audio stem, deriving the unpunctuated
+        version from the punctuated one when needed
+        """
+        entry = self.payloads.get((stem, punctuate))
+        punctuated_entry = self.payloads.get((stem, True))
+        if not punctuate and punctuated_entry and (entry is None or (punctuated_entry["has_timings"] and not entry["has_timings"])):
+            punctuated = punctuated_entry["payload"]
+            words = [dict(word, text=strip_punctuation(word["text"])) for word in punctuated["words"]]
+            return dict(punctuated,
+                        id=f"{punctuated['id']}-unpunctuated",
+                        text=derive_unpunctuated_text([word["text"] for word in punctuated["words"]]),
+                        words=words)
+        return entry["payload"] if entry else None
+
+    def transcribe(self, file_path: str, config: aai.TranscriptionConfig):
+        if self.latency:
+            time.sleep(self.latency)
+
+        stem = Path(file_path).stem
+        payload = self.lookup(stem, _punctuate_requested(config))
+        if payload is None:
+            return SimpleNamespace(status="error", error=f"No stored transcript for {stem}", text=None,
+                                   words=[], utterances=[], language_code=None, audio_duration=None)
+        return payload_to_transcript(payload)
+
+def start_webhook_receiver(options: Dict):
+    """
+    Start an embedded receiver for completion callbacks
+    """
+    from webhook_receiver import WebhookReceiver
+
+    receiver = WebhookReceiver(**options)
+    receiver.start()
+    print(f"Receiving AssemblyAI webhooks at {receiver.url}")
+    return receiver
+
+def create_backend(name: str = "assemblyai", replay_latency: float = 0.0, fake_server_options: Optional[Dict] = None,
+                   webhook_options: Optional[Dict] = None, scheduler_options: Optional[Dict] = None):
+    """
+    Build the transcription backend selected on the command line.
+    Passing `webhook_options` (WebhookReceiver arguments) enables webhook-driven completion.
+    API backends schedule their requests with RequestScheduler(**scheduler_options).
+    """
+    if name == "replay":
+        return ReplayBackend(latency=replay_latency)
+
+    receiver = start_webhook_receiver(webhook_options) if webhook_options is not None else None
+    scheduler = RequestScheduler(**(scheduler_options or {}))
+
+    if name == "fake":
+        from fake_assemblyai_server import FakeAssemblyAIServer
+
+        server = FakeAssemblyAIServer(**(fake_server_options or {}))
+        server.start()
+        print(f"Fake AssemblyAI server listening on {server.url}")
+        client = aai.Client(settings=aai.Settings(api_key="fake-api-key", base_url=server.url,
+                                                  polling_interval=server.polling_interval))
+        # The fake server forgets uploads when it stops, so upload URLs are not persisted
+        backend = AssemblyAIBackend(client, name="fake", upload_cache_file=None, webhook_receiver=receiver,
+                                    scheduler=scheduler)
+        backend.server = server
+        return backend
+
+    configure_api_key()
+    if receiver is not None and not receiver.public_url:
+        print("Warning: AssemblyAI cannot reach a local webhook URL; set --webhook-public-url. "
+              "Completion will be detected by fallback polling.")
+    # A client of its own, so the scheduler does not change the SDK's shared default client
+    return AssemblyAIBackend(aai.Client(settings=aai.settings), webhook_receiver=receiver, scheduler=scheduler)
+
+def add_backend_arguments(parser):
+    """
+    Add the shared backend selection options to a script's argument parser
+    """
+    parser.add_argument("--backend", choices=BACKENDS, default="assemblyai",
+                        help="Where transcripts come from: the live API (default), stored results (replay) "
+                             "or a local fake AssemblyAI server (fake)")
+    parser.add_argument("--replay-latency", type=float, default=0.0,
+                        help="Seconds the replay backend waits before returning each transcript")
+    parser.add_argument("--fake-latency", type=float, default=0.0,
+                        help="Seconds the fake server waits before answering each request")
+    parser.add_argument("--fake-processing-time", type=float, default=2.0,
+                        help="Seconds the fake server takes to complete a transcript")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0,
+                        help="Fraction of fake server requests that fail with HTTP 500")
+    parser.add_argument("--fake-webhook-drop-rate", type=float, default=0.0,
+                        help="Fraction of completion webhooks the fake server never sends")
+    parser.add_argument("--fake-throttle-rate", type=float, default=0.0,
+                        help="Fraction of fake server requests rejected with HTTP 429")
+    parser.add_argument("--fake-rate-limit", type=float, default=0.0,
+                        help="Requests per second above which the fake server answers HTTP 429 (default: unlimited)")
+    parser.add_argument("--webhook", action="store_true",
+                        help="Wait for completion webhooks on an embedded receiver instead of polling")
+    parser.add_argument("--webhook-host", default="127.0.0.1", help="Address the webhook receiver listens on")
+    parser.add_argument("--webhook-port", type=int, default=0, help="Port of the webhook receiver (default: any free port)")
+    parser.add_argument("--webhook-public-url",
+                        help="Public URL that forwards to the receiver; required for the live API")
+    add_scheduler_arguments(parser)
+
+def create_backend_from_args(args):
+    """
+    Build the backend described by the options added in add_backend_arguments
+    """
+    return create_backend(args.backend, replay_latency=args.replay_latency, fake_server_options={
+        "latency": args.fake_latency,
+        "processing_time": args.fake_processing_time,
+        "failure_rate": args.fake_failure_rate,
+        "webhook_drop_rate": args.fake_webhook_drop_rate,
+        "throttle_rate": args.fake_throttle_rate,
+        "rate_limit": args.fake_rate_limit
+    }, webhook_options={
+        "host": args.webhook_host,
+        "port": args.webhook_port,
+        "public_url": args.webhook_public_url
+    } if args.webhook else None, scheduler_options=scheduler_options_from_args(args))
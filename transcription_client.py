@@ -0,0 +1,48 @@
+import assemblyai as aai
+
+from audio_upload import is_remote_url
+from transcript_cache import TranscriptCache
+
+class TranscriptionClient:
+    """
+    Shared transcription access layer for the analysis scripts.
+    Serves completed transcripts from the local cache when possible and
+    otherwise asks the backend (live AssemblyAI, replay or fake server).
+    With a `preprocessor` (see audio_preprocessing.py), local audio is
+    transcoded and deduplicated before it is sent.
+    """
+    def __init__(self, backend, use_cache: bool = True, refresh: bool = False, preprocessor=None):
+        self.backend = backend
+        self.preprocessor = preprocessor
+        self.transcript_cache = TranscriptCache(sdk_version=aai.__version__, backend=backend.name) if use_cache else None
+        self.refresh = refresh
+
+    def transcribe(self, file_path: str, config: aai.TranscriptionConfig):
+        """
+        Transcribe a local file or URL with the given config.
+        Returns an `aai.Transcript` or an equivalent object rebuilt from the cache.
+        """
+        if self.preprocessor is not None:
+            file_path = self.preprocessor.prepare(file_path)
+        cacheable = self.transcript_cache is not None and not is_remote_url(file_path)
+
+        if cacheable and not self.refresh:
+            transcript = self.transcript_cache.get(file_path, config)
+            if transcript is not None:
+                print(f"Using cached transcript for {file_path}")
+                return transcript
+
+        transcript = self.backend.transcribe(file_path, config)
+
+        if cacheable and transcript is not None:
+            self.transcript_cache.put(file_path, config, transcript)
+        return transcript
+
+def add_cache_arguments(parser):
+    """
+    Add the shared --no-cache/--refresh options to a script's argument parser
+    """
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Neither read nor write the local transcript cache")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached transcripts and re-transcribe, updating the cache")
@@ -0,0 +1,111 @@
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+WEBHOOK_AUTH_HEADER = "X-Webhook-Secret"
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    server_version = "WebhookReceiver/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status_code: int):
+        self.send_response(status_code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not secrets.compare_digest(self.headers.get(self.server.auth_header_name, ""), self.server.secret):
+            self.server.count("rejected")
+            self._respond(401)
+            return
+
+        try:
+            notification = json.loads(body)
+            transcript_id = notification["transcript_id"]
+        except (ValueError, KeyError, TypeError):
+            self.server.count("rejected")
+            self._respond(400)
+            return
+
+        self.server.notify(transcript_id)
+        self._respond(200)
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """
+    Embedded HTTP endpoint for AssemblyAI completion callbacks.
+    Jobs submitted with `webhook_url=receiver.url` are woken through `wait`
+    as soon as their callback arrives, instead of on the next poll.
+    Callbacks must carry the per-run secret in `auth_header_name`.
+
+    The live API has to be able to reach the receiver, so pass a
+    `public_url` (e.g. a tunnel or reverse proxy) that forwards to host:port.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, public_url: Optional[str] = None,
+                 auth_header_name: str = WEBHOOK_AUTH_HEADER):
+        super().__init__((host, port), _WebhookHandler)
+        self.public_url = public_url
+        self.auth_header_name = auth_header_name
+        self.secret = secrets.token_hex(16)
+        self.stats = {"callbacks": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._events: Dict[str, threading.Event] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _event(self, transcript_id: str) -> threading.Event:
+        with self._lock:
+            return self._events.setdefault(transcript_id, threading.Event())
+
+    def notify(self, transcript_id: str):
+        """
+        Record a completion callback. Callbacks that arrive before anyone waits
+        for the transcript are kept, so a fast job is never missed.
+        """
+        self.count("callbacks")
+        self._event(transcript_id).set()
+
+    def wait(self, transcript_id: str, timeout: float) -> bool:
+        """
+        Block until the transcript's callback arrives or the timeout expires.
+        Returns True if the callback arrived. The callback is consumed, so a
+        callback that arrives before the job shows as finished does not make
+        every later wait return at once.
+        """
+        event = self._event(transcript_id)
+        if not event.wait(timeout):
+            return False
+        event.clear()
+        return True
+
+    def forget(self, transcript_id: str):
+        with self._lock:
+            self._events.pop(transcript_id, None)
+
+    def start(self) -> threading.Thread:
+        """
+        Serve callbacks on a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="webhook-receiver", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()